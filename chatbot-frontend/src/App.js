@@ -53,6 +53,40 @@ function urlBase64ToUint8Array(base64String) {
   return outputArray;
 }
 
+// Reads a Server-Sent Events response body, calling onEvent for every event.
+// Resolves with the payload of the final "done" (or "error") event.
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = {};
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      });
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      onEvent(event, payload);
+      if (event === 'done' || event === 'error') result = payload;
+    }
+  }
+  return result;
+}
+
 function App() {
   const [input, setInput] = useState('');
   const [response, setResponse] = useState('');
@@ -325,13 +359,20 @@ const arrivalNotified = useRef(false);
     }
 
     try {
-      const res = await fetch('https://chatbot-j9nx.onrender.com/ask', {
+      const res = await fetch('https://chatbot-j9nx.onrender.com/ask/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ message: input, lat, lng, lang: language })
       });
 
-      const data = await res.json();
+      // Show tokens as they arrive; the final "done" event carries the full reply
+      let partial = '';
+      const data = await readEventStream(res, (event, payload) => {
+        if (event === 'delta') {
+          partial += payload.text;
+          setResponse(partial);
+        }
+      });
       const reply = data.response || 'No response.';
       setResponse(reply);
       speakResponse(reply);
@@ -0,0 +1,94 @@
+# asgi.py
+#
+# ASGI entry point: `uvicorn asgi:app --workers 2`
+# POST /ask and /ask/stream run on the native asyncio pipeline; every other
+# route is served by the existing Flask app through a WSGI adapter.
+
+import json
+import logging
+from asgiref.wsgi import WsgiToAsgi
+import main
+
+flask_asgi = WsgiToAsgi(main.app)
+
+JSON_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"access-control-allow-origin", b"*"),
+]
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"access-control-allow-origin", b"*"),
+] + [(name.lower().encode(), value.encode()) for name, value in main.SSE_HEADERS.items()]
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, payload, status=200):
+    await send({"type": "http.response.start", "status": status, "headers": JSON_HEADERS})
+    await send({"type": "http.response.body", "body": json.dumps(payload).encode("utf-8")})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await main.async_weather_service.aclose()
+            await main.async_traffic_service.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _read_json(receive, send):
+    try:
+        return json.loads(await _read_body(receive) or b"{}")
+    except ValueError as e:
+        logging.warning(f"Invalid JSON body for /ask: {e}")
+        await _send_json(send, main.ASK_ERROR_PAYLOAD, 400)
+        return None
+
+
+async def ask(scope, receive, send):
+    data = await _read_json(receive, send)
+    if data is None:
+        return
+    payload, status = await main.ask_async(data)
+    await _send_json(send, payload, status)
+
+
+async def ask_stream(scope, receive, send):
+    data = await _read_json(receive, send)
+    if data is None:
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+    async for chunk in main.ask_stream_async(data):
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+ROUTES = {
+    "/ask": ask,
+    "/ask/stream": ask_stream,
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in ROUTES:
+        await ROUTES[scope["path"]](scope, receive, send)
+        return
+
+    await flask_asgi(scope, receive, send)
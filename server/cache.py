@@ -0,0 +1,221 @@
+# cache.py
+
+import asyncio
+import functools
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+async def run_blocking(fn, *args):
+    """Await a blocking call (SQLite, a Redis or file cache) in the loop's default executor."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+    None is never stored, so get() returning None always means a miss.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        if value is None:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # In-process and quick, so the async pipeline calls these directly
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value, ttl=None):
+        self.set(key, value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+
+class TieredCache:
+    """
+    An in-process TTLCache in front of an optional shared tier (any cachelib
+    cache: FileSystemCache, RedisCache, ...) so gunicorn workers on the same
+    host or cluster can reuse each other's upstream results.
+    """
+
+    def __init__(self, local, shared=None, prefix=""):
+        self.local = local
+        self.shared = shared
+        self.prefix = prefix
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    @property
+    def ttl(self):
+        return self.local.ttl
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        return self._shared_get(key)
+
+    async def aget(self, key):
+        """get() for the event loop: a shared-tier read runs in a worker thread."""
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        return await run_blocking(self._shared_get, key)
+
+    def _shared_get(self, key):
+        try:
+            value = self.shared.get(self.prefix + key)
+        except Exception as e:
+            self.shared_errors += 1
+            logging.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+        if value is not None:
+            self.shared_hits += 1
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        if value is None:
+            return
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            self._shared_set(key, value, ttl)
+
+    async def aset(self, key, value, ttl=None):
+        """set() for the event loop: a shared-tier write runs in a worker thread."""
+        if value is None:
+            return
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            await run_blocking(self._shared_set, key, value, ttl)
+
+    def _shared_set(self, key, value, ttl):
+        try:
+            # cachelib reads a timeout of 0 as "never expire", so round sub-second TTLs up
+            timeout = max(1, math.ceil(self.local.ttl if ttl is None else ttl))
+            self.shared.set(self.prefix + key, value, timeout=timeout)
+        except Exception as e:
+            self.shared_errors += 1
+            logging.warning(f"Shared cache write failed for {key}: {e}")
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self.prefix + key)
+            except Exception as e:
+                logging.warning(f"Shared cache delete failed for {key}: {e}")
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["shared"] = type(self.shared).__name__ if self.shared is not None else None
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_errors"] = self.shared_errors
+        return stats
+
+
+def shared_cache_from_env():
+    """
+    Build the optional shared cache tier from the environment:
+    SHARED_CACHE_REDIS_URL selects Redis, SHARED_CACHE_DIR a directory shared
+    by every worker on the host. Returns None when neither is configured.
+    """
+    redis_url = os.getenv('SHARED_CACHE_REDIS_URL')
+    cache_dir = os.getenv('SHARED_CACHE_DIR')
+    try:
+        if redis_url:
+            import redis
+            from cachelib import RedisCache
+            return RedisCache(host=redis.from_url(redis_url))
+        if cache_dir:
+            from cachelib import FileSystemCache
+            return FileSystemCache(cache_dir, threshold=5000)
+    except ImportError as e:
+        logging.warning(f"Shared cache tier disabled, missing dependency: {e}")
+    return None
+
+
+# --- KEYS ---
+
+# Trailing tokens that don't change which place is meant ("Vail, CO, USA" == "vail")
+_PLACE_SUFFIXES = {"us", "usa", "united states", "co", "colorado"}
+_COORDS_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def normalize_place_key(name):
+    """Lowercase, strip punctuation, state/country suffixes and ZIP codes."""
+    parts = [re.sub(r'[^a-z0-9 ]+', ' ', part.lower()).strip() for part in name.split(',')]
+    parts = [' '.join(part.split()) for part in parts if part.strip()]
+    while len(parts) > 1 and (parts[-1] in _PLACE_SUFFIXES or re.fullmatch(r'(co )?\d{5}', parts[-1])):
+        parts.pop()
+    return ' '.join(parts)
+
+
+def coords_bucket(lat, lng, precision=0.05):
+    """
+    Snap coordinates to a grid cell (0.05° is roughly 5 km in Colorado) so
+    lookups a few hundred metres apart share an entry.
+    """
+    return f"{round(float(lat) / precision) * precision:.3f},{round(float(lng) / precision) * precision:.3f}"
+
+
+def parse_coords(text):
+    """Return (lat, lng) if `text` is a "lat,lng" string, else None."""
+    match = _COORDS_RE.match(str(text))
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    return None
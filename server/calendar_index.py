@@ -0,0 +1,137 @@
+# calendar_index.py
+
+import datetime
+import threading
+from bisect import bisect_left, bisect_right
+
+# How far ahead the prompt's calendar view looks
+HORIZON_DAYS = 42
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def _day(d):
+    return f"{d:%a, %b} {d.day}"
+
+
+def _long_day(d):
+    return f"{d:%A, %B} {d.day}, {d.year}"
+
+
+class CalendarIndex:
+    """
+    Interval index over the knowledge base's CalendarEntry records (seasons,
+    summer operations, events, holidays, school breaks), answering "what
+    overlaps these dates" without scanning every entry. Entries are sorted by
+    start date alongside a running maximum of end dates, so both ends of a
+    query are a bisect away.
+
+    view_for(day) renders the "active today / next 6 weeks" text the prompt
+    carries; it only changes once a day, so the last few days are cached.
+    """
+
+    def __init__(self, entries, lift_hours=None, horizon_days=HORIZON_DAYS):
+        self.entries = sorted(entries, key=lambda entry: (entry.start, entry.end))
+        self.lift_hours = lift_hours or {}
+        self.horizon_days = horizon_days
+        self._starts = [entry.start for entry in self.entries]
+        self._max_ends = []
+        for entry in self.entries:
+            self._max_ends.append(max(entry.end, self._max_ends[-1]) if self._max_ends else entry.end)
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def overlapping(self, start, end):
+        """Entries whose date range intersects [start, end], ignoring weekday restrictions."""
+        lo = bisect_left(self._max_ends, start)
+        hi = bisect_right(self._starts, end)
+        return [entry for entry in self.entries[lo:hi] if entry.end >= start]
+
+    @staticmethod
+    def next_occurrence(entry, start, end):
+        """The first day in [start, end] on which `entry` is actually on, or None."""
+        day = max(entry.start, start)
+        last = min(entry.end, end)
+        while day <= last:
+            if not entry.days or WEEKDAYS[day.weekday()] in entry.days:
+                return day
+            day += datetime.timedelta(days=1)
+        return None
+
+    def active_on(self, day):
+        return [entry for entry in self.overlapping(day, day) if self.next_occurrence(entry, day, day)]
+
+    def upcoming(self, day):
+        """(entry, first date) for entries that aren't on today but are within the horizon."""
+        start = day + datetime.timedelta(days=1)
+        end = day + datetime.timedelta(days=self.horizon_days)
+        active = set(map(id, self.active_on(day)))
+        found = []
+        for entry in self.overlapping(start, end):
+            if id(entry) in active:
+                continue  # already listed as running today
+            first = self.next_occurrence(entry, start, end)
+            if first:
+                found.append((entry, first))
+        return sorted(found, key=lambda item: item[1])
+
+    def view_for(self, day):
+        with self._lock:
+            view = self._views.get(day)
+        if view is None:
+            view = self._render(day)
+            with self._lock:
+                if len(self._views) >= 4:
+                    self._views.clear()
+                self._views[day] = view
+        return view
+
+    def _render(self, day):
+        active = self.active_on(day)
+        upcoming = self.upcoming(day)
+        lines = [f"Today ({_long_day(day)}):"]
+
+        operating = set()
+        for entry in active:
+            if entry.kind == "ski_season":
+                operating.add(entry.location)
+                hours = self.lift_hours.get(entry.location, {})
+                detail = ", ".join(f"{lift} {hours}" for lift, hours in hours.items())
+                lines.append(f"- {entry.name}: lifts open today (until {_day(entry.end)})"
+                             + (f". Lift hours: {detail}" if detail else ""))
+            elif entry.kind == "summer_operations":
+                operating.add(entry.location)
+                lines.append(f"- {entry.name}: open today {entry.hours or ''}".rstrip())
+            else:
+                lines.append(f"- {self._describe(entry)}" + (f", through {_day(entry.end)}" if entry.end > day else ""))
+
+        mountains = {entry.location for entry in self.entries if entry.kind in ("ski_season", "summer_operations")}
+        for mountain in sorted(mountains - operating):
+            lines.append(f"- {mountain}: no lift or gondola operations today")
+
+        lines.append(f"\nComing up in the next {self.horizon_days // 7} weeks:")
+        if not upcoming:
+            lines.append("- Nothing scheduled")
+        for entry, first in upcoming:
+            if entry.days:
+                when = f"{' & '.join(d + 's' for d in entry.days)} from {_day(first)} to {_day(entry.end)}"
+            elif entry.end > first:
+                when = f"{_day(first)} to {_day(entry.end)}"
+            else:
+                when = _day(first)
+            hours = f" ({entry.hours})" if entry.hours else ""
+            lines.append(f"- {when}: {self._describe(entry)}{hours}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _describe(entry):
+        text = entry.name
+        if entry.kind == "school_break":
+            text = f"School break ({entry.name})"
+        elif entry.kind == "holiday":
+            text = f"Holiday: {entry.name}"
+        if entry.location and entry.kind == "event":
+            text += f" ({entry.location})"
+        if entry.details:
+            text += f": {entry.details}"
+        return text
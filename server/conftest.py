@@ -0,0 +1,12 @@
+# conftest.py
+
+import os
+import tempfile
+
+# main.py reads these at import time: keep test runs away from the real
+# geocode cache, knowledge base snapshot and upstream APIs
+_scratch = tempfile.mkdtemp(prefix="spotsurfer-tests-")
+os.environ.setdefault("GEOCODE_DB_PATH", os.path.join(_scratch, "geocode_cache.sqlite3"))
+os.environ.setdefault("KB_SNAPSHOT_PATH", os.path.join(_scratch, "knowledge_base.snapshot"))
+for name in ("GOOGLE_MAPS_API_KEY", "WEATHER_API_KEY", "SHARED_CACHE_REDIS_URL", "SHARED_CACHE_DIR"):
+    os.environ[name] = ""
@@ -0,0 +1,58 @@
+# deadline.py
+
+import time
+
+# End-to-end budget for one /ask call and the share always kept for the LLM
+ASK_BUDGET_SECONDS = 25.0
+LLM_RESERVE_SECONDS = 15.0
+
+# Per-upstream timeouts for the enrichment lookups
+WEATHER_TIMEOUT = 3.0
+GEOCODE_TIMEOUT = 3.0
+DIRECTIONS_TIMEOUT = 4.0
+
+# One OpenAI attempt; retries share the rest of the LLM's reserve
+LLM_CALL_TIMEOUT = 8.0
+
+# Not worth starting a lookup with less time than this left
+MIN_STEP_SECONDS = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """An enrichment step was skipped or abandoned because the request ran out of budget."""
+
+
+class Deadline:
+    """
+    Wall-clock budget for one request. Enrichment steps may only spend what is
+    left after `reserve` seconds are set aside for the LLM call.
+    """
+
+    def __init__(self, budget=ASK_BUDGET_SECONDS, reserve=LLM_RESERVE_SECONDS):
+        self.budget = budget
+        self.reserve = min(reserve, budget)
+        self.started = time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return self.budget - self.elapsed()
+
+    def enrichment_remaining(self):
+        return self.remaining() - self.reserve
+
+    def timeout_for(self, step_timeout, minimum=MIN_STEP_SECONDS):
+        """
+        Timeout for an enrichment step: its own timeout, capped by what is left
+        of the enrichment budget. Raises DeadlineExceeded when the budget can't
+        cover a useful try, so a late step is never handed a full default.
+        """
+        available = self.enrichment_remaining()
+        if available < minimum:
+            raise DeadlineExceeded(f"{max(available, 0):.2f}s of the enrichment budget left")
+        return min(step_timeout, available)
+
+    def llm_timeout(self):
+        # However long enrichment took, the LLM still gets its reserved share
+        return max(self.remaining(), self.reserve)
@@ -0,0 +1,151 @@
+# fanout.py
+
+import asyncio
+import inspect
+import logging
+from concurrent.futures import FIRST_COMPLETED, wait
+from deadline import DeadlineExceeded
+
+
+class TaskGraph:
+    """
+    A small dependency-aware task runner for upstream lookups.
+
+    Each task is a callable plus the names of the tasks whose results it needs.
+    Tasks without dependencies start immediately on the shared executor; the
+    rest are submitted as soon as all of their inputs have resolved. Results of
+    dependencies are passed to the callable as leading positional arguments,
+    in the order the dependencies were listed.
+
+    A task registered with `timeout=` is an upstream call: it receives a
+    `timeout` keyword capped by the run's Deadline, and is skipped outright
+    when the remaining budget can't cover it.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    def add(self, name, fn, *args, deps=(), timeout=None, **kwargs):
+        if name in self._tasks:
+            raise ValueError(f"Duplicate task name: {name}")
+        for dep in deps:
+            # Requiring dependencies to be registered first keeps the graph acyclic.
+            if dep not in self._tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        self._tasks[name] = (fn, args, kwargs, tuple(deps), timeout)
+        return self
+
+    def __contains__(self, name):
+        return name in self._tasks
+
+    def _call_kwargs(self, name, kwargs, timeout, deadline):
+        if timeout is None:
+            return kwargs
+        if deadline is not None:
+            try:
+                timeout = deadline.timeout_for(timeout)
+            except DeadlineExceeded as e:
+                raise DeadlineExceeded(f"No time left in the request budget for '{name}': {e}") from e
+        return dict(kwargs, timeout=timeout)
+
+    def run(self, executor, deadline=None):
+        """
+        Run every task on `executor` and block until all of them have finished
+        or the deadline's enrichment budget is spent. Returns (results, errors):
+        two dicts keyed by task name. A task that raised, ran out of time, or
+        depends on a task that did, appears in `errors`.
+
+        Tasks abandoned at the deadline that are still queued are cancelled.
+        Those already running can't be stopped and keep their executor slot
+        until they return. What bounds that leftover work is the `timeout`
+        each upstream task is given: it is capped by the enrichment budget
+        left when the task starts, so an abandoned call gives up roughly when
+        the budget does. Register every network call with `timeout=`; a task
+        without one can hold its slot for as long as it runs.
+        """
+        results = {}
+        errors = {}
+        pending = dict(self._tasks)
+        running = {}
+
+        while pending or running:
+            for name in list(pending):
+                fn, args, kwargs, deps, timeout = pending[name]
+                failed = next((dep for dep in deps if dep in errors), None)
+                if failed:
+                    errors[name] = errors[failed]
+                    del pending[name]
+                elif all(dep in results for dep in deps):
+                    del pending[name]
+                    try:
+                        call_kwargs = self._call_kwargs(name, kwargs, timeout, deadline)
+                    except DeadlineExceeded as e:
+                        errors[name] = e
+                        continue
+                    inputs = [results[dep] for dep in deps]
+                    running[executor.submit(fn, *inputs, *args, **call_kwargs)] = name
+
+            if not running:
+                continue
+
+            wait_timeout = max(0, deadline.enrichment_remaining()) if deadline else None
+            done, _ = wait(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Budget spent: drop what hasn't started; what has runs out its own timeout
+                started = [name for future, name in running.items() if not future.cancel()]
+                for name in running.values():
+                    errors[name] = DeadlineExceeded(f"'{name}' did not finish within the request budget")
+                if started:
+                    logging.info(f"Abandoned {len(started)} running lookup(s) at the deadline: {', '.join(started)}")
+                running.clear()
+                continue
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logging.debug(f"Task '{name}' failed: {e}")
+                    errors[name] = e
+
+        return results, errors
+
+    async def run_async(self, deadline=None):
+        """
+        Async counterpart of run(). Callables may be coroutine functions or
+        plain functions (for cheap, non-blocking steps). Every task starts as
+        soon as its dependencies have resolved.
+        """
+        results = {}
+        errors = {}
+        futures = {}
+
+        async def _run(name, fn, args, kwargs, deps, timeout):
+            if deps:
+                await asyncio.wait([futures[dep] for dep in deps])
+            failed = next((dep for dep in deps if dep in errors), None)
+            if failed:
+                errors[name] = errors[failed]
+                return
+            try:
+                call_kwargs = self._call_kwargs(name, kwargs, timeout, deadline)
+                inputs = [results[dep] for dep in deps]
+                result = fn(*inputs, *args, **call_kwargs)
+                if inspect.isawaitable(result):
+                    if deadline is not None:
+                        result = await asyncio.wait_for(result, max(0, deadline.enrichment_remaining()))
+                    else:
+                        result = await result
+                results[name] = result
+            except asyncio.TimeoutError:
+                errors[name] = DeadlineExceeded(f"'{name}' did not finish within the request budget")
+            except Exception as e:
+                logging.debug(f"Task '{name}' failed: {e}")
+                errors[name] = e
+
+        for name, (fn, args, kwargs, deps, timeout) in self._tasks.items():
+            futures[name] = asyncio.ensure_future(_run(name, fn, args, kwargs, deps, timeout))
+        if futures:
+            await asyncio.gather(*futures.values())
+
+        return results, errors
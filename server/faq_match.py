@@ -0,0 +1,116 @@
+# faq_match.py
+
+import difflib
+import re
+import threading
+from retrieval import tokenize
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # pragma: no cover - rapidfuzz is pinned, difflib keeps the fast path working without it
+    fuzz = process = None
+
+# Matches at or above this score (0-100) are answered straight from the FAQ
+FAQ_MATCH_THRESHOLD = 90
+
+# A question word counts as present in an FAQ when some FAQ word is this similar (typos, "cancelation")
+WORD_MATCH_THRESHOLD = 80
+
+# "What's", "I'm", "you're": the contraction adds nothing to compare on
+_CONTRACTION = re.compile(r"['’](?:s|m|re|ve|ll|d)\b", re.IGNORECASE)
+
+
+def normalize_question(text):
+    """
+    Content words only, so "closest parking to gondola one?" and "What's the
+    closest parking to Gondola One?" compare equal.
+    """
+    return " ".join(tokenize(_CONTRACTION.sub("", str(text))))
+
+
+def _ratio(a, b):
+    if fuzz is not None:
+        return fuzz.ratio(a, b)
+    return difflib.SequenceMatcher(None, a, b).ratio() * 100
+
+
+def _token_set_ratio(a, b):
+    """rapidfuzz's token_set_ratio: 100 when one side's words are a subset of the other's."""
+    if fuzz is not None:
+        return fuzz.token_set_ratio(a, b)
+    a, b = set(a.split()), set(b.split())
+    if not a or not b:
+        return 0
+    common = " ".join(sorted(a & b))
+    rest_a = " ".join(filter(None, (common, " ".join(sorted(a - b)))))
+    rest_b = " ".join(filter(None, (common, " ".join(sorted(b - a)))))
+    if common and (rest_a == common or rest_b == common):
+        return 100
+    return max(_ratio(common, rest_a) if common else 0, _ratio(common, rest_b) if common else 0,
+               _ratio(rest_a, rest_b))
+
+
+class FaqMatcher:
+    """
+    Fuzzy matcher from a user's question to a stored FAQ entry. Questions
+    are compared as sets of content words (token_set_ratio), so "How do I
+    pay?" matches "How do I pay for my parking reservation?". Two checks
+    keep that from answering the wrong question:
+
+    - every word the user wrote must appear in the FAQ question, so "Where
+      can I park overnight in Avon?" doesn't get the Vail answer;
+    - the match must be unambiguous: "Can I cancel?" fits both the renter's
+      and the property owner's cancellation FAQs, so it goes to the LLM.
+
+    Uses rapidfuzz, or difflib when rapidfuzz isn't installed.
+    """
+
+    def __init__(self, faqs, threshold=FAQ_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.faqs = [faq for faq in faqs if faq.answer]
+        self._choices = [normalize_question(faq.question) for faq in self.faqs]
+        self._words = [set(choice.split()) for choice in self._choices]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _covers(self, index, words):
+        """Whether every one of `words` appears, perhaps misspelt, in FAQ `index`'s question."""
+        faq_words = self._words[index]
+        return all(word in faq_words or any(_ratio(word, other) >= WORD_MATCH_THRESHOLD for other in faq_words)
+                   for word in words)
+
+    def _best(self, query, threshold):
+        """(index, score) of the one FAQ the query clearly means, else (None, 0)."""
+        if process is not None:
+            scored = [(index, score) for _, score, index in
+                      process.extract(query, self._choices, scorer=fuzz.token_set_ratio,
+                                      score_cutoff=threshold, limit=None)]
+        else:
+            scored = [(index, score) for index, score in
+                      ((index, _token_set_ratio(query, choice)) for index, choice in enumerate(self._choices))
+                      if score >= threshold]
+        words = query.split()
+        scored = sorted(((index, score) for index, score in scored if self._covers(index, words)),
+                        key=lambda pair: -pair[1])
+        if not scored or len({self.faqs[index].answer for index, _ in scored}) > 1:
+            return None, 0
+        return scored[0]
+
+    def match(self, question, threshold=None):
+        """Return (faq, score) for a match at or above `threshold` (default: the matcher's), else None."""
+        query = normalize_question(question)
+        index, score = self._best(query, self.threshold if threshold is None else threshold) \
+            if query and self._choices else (None, 0)
+        hit = index is not None
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (self.faqs[index], score) if hit else None
+
+    def stats(self):
+        with self._lock:
+            return {"faqs": len(self.faqs), "hits": self.hits, "misses": self.misses,
+                    "threshold": self.threshold, "backend": "rapidfuzz" if process else "difflib"}
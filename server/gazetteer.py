@@ -0,0 +1,159 @@
+# gazetteer.py
+
+import difflib
+import re
+import threading
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # pragma: no cover - rapidfuzz is pinned, difflib keeps lookups working without it
+    fuzz = process = None
+
+# Misspellings scoring at least this (0-100) against a known name resolve to it
+GAZETTEER_MATCH_THRESHOLD = 88
+
+# (name, canonical address, lat, lng, kind, aliases). Canonical names follow
+# Google's formatted_address style so they read the same as geocoded ones;
+# coordinates are approximate town centres, summits and terminals.
+PLACES = (
+    # Vail Valley and Eagle County
+    ("Vail", "Vail, CO 81657, USA", 39.6403, -106.3742, "town", ("Vail Village", "Vail CO", "Lionshead")),
+    ("Avon", "Avon, CO 81620, USA", 39.6314, -106.5222, "town", ()),
+    ("Beaver Creek", "Beaver Creek, CO 81620, USA", 39.6042, -106.5165, "town", ("Beaver Creek Resort",)),
+    ("EagleVail", "EagleVail, CO 81620, USA", 39.6172, -106.4587, "town", ("Eagle Vail", "Eagle-Vail")),
+    ("Edwards", "Edwards, CO 81632, USA", 39.6450, -106.5942, "town", ()),
+    ("Minturn", "Minturn, CO 81645, USA", 39.5864, -106.4309, "town", ()),
+    ("Eagle", "Eagle, CO 81631, USA", 39.6553, -106.8287, "town", ()),
+    ("Gypsum", "Gypsum, CO 81637, USA", 39.6469, -106.9517, "town", ()),
+    # Summit County
+    ("Breckenridge", "Breckenridge, CO 80424, USA", 39.4817, -106.0384, "town", ("Breck",)),
+    ("Frisco", "Frisco, CO 80443, USA", 39.5744, -106.0975, "town", ()),
+    ("Silverthorne", "Silverthorne, CO 80498, USA", 39.6296, -106.0717, "town", ()),
+    ("Dillon", "Dillon, CO 80435, USA", 39.6303, -106.0434, "town", ()),
+    ("Keystone", "Keystone, CO 80435, USA", 39.6084, -105.9437, "town", ("Keystone Resort",)),
+    ("Copper Mountain", "Copper Mountain, CO 80443, USA", 39.5022, -106.1511, "town", ("Copper",)),
+    # Other resort towns
+    ("Aspen", "Aspen, CO 81611, USA", 39.1911, -106.8175, "town", ()),
+    ("Snowmass Village", "Snowmass Village, CO 81615, USA", 39.2130, -106.9378, "town", ("Snowmass",)),
+    ("Steamboat Springs", "Steamboat Springs, CO 80487, USA", 40.4850, -106.8317, "town", ("Steamboat",)),
+    ("Winter Park", "Winter Park, CO 80482, USA", 39.8917, -105.7631, "town", ()),
+    ("Telluride", "Telluride, CO 81435, USA", 37.9375, -107.8123, "town", ()),
+    ("Crested Butte", "Crested Butte, CO 81224, USA", 38.8697, -106.9878, "town", ()),
+    ("Glenwood Springs", "Glenwood Springs, CO 81601, USA", 39.5505, -107.3248, "town", ("Glenwood",)),
+    ("Leadville", "Leadville, CO 80461, USA", 39.2508, -106.2925, "town", ()),
+    ("Idaho Springs", "Idaho Springs, CO 80452, USA", 39.7425, -105.5136, "town", ()),
+    ("Georgetown", "Georgetown, CO 80444, USA", 39.7061, -105.6975, "town", ()),
+    # Front Range
+    ("Denver", "Denver, CO, USA", 39.7392, -104.9903, "town", ("Downtown Denver",)),
+    ("Boulder", "Boulder, CO, USA", 40.0150, -105.2705, "town", ()),
+    ("Golden", "Golden, CO 80401, USA", 39.7555, -105.2211, "town", ()),
+    ("Colorado Springs", "Colorado Springs, CO, USA", 38.8339, -104.8214, "town", ("Colo Springs",)),
+    # Passes and tunnels
+    ("Vail Pass", "Vail Pass, Colorado, USA", 39.5311, -106.2170, "pass", ()),
+    ("Eisenhower Tunnel", "Eisenhower-Johnson Memorial Tunnel, Colorado, USA", 39.6789, -105.9200, "pass",
+     ("Eisenhower-Johnson Tunnel", "Eisenhower Johnson Memorial Tunnel", "Johnson Tunnel")),
+    ("Loveland Pass", "Loveland Pass, Colorado, USA", 39.6636, -105.8792, "pass", ()),
+    ("Tennessee Pass", "Tennessee Pass, Colorado, USA", 39.3622, -106.3114, "pass", ()),
+    ("Independence Pass", "Independence Pass, Colorado, USA", 39.1086, -106.5639, "pass", ()),
+    ("Berthoud Pass", "Berthoud Pass, Colorado, USA", 39.7983, -105.7772, "pass", ()),
+    ("Glenwood Canyon", "Glenwood Canyon, Colorado, USA", 39.5700, -107.2400, "pass", ()),
+    # Airports
+    ("Denver International Airport", "Denver International Airport (DEN), Denver, CO 80249, USA",
+     39.8561, -104.6737, "airport", ("DIA", "DEN", "Denver Airport", "Denver Intl Airport")),
+    ("Eagle County Regional Airport", "Eagle County Regional Airport (EGE), Gypsum, CO 81637, USA",
+     39.6426, -106.9177, "airport", ("EGE", "Eagle Airport", "Eagle County Airport", "Vail Airport")),
+    ("Aspen/Pitkin County Airport", "Aspen/Pitkin County Airport (ASE), Aspen, CO 81611, USA",
+     39.2232, -106.8688, "airport", ("ASE", "Aspen Airport")),
+    ("Yampa Valley Regional Airport", "Yampa Valley Regional Airport (HDN), Hayden, CO 81639, USA",
+     40.4812, -107.2218, "airport", ("HDN", "Hayden Airport", "Steamboat Airport")),
+    ("Colorado Springs Airport", "Colorado Springs Airport (COS), Colorado Springs, CO 80916, USA",
+     38.8058, -104.7008, "airport", ("COS",)),
+)
+
+# Suffixes people add that don't change the place ("Vail, Colorado", "Avon CO USA")
+_STATE_SUFFIX = re.compile(r"(?:[\s,]+(?:co|colo|colorado|usa|us|united states))+$")
+_NON_WORD = re.compile(r"[^a-z0-9/]+")
+
+
+def place_key(text):
+    """Lowercase words only, with a trailing state/country dropped: "Vail, Colorado" -> "vail"."""
+    text = _STATE_SUFFIX.sub("", str(text).lower().replace("’", "'").strip())
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+class GazetteerEntry:
+    __slots__ = ("name", "canonical", "lat", "lng", "kind")
+
+    def __init__(self, name, canonical, lat, lng, kind):
+        self.name = name
+        self.canonical = canonical
+        self.lat = lat
+        self.lng = lng
+        self.kind = kind
+
+    def __repr__(self):
+        return f"GazetteerEntry({self.name!r}, {self.kind!r})"
+
+
+class Gazetteer:
+    """
+    In-process place-name lookup consulted before the Geocoding API. Exact
+    names and aliases are a dict hit; otherwise a close fuzzy match on the
+    whole name (rapidfuzz's ratio, or difflib without it) catches
+    misspellings like "Breckenrige". Short names and abbreviations must
+    match exactly, since one wrong letter there is a different place.
+
+    SpotSurfer lots come from the knowledge base and are replaced with
+    set_lots() whenever it reloads.
+    """
+
+    def __init__(self, places=PLACES, threshold=GAZETTEER_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self._static = {}
+        for name, canonical, lat, lng, kind, aliases in places:
+            entry = GazetteerEntry(name, canonical, lat, lng, kind)
+            for spelling in (name,) + tuple(aliases):
+                self._static.setdefault(place_key(spelling), entry)
+        self._lock = threading.Lock()
+        # (entries by key, keys long enough to fuzzy-match), swapped together
+        self._table = (dict(self._static), self._fuzzy_choices(self._static))
+        self.hits = 0
+        self.misses = 0
+
+    def set_lots(self, lots):
+        """Replace the lot entries; `lots` are (name, address, lat, lng) tuples."""
+        entries = dict(self._static)
+        for name, address, lat, lng in lots:
+            entries.setdefault(place_key(name), GazetteerEntry(name, address or name, lat, lng, "lot"))
+        self._table = (entries, self._fuzzy_choices(entries))
+
+    @staticmethod
+    def _fuzzy_choices(entries):
+        return [key for key in entries if len(key) >= 6]
+
+    def _fuzzy(self, key, choices):
+        if process is not None:
+            found = process.extractOne(key, choices, scorer=fuzz.ratio, score_cutoff=self.threshold)
+            return found[0] if found else None
+        found = difflib.get_close_matches(key, choices, n=1, cutoff=self.threshold / 100)
+        return found[0] if found else None
+
+    def lookup(self, text):
+        """The GazetteerEntry for a place name, or None when it isn't a place we know."""
+        entries, choices = self._table
+        key = place_key(text)
+        entry = entries.get(key)
+        if entry is None and len(key) >= 6:
+            match = self._fuzzy(key, choices)
+            entry = entries[match] if match else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def stats(self):
+        with self._lock:
+            return {"names": len(self._table[0]), "hits": self.hits, "misses": self.misses,
+                    "backend": "rapidfuzz" if process else "difflib"}
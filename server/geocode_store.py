@@ -0,0 +1,135 @@
+# geocode_store.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from cache import TTLCache, run_blocking
+
+# Returned by lookup() when nothing is stored; a stored None is a cached "not found"
+MISS = object()
+
+GEOCODE_TTL = 30 * 24 * 3600       # place names and addresses rarely change
+NEGATIVE_TTL = 24 * 3600           # retry unresolvable inputs once a day
+REVERSE_PRECISION = 0.0005         # ~50 m grid for reverse lookups
+
+
+def forward_key(text):
+    """Normalize free text so trivially different spellings share an entry."""
+    return ' '.join(str(text).lower().replace('.', ' ').split()).strip(' ,')
+
+
+def reverse_key(lat, lng, precision=REVERSE_PRECISION):
+    """Round coordinates to a ~50 m grid cell."""
+    return f"{round(float(lat) / precision) * precision:.4f},{round(float(lng) / precision) * precision:.4f}"
+
+
+class GeocodeStore:
+    """
+    Geocoding results persisted in SQLite (WAL mode, so every gunicorn worker
+    can read while one writes) with an in-memory LRU in front. Entries carry
+    their own expiry; a None value records that the provider found nothing.
+
+    `kind` namespaces the different lookups, e.g. "forward" for name ->
+    formatted address and "locality" for coordinates -> town name.
+    """
+
+    def __init__(self, path, ttl=GEOCODE_TTL, negative_ttl=NEGATIVE_TTL, memory_size=4096):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self._local = threading.local()
+        self.disk_hits = 0
+        self.writes = 0
+        self._init_db()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode ("
+                    " kind TEXT NOT NULL,"
+                    " key TEXT NOT NULL,"
+                    " value TEXT,"
+                    " expires_at REAL NOT NULL,"
+                    " PRIMARY KEY (kind, key))"
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Geocode store unavailable at {self.path}, using memory only: {e}")
+
+    def lookup(self, kind, key):
+        """Return the stored value (None for a cached miss) or MISS."""
+        entry = self.memory.get((kind, key))
+        if entry is not None:
+            return entry[0]
+        return self._disk_lookup(kind, key)
+
+    async def alookup(self, kind, key):
+        """lookup() for the event loop: only a memory miss reads SQLite, in a worker thread."""
+        entry = self.memory.get((kind, key))
+        if entry is not None:
+            return entry[0]
+        return await run_blocking(self._disk_lookup, kind, key)
+
+    def _disk_lookup(self, kind, key):
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM geocode WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Geocode store read failed for {kind}:{key}: {e}")
+            return MISS
+        if not row or row[1] <= time.time():
+            return MISS
+        self.disk_hits += 1
+        self.memory.set((kind, key), (row[0],), ttl=row[1] - time.time())
+        return row[0]
+
+    def store(self, kind, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        # Values are wrapped so a negative (None) result can live in the LRU too
+        self.memory.set((kind, key), (value,), ttl=ttl)
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode (kind, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (kind, key, value, time.time() + ttl)
+                )
+            self.writes += 1
+        except sqlite3.Error as e:
+            logging.warning(f"Geocode store write failed for {kind}:{key}: {e}")
+
+    async def astore(self, kind, key, value):
+        await run_blocking(self.store, kind, key, value)
+
+    def purge_expired(self):
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logging.warning(f"Geocode store purge failed: {e}")
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        stats["writes"] = self.writes
+        stats["path"] = self.path
+        return stats
+
+
+def geocode_store_from_env():
+    path = os.getenv('GEOCODE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geocode_cache.sqlite3'))
+    store = GeocodeStore(path)
+    store.purge_expired()
+    return store
@@ -0,0 +1,581 @@
+# knowledge_base.py
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+
+LOTS_HEADER = "Spotsurfer  Current Lot Information:"
+COUPONS_HEADER = "Spotsurfer Coupon Codes:"
+FAQ_HEADER = "FAQ:"
+LINKS_HEADER = "HELPFUL Spotsurfer Links:"
+
+# Guide sections longer than this are split on paragraph boundaries
+MAX_CHUNK_CHARS = 900
+
+# Bump when the parsed classes change so stale snapshots are rebuilt
+SNAPSHOT_VERSION = 1
+
+# Field labels of a lot block, as spelled in knowledge_base.txt. A label can
+# follow text on the same line (one block has "...BlueBird”.MaxHeight: ...").
+LOT_FIELDS = {
+    "reservationLink": "reservation_link",
+    "FurthestRes": "furthest_reservation",
+    "TotalSpots": "spots_text",
+    "TotalsSpots": "spots_text",
+    "Spots": "spots_text",
+    "Price": "price_text",
+    "Address": "address",
+    "Amenities": "amenities",
+    "PaidAmenities": "paid_amenities",
+    "ParkingInstructions": "instructions",
+    "MaxHeight": "max_height_text",
+    "Packs/Passes": "passes",
+    "Type": "lot_type",
+    "NearbyLifts": "nearby_lifts",
+    "NearbyResturants": "nearby_restaurants",
+    "NearbyShops": "nearby_shops",
+    "NearbySkiSchool": "nearby_ski_school",
+}
+_FIELD_LABEL = re.compile(
+    r"(?<![A-Za-z])(" + "|".join(sorted(map(re.escape, LOT_FIELDS), key=len, reverse=True)) + r"):"
+)
+_LIST_FIELDS = ("amenities", "paid_amenities", "passes", "nearby_lifts", "nearby_restaurants", "nearby_shops")
+
+
+class Chunk:
+    """One retrievable piece of the knowledge base: a lot, a FAQ entry, a guide section..."""
+    __slots__ = ("kind", "title", "text")
+
+    def __init__(self, kind, title, text):
+        self.kind = kind
+        self.title = title
+        self.text = text
+
+    def __repr__(self):
+        return f"Chunk({self.kind!r}, {self.title!r}, {len(self.text)} chars)"
+
+
+class Lot:
+    """A SpotSurfer lot parsed from its block. Prices are per day in dollars."""
+    __slots__ = ("name", "summary", "reservation_link", "furthest_reservation", "spots_text", "spots",
+                 "price_text", "price_min", "price_max", "address", "city", "amenities", "paid_amenities",
+                 "instructions", "max_height_text", "max_height_ft", "passes", "lot_type", "overnight",
+                 "nearby_lifts", "nearby_restaurants", "nearby_shops", "nearby_ski_school", "text")
+
+    def __init__(self, name, summary, fields, text):
+        self.name = name
+        self.summary = summary
+        self.text = text
+        for attr in set(LOT_FIELDS.values()):
+            value = fields.get(attr, "")
+            setattr(self, attr, _split_list(value) if attr in _LIST_FIELDS else value)
+
+        prices = [float(p) for p in re.findall(r"\$(\d+(?:\.\d+)?)", self.price_text)]
+        self.price_min = min(prices) if prices else None
+        self.price_max = max(prices) if prices else None
+        spots = re.search(r"\d+", self.spots_text)
+        self.spots = int(spots.group()) if spots else None
+        height = re.search(r"(\d+(?:\.\d+)?)\s*ft", self.max_height_text)
+        self.max_height_ft = float(height.group(1)) if height else None
+        self.city = _city_from_address(self.address)
+        terms = f"{self.price_text} {self.lot_type}".lower()
+        self.overnight = "overnight" in terms and "no overnight" not in terms
+
+    def __repr__(self):
+        return f"Lot({self.name!r}, {self.city!r}, ${self.price_min})"
+
+
+class FaqEntry:
+    __slots__ = ("category", "question", "answer", "text")
+
+    def __init__(self, category, question, answer, text):
+        self.category = category
+        self.question = question
+        self.answer = answer
+        self.text = text
+
+    def __repr__(self):
+        return f"FaqEntry({self.question!r})"
+
+
+class CalendarEntry:
+    """
+    A dated record from the calendar JSON: a ski season, a summer operating
+    period, an event, a holiday or a school break. `end` is inclusive and
+    equals `start` for one-day entries; `days` restricts it to certain
+    weekdays (e.g. ("Sunday",) for a weekly market), empty meaning every day.
+    """
+    __slots__ = ("kind", "name", "start", "end", "location", "details", "days", "hours")
+
+    def __init__(self, kind, name, start, end=None, location=None, details=None, days=(), hours=None):
+        self.kind = kind
+        self.name = name
+        self.start = start
+        self.end = end or start
+        self.location = location
+        self.details = details
+        self.days = tuple(days)
+        self.hours = hours
+
+    def __repr__(self):
+        return f"CalendarEntry({self.kind!r}, {self.name!r}, {self.start}..{self.end})"
+
+
+class KnowledgeBase:
+    """
+    Structured view of knowledge_base.txt: typed lot, FAQ and calendar
+    records with lookup indexes, plus the retrieval chunks.
+    """
+
+    def __init__(self, lots, faqs, calendar, lift_hours, chunks, source_hash=None):
+        self.lots = lots
+        self.faqs = faqs
+        self.calendar = calendar
+        self.lift_hours = lift_hours
+        self.chunks = chunks
+        self.source_hash = source_hash
+
+        self._by_name = {_name_key(lot.name): lot for lot in lots}
+        self._by_city = {}
+        self._by_amenity = {}
+        for lot in lots:
+            self._by_city.setdefault(_name_key(lot.city), []).append(lot)
+            for amenity in lot.amenities + lot.paid_amenities:
+                self._by_amenity.setdefault(amenity.lower(), []).append(lot)
+        self._by_price = sorted((lot for lot in lots if lot.price_min is not None), key=lambda lot: lot.price_min)
+
+    def lot(self, name):
+        """The lot with this name, ignoring case and punctuation, or None."""
+        return self._by_name.get(_name_key(name))
+
+    def lots_in_city(self, city):
+        return list(self._by_city.get(_name_key(city), ()))
+
+    def lots_by_price(self, max_price=None, min_price=None):
+        """Lots whose cheapest daily rate falls within the bounds, cheapest first."""
+        return [
+            lot for lot in self._by_price
+            if (max_price is None or lot.price_min <= max_price)
+            and (min_price is None or lot.price_min >= min_price)
+        ]
+
+    def lots_with_amenity(self, term):
+        """Lots offering an amenity (free or paid) that mentions `term`, e.g. "wifi" or "valet"."""
+        term = term.lower()
+        found = []
+        for amenity, lots in self._by_amenity.items():
+            if term in amenity:
+                found.extend(lot for lot in lots if lot not in found)
+        return found
+
+    def stats(self):
+        return {
+            "lots": len(self.lots),
+            "faqs": len(self.faqs),
+            "calendar_entries": len(self.calendar),
+            "chunks": len(self.chunks),
+        }
+
+
+def parse_knowledge_base(text):
+    """
+    Parse the raw knowledge_base.txt. Chunks come out in file order: "lot"
+    blocks, "coupons", one "faq" chunk per Q/A pair, "links", "policy"
+    sections of the parking and troubleshooting guides, and one "calendar"
+    chunk per top-level key of the trailing JSON.
+    """
+    body, calendar = _split_calendar(text)
+    lines = body.splitlines()
+
+    def index_of(header, default):
+        for i, line in enumerate(lines):
+            if line.strip() == header:
+                return i
+        logging.warning(f"Knowledge base section '{header}' not found")
+        return default
+
+    end = len(lines)
+    lots_at = index_of(LOTS_HEADER, -1)
+    coupons_at = index_of(COUPONS_HEADER, end)
+    faq_at = index_of(FAQ_HEADER, end)
+    links_at = index_of(LINKS_HEADER, end)
+
+    lots = _parse_lots(lines[lots_at + 1:coupons_at])
+    faqs = _parse_faqs(lines[faq_at + 1:links_at], "FAQ")
+    links, guide = _split_links(lines[links_at:])
+    guide_chunks, guide_faqs = _guide_chunks(guide)
+
+    chunks = [Chunk("lot", lot.name, lot.text) for lot in lots]
+    chunks += _block_chunk("coupons", "Spotsurfer Coupon Codes", lines[coupons_at:faq_at])
+    chunks += [_faq_chunk(faq) for faq in faqs]
+    chunks += _block_chunk("links", "Helpful Spotsurfer Links", links)
+    chunks += guide_chunks
+    chunks += _calendar_chunks(calendar)
+
+    # The file repeats a few FAQ entries; keep each text once
+    seen = set()
+    chunks = [chunk for chunk in chunks if not (chunk.text in seen or seen.add(chunk.text))]
+    seen = set()
+    faqs = [faq for faq in faqs + guide_faqs if not (faq.text in seen or seen.add(faq.text))]
+
+    entries, lift_hours = _parse_calendar(calendar or {})
+    source_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return KnowledgeBase(lots, faqs, entries, lift_hours, chunks, source_hash)
+
+
+def load_knowledge(path, snapshot_path=None):
+    """
+    Load the knowledge base from `path`, reusing the pickled snapshot at
+    `snapshot_path` when it was built from the same file contents. A stale
+    or unreadable snapshot is rebuilt. Returns an empty KnowledgeBase if the
+    source can't be read.
+    """
+    try:
+        with open(path, "r") as f:
+            text = f.read()
+    except OSError as e:
+        logging.error(f"Error loading knowledge base: {e}")
+        text = ""
+    source_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    if snapshot_path:
+        knowledge = _read_snapshot(snapshot_path, source_hash)
+        if knowledge is not None:
+            return knowledge
+
+    knowledge = parse_knowledge_base(text)
+    if snapshot_path and text:
+        _write_snapshot(snapshot_path, knowledge)
+    return knowledge
+
+
+class KnowledgeWatcher:
+    """
+    Keeps a built view of the knowledge base in sync with its file. `build`
+    turns a KnowledgeBase into whatever the app serves from (records plus
+    indexes); it runs on the watcher thread, and the result replaces
+    `current` in a single assignment, so requests keep using the version they
+    started with and never see a half-built one. A change is only picked up
+    once the file has stopped changing for one poll, so half-saved edits are
+    skipped, and a reload that comes out empty keeps the previous version.
+    """
+
+    def __init__(self, path, build, snapshot_path=None, interval=5.0):
+        self.path = path
+        self.build = build
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.loaded_at = time.time()
+        self._stamp = self._file_stamp()
+        self._pending = None
+        self._knowledge = load_knowledge(path, snapshot_path)
+        self.current = build(self._knowledge)
+        self._thread = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reload if the file changed and has settled. Returns True when a new version was swapped in."""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            self._pending = None
+            return False
+        if stamp != self._pending:
+            # Changed since the last poll; wait until the writer is done
+            self._pending = stamp
+            return False
+
+        self._stamp, self._pending = stamp, None
+        knowledge = load_knowledge(self.path, self.snapshot_path)
+        if knowledge.source_hash == self._knowledge.source_hash:
+            return False
+        if not knowledge.chunks and self._knowledge.chunks:
+            self.failures += 1
+            logging.warning(f"Knowledge base reload from {self.path} came out empty; keeping the current version")
+            return False
+
+        state = self.build(knowledge)
+        self._knowledge = knowledge
+        self.current = state
+        self.reloads += 1
+        self.loaded_at = time.time()
+        logging.info(f"Knowledge base reloaded: {knowledge.stats()}")
+        return True
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._watch, name="knowledge-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"Knowledge base reload failed: {e}")
+
+    def stats(self):
+        return {
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "loaded_at": self.loaded_at,
+            "interval": self.interval,
+        }
+
+
+def _read_snapshot(snapshot_path, source_hash):
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable knowledge base snapshot {snapshot_path}: {e}")
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("source_hash") != source_hash:
+        return None
+    return snapshot["knowledge"]
+
+
+def _write_snapshot(snapshot_path, knowledge):
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "source_hash": knowledge.source_hash,
+                         "knowledge": knowledge}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic on POSIX, so concurrent workers never read a half-written file
+        os.replace(tmp_path, snapshot_path)
+    except OSError as e:
+        logging.warning(f"Could not write knowledge base snapshot {snapshot_path}: {e}")
+
+
+def _name_key(name):
+    return re.sub(r"[^a-z0-9]+", " ", str(name or "").lower()).strip()
+
+
+def _split_list(value):
+    """
+    Split "a, b - c" style lists. Multi-line lists (the longer shop lists)
+    have one "Name – description" item per line. "N/A ..." means none.
+    """
+    lines = [line for line in value.splitlines() if line.strip()]
+    parts = [line.split(" – ")[0] for line in lines] if len(lines) > 1 else re.split(r",|\s+-\s+", value)
+    items = tuple(part.strip(" .") for part in parts if part.strip(" ."))
+    return () if not items or items[0].upper().startswith("N/A") else items
+
+
+def _city_from_address(address):
+    # "715 W Lionshead Cir, Vail, CO 81657" or "675 LionsHead Pl Vail, CO 81657"
+    parts = [part.strip() for part in address.split(",")]
+    if len(parts) >= 3:
+        return parts[-2]
+    if len(parts) == 2 and parts[0]:
+        return parts[0].split()[-1]
+    return None
+
+
+def _humanize(key):
+    return key.replace("_", " ").title()
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        logging.warning(f"Knowledge base calendar has an invalid date: {value!r}")
+        return None
+
+def _split_calendar(text):
+    start = text.find("\n{")
+    if start == -1:
+        return text, None
+    try:
+        return text[:start], json.loads(text[start + 1:])
+    except ValueError as e:
+        logging.warning(f"Knowledge base calendar JSON could not be parsed: {e}")
+        return text, None
+
+
+def _block_chunk(kind, title, lines):
+    text = "\n".join(line.rstrip() for line in lines).strip()
+    return [Chunk(kind, title, text)] if text else []
+
+
+def _parse_lots(lines):
+    """Each lot starts on an unindented line; its fields are indented below it."""
+    lots = []
+    block = []
+    for line in lines:
+        if line.strip() and not line[0].isspace():
+            lots += _parse_lot(block)
+            block = []
+        block.append(line)
+    lots += _parse_lot(block)
+    return lots
+
+
+def _parse_lot(block):
+    lines = [line.rstrip() for line in block if line.strip()]
+    if not lines:
+        return []
+    # Headers look like "Evergreen Lodge - $30/day - Self Parking"; the name comes first
+    header = re.split(r"\s+-\s+", lines[0].strip(), maxsplit=1)
+    name = header[0].rstrip(":")
+    summary = header[1] if len(header) > 1 else ""
+
+    parts = _FIELD_LABEL.split("\n".join(lines[1:]))
+    fields = {}
+    for label, value in zip(parts[1::2], parts[2::2]):
+        fields.setdefault(LOT_FIELDS[label], "\n".join(line.strip() for line in value.strip().splitlines()))
+    return [Lot(name, summary, fields, "\n".join(lines))]
+
+
+def _parse_faqs(lines, category):
+    faqs = []
+    entry = []
+
+    def flush():
+        if entry:
+            # A few questions carry their answer on the same line after a run of spaces
+            question, *inline_answer = re.split(r"\s{3,}", entry[0][2:].strip(), maxsplit=1)
+            answers = inline_answer + [line[2:] if line.startswith("A:") else line for line in entry[1:]]
+            answer = " ".join(part.strip() for part in answers if part.strip())
+            faqs.append(FaqEntry(category, question, answer, "\n".join(entry)))
+            entry.clear()
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("Q:"):
+            flush()
+            entry.append(line)
+        elif entry and (line.startswith("A:") or raw[0].isspace()):
+            # Indented lines continue the answer above them
+            entry.append(line)
+        elif entry and len(entry) > 1:
+            # Anything else after an answer is the next category heading
+            flush()
+            category = line
+        elif not entry:
+            category = line
+    flush()
+    return faqs
+
+
+def _faq_chunk(faq):
+    return Chunk("faq", f"{faq.category}: {faq.question}", faq.text)
+
+
+def _split_links(lines):
+    for i, line in enumerate(lines[1:], 1):
+        if line.strip() and "http" not in line:
+            return lines[:i], lines[i:]
+    return lines, []
+
+
+def _looks_like_heading(line):
+    return (len(line) < 60 and ":" not in line
+            and line[0].isupper() and (line[-1].isalnum() or line[-1] == ")"))
+
+
+def _guide_chunks(lines):
+    """
+    Group the free-form guides into sections under their headings. A run of
+    heading-like lines is one heading followed by list items (e.g. the event
+    weeks list). Returns (chunks, faqs): embedded Q/A pairs become FAQ
+    records and chunks.
+    """
+    sections = []
+    previous_was_heading = False
+    for raw in lines:
+        line = raw.strip()
+        if not line or set(line) == {"-"}:
+            continue
+        heading = _looks_like_heading(line)
+        if heading and not previous_was_heading or not sections:
+            sections.append((line, []))
+        else:
+            sections[-1][1].append(line)
+        previous_was_heading = heading
+
+    chunks = []
+    faqs = []
+    for title, body in sections:
+        if not body:
+            continue
+        if any(line.startswith("Q:") for line in body):
+            section_faqs = _parse_faqs(body, title)
+            faqs += section_faqs
+            chunks += [_faq_chunk(faq) for faq in section_faqs]
+            continue
+        part = []
+        for line in body:
+            if part and len("\n".join(part)) + len(line) > MAX_CHUNK_CHARS:
+                chunks.append(Chunk("policy", title, "\n".join([title] + part)))
+                part = []
+            part.append(line)
+        if part:
+            chunks.append(Chunk("policy", title, "\n".join([title] + part)))
+    return chunks, faqs
+
+
+def _calendar_chunks(calendar):
+    if not calendar:
+        return []
+    return [
+        Chunk("calendar", key, f"{key}: {json.dumps(value, indent=1)}")
+        for key, value in calendar.items()
+    ]
+
+
+def _parse_calendar(calendar):
+    """Flatten the calendar JSON into CalendarEntry records plus the winter lift hours table."""
+    entries = []
+    for mountain, season in calendar.get("winter_ski_season", {}).items():
+        entries.append(CalendarEntry("ski_season", f"{_humanize(mountain)} ski season",
+                                     _parse_date(season.get("opening_day")), _parse_date(season.get("closing_day")),
+                                     location=_humanize(mountain)))
+    for mountain, periods in calendar.get("summer_operations", {}).items():
+        for period, info in periods.items():
+            days = ("Saturday", "Sunday") if period == "weekends_only" else ()
+            entries.append(CalendarEntry("summer_operations", f"{_humanize(mountain)} summer operations",
+                                         _parse_date(info.get("start_date")), _parse_date(info.get("end_date")),
+                                         location=_humanize(mountain), days=days, hours=info.get("hours")))
+    for event in calendar.get("events", []):
+        days = (event["recurring_day"],) if event.get("recurring_day") else ()
+        entries.append(CalendarEntry("event", event.get("name"), _parse_date(event.get("start_date")),
+                                     _parse_date(event.get("end_date")), location=event.get("location"),
+                                     details=event.get("details"), days=days))
+    for holiday in calendar.get("holidays", []):
+        entries.append(CalendarEntry("holiday", holiday.get("name"), _parse_date(holiday.get("start_date")),
+                                     _parse_date(holiday.get("end_date")), details=holiday.get("notes")))
+    for school_break in calendar.get("school_breaks", []):
+        entries.append(CalendarEntry("school_break", school_break.get("district"),
+                                     _parse_date(school_break.get("start_date")),
+                                     _parse_date(school_break.get("end_date")), details=school_break.get("notes")))
+
+    lift_hours = {
+        _humanize(mountain): {_humanize(lift): hours for lift, hours in lifts.items()}
+        for mountain, lifts in calendar.get("winter_lift_hours", {}).items()
+    }
+    return [entry for entry in entries if entry.start], lift_hours
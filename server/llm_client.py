@@ -0,0 +1,215 @@
+# llm_client.py
+
+import asyncio
+import random
+import threading
+import time
+import openai
+from deadline import LLM_CALL_TIMEOUT, MIN_STEP_SECONDS
+
+# Errors worth another attempt; anything else means the request itself is bad
+RETRYABLE_ERRORS = (
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain,
+)
+
+
+def is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.error.APIError) and (error.http_status or 500) >= 500
+
+
+class LLMUnavailable(Exception):
+    """No answer from the LLM: the circuit is open, time ran out, or every attempt failed."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling OpenAI after `failure_threshold` consecutive transient
+    failures. While open, calls are refused straight away; after
+    `reset_after` seconds one probe call is let through, and its outcome
+    closes the circuit again or re-opens it for another period.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_after=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def _cooled_down(self):
+        return self.clock() - self.opened_at >= self.reset_after
+
+    def available(self):
+        """Whether a call could go through now, without claiming the probe."""
+        with self._lock:
+            return self.state == self.CLOSED or (self.state == self.OPEN and self._cooled_down())
+
+    def allow(self):
+        """Whether this call may go ahead; in the half-open state only the one probe may."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._cooled_down():
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def abandon(self):
+        """The call never finished (e.g. cancelled); let the next caller probe instead."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+class LLMClient:
+    """
+    OpenAI chat completions with a timeout per attempt, jittered exponential
+    backoff between retries of transient errors, and a circuit breaker
+    shared by every request. All attempts together stay within the budget
+    the caller passes in; when no answer is possible in it, LLMUnavailable
+    is raised so the caller can fall back instead of holding a worker.
+    """
+
+    def __init__(self, breaker, attempts=3, call_timeout=LLM_CALL_TIMEOUT, backoff=0.25, max_backoff=2.0):
+        self.breaker = breaker
+        self.attempts = attempts
+        self.call_timeout = call_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def available(self):
+        return self.breaker.available()
+
+    def _start(self, until):
+        """Timeout for the next attempt, or LLMUnavailable when it mustn't run."""
+        remaining = until - time.monotonic()
+        if remaining < MIN_STEP_SECONDS:
+            raise LLMUnavailable("LLM budget exhausted")
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise LLMUnavailable("LLM circuit open")
+        with self._lock:
+            self.calls += 1
+        return min(self.call_timeout, remaining)
+
+    def _failed(self, error, attempt, until):
+        """Seconds to wait before retrying after `error`, or LLMUnavailable when giving up."""
+        if not is_retryable(error):
+            # This request just can't succeed. It says nothing about OpenAI's
+            # health either way, so only give up the half-open probe slot
+            self.breaker.abandon()
+            with self._lock:
+                self.failures += 1
+            raise LLMUnavailable(f"LLM request rejected: {error}") from error
+        self.breaker.record_failure()
+        # Full jitter, so callers that failed together don't retry together
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if attempt + 1 >= self.attempts or until - time.monotonic() - delay < MIN_STEP_SECONDS:
+            with self._lock:
+                self.failures += 1
+            raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempt(s): {error}") from error
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def create(self, request, budget, **kwargs):
+        """openai.ChatCompletion.create(**request) within `budget` seconds."""
+        until = time.monotonic() + budget
+        attempt = 0
+        while True:
+            timeout = self._start(until)
+            try:
+                response = openai.ChatCompletion.create(**dict(request, request_timeout=timeout), **kwargs)
+            except Exception as e:
+                time.sleep(self._failed(e, attempt, until))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return response
+
+    async def acreate(self, request, budget, **kwargs):
+        """Async create(); backoff sleeps don't block the event loop."""
+        until = time.monotonic() + budget
+        attempt = 0
+        while True:
+            timeout = self._start(until)
+            try:
+                response = await openai.ChatCompletion.acreate(**dict(request, request_timeout=timeout), **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt, until))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def _stream_failed(self, error):
+        # Already streaming, so retrying would repeat text the client has seen
+        self.breaker.record_failure()
+        with self._lock:
+            self.failures += 1
+        return LLMUnavailable(f"LLM stream broke off: {error}")
+
+    def stream(self, request, budget):
+        """Yield streamed chunks; only opening the stream is retried."""
+        response = self.create(request, budget, stream=True)
+        try:
+            for chunk in response:
+                yield chunk
+        except Exception as e:
+            raise self._stream_failed(e) from e
+
+    async def astream(self, request, budget):
+        response = await self.acreate(request, budget, stream=True)
+        try:
+            async for chunk in response:
+                yield chunk
+        except Exception as e:
+            raise self._stream_failed(e) from e
+
+    def stats(self):
+        with self._lock:
+            stats = {"calls": self.calls, "retries": self.retries, "failures": self.failures,
+                     "rejected": self.rejected}
+        stats["breaker"] = self.breaker.stats()
+        return stats
@@ -1,39 +1,222 @@
 # location_extraction.py
 
+import math
 import re
+import threading
 
-# A dictionary of known landmarks and SpotSurfer facilities with coordinates
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional; distance_matrix() falls back to plain Python
+    np = None
+
+EARTH_RADIUS_MILES = 3956
+
+# A dictionary of known landmarks and SpotSurfer facilities with coordinates and the town they're in
 KNOWN_LOCATIONS = {
-    "Arrabelle Valet": {"lat": 39.6404, "lng": -106.3742},
-    "Lionshead Village": {"lat": 39.6415, "lng": -106.3780},
-    "Vail Village": {"lat": 39.6400, "lng": -106.3740},
-    "Vail Daily building": {"lat": 39.6408, "lng": -106.3792},
-    "63 Willow Place": {"lat": 39.6390, "lng": -106.3735},
-    "Bluebird Parking": {"lat": 39.6422, "lng": -106.3795},
+    "Arrabelle Valet": {"lat": 39.6404, "lng": -106.3742, "city": "Vail"},
+    "Lionshead Village": {"lat": 39.6415, "lng": -106.3780, "city": "Vail"},
+    "Vail Village": {"lat": 39.6400, "lng": -106.3740, "city": "Vail"},
+    "Vail Daily building": {"lat": 39.6408, "lng": -106.3792, "city": "Vail"},
+    "63 Willow Place": {"lat": 39.6390, "lng": -106.3735, "city": "Vail"},
+    "Bluebird Parking": {"lat": 39.6422, "lng": -106.3795, "city": "Vail"},
     # Add more known locations here...
 }
 
+# Other ways people write the names above, common misspellings included
+LOCATION_ALIASES = {
+    "Arabelle": "Arrabelle Valet",
+    "Arrabelle": "Arrabelle Valet",
+    "Arrabelle at Vail Square": "Arrabelle Valet",
+    "Lionshead": "Lionshead Village",
+    "Lions Head": "Lionshead Village",
+    "Lionhead": "Lionshead Village",
+    "Lionshead Village Vail": "Lionshead Village",
+    "Vail Vilage": "Vail Village",
+    "Willow Place": "63 Willow Place",
+    "63 Willow Pl": "63 Willow Place",
+    "Blue Bird Parking": "Bluebird Parking",
+}
+
+# Trailing words people tend to leave off ("the Arrabelle" rather than "Arrabelle Valet")
+_GENERIC_SUFFIXES = ("valet", "parking", "building", "garage", "lot")
+
+
+class LocationMatch:
+    """One mention of a known location: its canonical name and where it sits in the text."""
+    __slots__ = ("name", "start", "end", "text")
+
+    def __init__(self, name, start, end, text):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.text = text
+
+    @property
+    def span(self):
+        return self.start, self.end
+
+    def __repr__(self):
+        return f"LocationMatch({self.name!r}, {self.start}, {self.end})"
+
+
+def _normalize(name):
+    return " ".join(re.sub(r"[\s\-]+", " ", name.lower()).split())
+
+
+def _trie_pattern(node):
+    """
+    Regex for every word in a character trie. Shared prefixes are written
+    once, so the alternation costs about one trie walk per text position
+    however many names there are; optional tails are greedy, so the longest
+    name wins.
+    """
+    branches = []
+    for char, child in sorted(node.items()):
+        if char:
+            # Spaces in a name match any run of spaces or hyphens ("Lions-Head", "Vail  Village")
+            piece = r"[\s\-]+" if char == " " else re.escape(char)
+            branches.append(piece + _trie_pattern(child))
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+class LocationMatcher:
+    """
+    Finds every known location named in a message in one pass. All names,
+    aliases and misspellings are compiled once into a single word-bounded
+    pattern built from a trie of their spellings. `update()` and
+    `set_lots()` rebuild it and swap it in whole, so readers never see a
+    half-built matcher.
+
+    A name shortened by dropping a generic suffix ("Bluebird" for "Bluebird
+    Parking") is only matched while it points at one place: when a lot in
+    another town starts with the same words ("BlueBird Ski Lockers" in Avon)
+    the full name is required.
+    """
+
+    def __init__(self, locations, aliases=None):
+        self._lock = threading.Lock()
+        self.locations = {}
+        self.aliases = {}
+        self.lots = {}
+        self._pattern = None
+        self._spellings = {}
+        self.update(locations, aliases)
+
+    def update(self, locations, aliases=None):
+        """Add or replace locations and aliases, then rebuild the pattern."""
+        with self._lock:
+            self._rebuild(dict(self.locations, **locations), dict(self.aliases, **(aliases or {})), self.lots)
+
+    def set_lots(self, lots):
+        """Replace the lots short names are checked against; `lots` are (name, city) pairs."""
+        with self._lock:
+            self._rebuild(self.locations, self.aliases, {_normalize(name): (name, _normalize(city or ""))
+                                                         for name, city in lots})
+
+    def lot(self, text):
+        """The name of the lot `text` spells out (any case or spacing), else None."""
+        found = self.lots.get(_normalize(text))
+        return found[0] if found else None
+
+    @staticmethod
+    def _ambiguous(stem, city, lots):
+        """Whether a lot outside `city` starts with `stem`."""
+        return any((key == stem or key.startswith(stem + " ")) and lot_city and lot_city != city
+                   for key, (_, lot_city) in lots.items())
+
+    def _rebuild(self, locations, aliases, lots):
+        spellings = {}
+        for name, details in locations.items():
+            spellings[_normalize(name)] = name
+            words = name.split()
+            if len(words) > 1 and words[-1].lower() in _GENERIC_SUFFIXES:
+                stem = _normalize(" ".join(words[:-1]))
+                if not self._ambiguous(stem, _normalize(details.get("city", "")), lots):
+                    spellings.setdefault(stem, name)
+        for alias, name in aliases.items():
+            if name in locations:
+                spellings[_normalize(alias)] = name
+
+        trie = {}
+        for spelling in spellings:
+            node = trie
+            for char in spelling:
+                node = node.setdefault(char, {})
+            node[""] = True
+        pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE) if spellings else None
+
+        self.locations, self.aliases, self.lots = locations, aliases, lots
+        self._spellings, self._pattern = spellings, pattern
+
+    def matches(self, text):
+        """Every known location mention in `text`, in order, as LocationMatch spans."""
+        pattern, spellings = self._pattern, self._spellings
+        if pattern is None or not text:
+            return []
+        return [LocationMatch(spellings[_normalize(m.group())], m.start(), m.end(), m.group())
+                for m in pattern.finditer(text)]
+
+    def find(self, text):
+        """{canonical name: coordinates} for the locations named in `text`, in order of first mention."""
+        found = {}
+        for match in self.matches(text):
+            found.setdefault(match.name, self.locations[match.name])
+        return found
+
+
+known_locations = LocationMatcher(KNOWN_LOCATIONS, LOCATION_ALIASES)
+
+
 def find_known_locations(text):
-    """Scan text for known location names using regex"""
-    found = {}
-    for name in KNOWN_LOCATIONS:
-        if re.search(re.escape(name), text, re.IGNORECASE):
-            found[name] = KNOWN_LOCATIONS[name]
-    return found
+    """Scan text for known location names, aliases and misspellings"""
+    return known_locations.find(text)
+
+
+def find_location_spans(text):
+    """Like find_known_locations(), but every mention with its (start, end) span."""
+    return known_locations.matches(text)
+
+
+def haversine_miles(lat1, lng1, lat2, lng2):
+    """Great-circle distance in miles between two points."""
+    lat1, lng1, lat2, lng2 = math.radians(lat1), math.radians(lng1), math.radians(lat2), math.radians(lng2)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * math.asin(math.sqrt(a)) * EARTH_RADIUS_MILES
+
+
+def distance_matrix(origins, destinations=None):
+    """
+    Miles from every (lat, lng) in `origins` to every one in `destinations`
+    (default: `origins` itself), as a list of rows. With NumPy this is one
+    broadcast haversine over the whole grid; without it, each point's
+    radians and cosine are still worked out only once.
+    """
+    destinations = origins if destinations is None else destinations
+    if not origins or not destinations:
+        return [[] for _ in origins]
+    if np is not None:
+        lat1, lng1 = np.radians(np.asarray(origins, dtype=float)).T
+        lat2, lng2 = np.radians(np.asarray(destinations, dtype=float)).T
+        a = (np.sin((lat2[None, :] - lat1[:, None]) / 2) ** 2
+             + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin((lng2[None, :] - lng1[:, None]) / 2) ** 2)
+        return (2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_MILES).tolist()
+
+    def prepared(points):
+        return [(math.radians(lat), math.radians(lng), math.cos(math.radians(lat))) for lat, lng in points]
+
+    rows = []
+    targets = prepared(destinations)
+    for lat1, lng1, cos1 in prepared(origins):
+        rows.append([2 * math.asin(math.sqrt(min(1.0, math.sin((lat2 - lat1) / 2) ** 2
+                                                + cos1 * cos2 * math.sin((lng2 - lng1) / 2) ** 2)))
+                     * EARTH_RADIUS_MILES
+                     for lat2, lng2, cos2 in targets])
+    return rows
+
 
 def get_distance(loc1, loc2):
     """Calculate distance in miles using haversine formula"""
-    from math import radians, cos, sin, asin, sqrt
-    lon1, lat1 = loc1["lng"], loc1["lat"]
-    lon2, lat2 = loc2["lng"], loc2["lat"]
-
-    # convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-
-    # haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    r = 3956  # Radius of earth in miles
-    return round(c * r, 2)
+    return round(haversine_miles(loc1["lat"], loc1["lng"], loc2["lat"], loc2["lng"]), 2)
@@ -1,16 +1,35 @@
 import os
 import logging
 import openai
-import re
 import requests
 import time
 import json
-from flask import Flask, request, jsonify, send_from_directory
+import threading
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
-from weather import WeatherService
-from traffic import TrafficService
-from location_extraction import find_known_locations, get_distance
+from weather import WeatherService, AsyncWeatherService, WEATHER_CACHE_TTL
+from traffic import TrafficService, AsyncTrafficService
+from location_extraction import KNOWN_LOCATIONS, distance_matrix, find_known_locations, known_locations
+from spatial_index import GridIndex, Place
+from gazetteer import Gazetteer
+from place_parser import MY_LOCATION, PlaceParser
+from fanout import TaskGraph
+from response_cache import CACHED, COMPUTED, ResponseCache, freshness_window
+from cache import TTLCache, TieredCache, coords_bucket, normalize_place_key, parse_coords, run_blocking, shared_cache_from_env
+from geocode_store import MISS, forward_key, geocode_store_from_env, reverse_key
+from request_context import LookupContext, lookup_totals
+from knowledge_base import KnowledgeWatcher
+from retrieval import BM25Index
+from calendar_index import CalendarIndex
+from faq_match import FAQ_MATCH_THRESHOLD, FaqMatcher
+from prompt_prefix import build_prompt_prefix, prefix_digest
+from prompt_budget import PROMPT_TOKEN_BUDGET, PromptBudget, Section, ends_first
+from model_router import ModelRouter, ModelTier
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailable
+from deadline import (ASK_BUDGET_SECONDS, LLM_RESERVE_SECONDS, LLM_CALL_TIMEOUT, GEOCODE_TIMEOUT, Deadline,
+                      DeadlineExceeded, MIN_STEP_SECONDS)
+from concurrent.futures import ThreadPoolExecutor
 from pywebpush import webpush, WebPushException
 import markdown2
 import datetime
@@ -29,227 +48,614 @@ VAPID_PUBLIC_KEY = os.getenv('VAPID_PUBLIC_KEY')
 VAPID_PRIVATE_KEY = os.getenv('VAPID_PRIVATE_KEY')
 VAPID_CLAIMS = {"sub": "mailto:austin@spotsurfer.com"}
 
+# Answers that embed no weather or traffic only go stale with the date and knowledge base
+ANSWER_STATIC_TTL = int(os.getenv('ANSWER_STATIC_TTL', 3600))
+
+# Latency budget for /ask: enrichment gets what's left after the LLM's reserve
+ASK_BUDGET_SECONDS = float(os.getenv('ASK_BUDGET_SECONDS', ASK_BUDGET_SECONDS))
+LLM_RESERVE_SECONDS = float(os.getenv('LLM_RESERVE_SECONDS', LLM_RESERVE_SECONDS))
+
 # Initialize services
-weather_service = WeatherService(weather_api_key)
-traffic_service = TrafficService(maps_api_key)
+# Weather is cached in-process (LRU+TTL) and optionally in a shared tier, see cache.py
+weather_cache = TieredCache(
+    TTLCache(maxsize=int(os.getenv('WEATHER_CACHE_SIZE', 512)),
+             ttl=int(os.getenv('WEATHER_CACHE_TTL', WEATHER_CACHE_TTL))),
+    shared_cache_from_env(),
+    prefix="weather:"
+)
+# Finished /ask answers, reused while the real-time data they embed is still fresh
+answer_cache = ResponseCache(TieredCache(
+    TTLCache(maxsize=int(os.getenv('ANSWER_CACHE_SIZE', 1024)), ttl=ANSWER_STATIC_TTL),
+    shared_cache_from_env(),
+    prefix="answer:"
+))
+# Last good answer per question and place, served when the LLM is unavailable
+answer_fallbacks = TieredCache(
+    TTLCache(maxsize=int(os.getenv('ANSWER_CACHE_SIZE', 1024)), ttl=int(os.getenv('ANSWER_FALLBACK_TTL', 86400))),
+    shared_cache_from_env(),
+    prefix="answer-fallback:"
+)
+# Geocodes persist across restarts and workers (SQLite, GEOCODE_DB_PATH)
+geocode_store = geocode_store_from_env()
+# Towns, passes, airports and lots we know, resolved without the Geocoding API
+gazetteer = Gazetteer()
+# Origin, destination and weather location in one pass, checked against the gazetteer
+place_parser = PlaceParser(gazetteer)
+
+weather_service = WeatherService(weather_api_key, cache=weather_cache)
+traffic_service = TrafficService(maps_api_key, geocode_store=geocode_store)
+async_weather_service = AsyncWeatherService(weather_api_key, cache=weather_cache)
+async_traffic_service = AsyncTrafficService(maps_api_key, geocode_store=geocode_store)
+
+# One bounded pool shared by every request's upstream lookups
+lookup_pool = ThreadPoolExecutor(max_workers=int(os.getenv('LOOKUP_MAX_WORKERS', 16)),
+                                 thread_name_prefix="lookup")
 
 # Flask setup
 app = Flask(__name__, static_folder="client_build", static_url_path="/")
 CORS(app)
 
-# Load knowledge base
-def load_knowledge_base():
+# Knowledge base: parsed lot, FAQ and calendar records, cached as a snapshot
+KNOWLEDGE_BASE_PATH = os.getenv('KNOWLEDGE_BASE_PATH', 'knowledge_base.txt')
+KB_SNAPSHOT_PATH = os.getenv('KB_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              'knowledge_base.snapshot'))
+KB_RELOAD_INTERVAL = float(os.getenv('KB_RELOAD_INTERVAL', 5))
+
+# Prompts carry only the knowledge base chunks relevant to each question
+KB_TOP_K = int(os.getenv('KB_TOP_K', 6))
+# Questions this close to a stored FAQ (0-100) get its answer without an LLM call
+FAQ_MATCH_THRESHOLD = float(os.getenv('FAQ_MATCH_THRESHOLD', FAQ_MATCH_THRESHOLD))
+
+# Input token budget per prompt; low-priority sections are trimmed to fit
+prompt_budget = PromptBudget(int(os.getenv('PROMPT_TOKEN_BUDGET', PROMPT_TOKEN_BUDGET)))
+
+# Simple lookups go to a faster model with a shorter reply; see model_router.py.
+# MODEL_TIER_OVERRIDE pins every question to one tier.
+model_router = ModelRouter([
+    ModelTier("fast", os.getenv('MODEL_FAST', 'gpt-4o-mini'), int(os.getenv('MODEL_FAST_MAX_TOKENS', 350))),
+    ModelTier("full", os.getenv('MODEL_FULL', 'gpt-4o'), int(os.getenv('MODEL_FULL_MAX_TOKENS', 700))),
+], default="full", override=os.getenv('MODEL_TIER_OVERRIDE') or None)
+
+# Per-attempt timeouts, jittered retries and a circuit breaker around OpenAI; see llm_client.py
+llm_client = LLMClient(
+    CircuitBreaker(failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', 5)),
+                   reset_after=float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30))),
+    attempts=int(os.getenv('LLM_MAX_ATTEMPTS', 3)),
+    call_timeout=float(os.getenv('LLM_CALL_TIMEOUT', LLM_CALL_TIMEOUT)),
+)
+# A looser FAQ match is still better than no answer while the LLM is down
+FAQ_FALLBACK_THRESHOLD = float(os.getenv('FAQ_FALLBACK_THRESHOLD', 75))
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+# Closest lots listed in the prompt when the user's position is known
+NEARBY_LOTS = int(os.getenv('NEARBY_LOTS', 3))
+NEARBY_MAX_MILES = float(os.getenv('NEARBY_MAX_MILES', 30))
+
+
+def _spatial_index(base):
+    """
+    GridIndex over every lot with known coordinates plus the KNOWN_LOCATIONS
+    landmarks that aren't lots, and the lots whose addresses haven't been
+    geocoded yet. A lot's coordinates come from an earlier geocode of its
+    address, else from KNOWN_LOCATIONS when its name matches one in the same
+    town (a lot in Avon named like a Vail landmark stays unresolved until
+    geocoded); nothing here calls an API.
+    """
+    places, matched, unresolved = [], {}, []
+    for lot in base.lots:
+        stored = geocode_store.lookup("coords", forward_key(lot.address)) if lot.address else None
+        if stored is MISS:
+            unresolved.append(lot)
+        coords = parse_coords(stored) if stored and stored is not MISS else None
+        known = next(iter(find_known_locations(lot.name)), None)
+        if known and _same_town(lot, KNOWN_LOCATIONS[known].get("city")):
+            matched[known] = lot.name
+            coords = coords or (KNOWN_LOCATIONS[known]["lat"], KNOWN_LOCATIONS[known]["lng"])
+        if coords:
+            places.append(Place(lot.name, *coords, kind="lot", address=lot.address))
+    for name, coords in KNOWN_LOCATIONS.items():
+        if name not in matched:
+            places.append(Place(name, coords["lat"], coords["lng"], kind="landmark"))
+    return GridIndex(places, aliases=matched), unresolved
+
+
+def _same_town(lot, city):
+    """Whether `lot` is in `city`; a lot or landmark with no town can't contradict a name match."""
+    if not lot.city or not city:
+        return True
+    return normalize_place_key(lot.city) == normalize_place_key(city)
+
+
+def _register_lots(index):
+    gazetteer.set_lots([(place.name, place.address, place.lat, place.lng)
+                        for place in index.places if place.kind == "lot"])
+
+
+class KnowledgeState:
+    """
+    Everything served from one version of knowledge_base.txt. Built off the
+    request path and swapped in whole by the watcher; a request takes one
+    state up front and uses it throughout.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        # Content hash, so every worker reports the same version for the same file
+        self.version = base.source_hash[:12]
+        # The dated calendar reaches the prompt through the daily calendar view instead
+        self.index = BM25Index([chunk for chunk in base.chunks if chunk.kind != "calendar"])
+        self.calendar = CalendarIndex(base.calendar, base.lift_hours)
+        self.faq = FaqMatcher(base.faqs, FAQ_MATCH_THRESHOLD)
+        # Identical for every prompt built from this version; see prompt_prefix.py
+        self.prompt_prefix = build_prompt_prefix(base)
+        # Before the spatial index, so lot names are matched against landmarks with this version's lots
+        known_locations.set_lots([(lot.name, lot.city) for lot in base.lots])
+        self.nearby, unresolved = _spatial_index(base)
+        _register_lots(self.nearby)
+        if unresolved and maps_api_key:
+            threading.Thread(target=self._locate_lots, args=(unresolved,), name="lot-geocoder", daemon=True).start()
+
+    def _locate_lots(self, lots):
+        """Geocode lot addresses once (results persist in the geocode store), then swap in a fuller index."""
+        for lot in lots:
+            key = forward_key(lot.address)
+            try:
+                data = requests.get(GEOCODE_URL, params={"address": lot.address, "key": maps_api_key},
+                                    timeout=GEOCODE_TIMEOUT).json()
+                if data['status'] == "OK" and data['results']:
+                    location = data['results'][0]['geometry']['location']
+                    geocode_store.store("coords", key, f"{location['lat']},{location['lng']}")
+                elif data['status'] == "ZERO_RESULTS":
+                    geocode_store.store("coords", key, None)
+            except Exception as e:
+                logging.warning(f"Failed to geocode lot address: {lot.address} - {e}")
+        self.nearby = _spatial_index(self.base)[0]
+        _register_lots(self.nearby)
+        logging.info(f"Lot spatial index rebuilt: {self.nearby.stats()}")
+
+    def stats(self):
+        return dict(self.base.stats(), version=self.version, index=self.index.stats(), faq=self.faq.stats(),
+                    nearby=self.nearby.stats(),
+                    prompt_prefix={"bytes": len(self.prompt_prefix.encode("utf-8")),
+                                   "digest": prefix_digest(self.prompt_prefix)})
+
+
+live_knowledge = KnowledgeWatcher(KNOWLEDGE_BASE_PATH, KnowledgeState, KB_SNAPSHOT_PATH,
+                                  interval=KB_RELOAD_INTERVAL).start()
+logging.info(f"Knowledge base loaded: {live_knowledge.current.stats()}")
+
+def reverse_geocode(lat, lng, api_key, timeout=None):
     try:
-        with open('knowledge_base.txt', 'r') as f:
-            return f.read()
+        key = reverse_key(lat, lng)
+        cached = geocode_store.lookup("locality", key)
+        if cached is not MISS:
+            return cached or f"{lat},{lng}"
+        url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
+        resp = requests.get(url, timeout=timeout or GEOCODE_TIMEOUT)
+        place = _store_reverse_geocode(key, resp.json())
+        if place:
+            return place
     except Exception as e:
-        logging.error(f"Error loading knowledge base: {e}")
-        return ""
-
-knowledge_base = load_knowledge_base()
+        logging.warning(f"Reverse geocoding failed for {lat},{lng}: {e}")
+    return f"{lat},{lng}"
 
-def reverse_geocode(lat, lng, api_key):
+async def reverse_geocode_async(lat, lng, api_key, timeout=None):
     try:
+        key = reverse_key(lat, lng)
+        cached = await geocode_store.alookup("locality", key)
+        if cached is not MISS:
+            return cached or f"{lat},{lng}"
         url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
-        resp = requests.get(url)
-        results = resp.json().get("results", [])
-        if results:
-            components = results[0]["address_components"]
-            for comp in components:
-                if "locality" in comp["types"]:
-                    return comp["long_name"]
-                if "administrative_area_level_2" in comp["types"]:
-                    return comp["long_name"]
-            # fallback
-            return results[0]["formatted_address"]
+        resp = await async_traffic_service.client.get(url, timeout=timeout or GEOCODE_TIMEOUT)
+        place = await run_blocking(_store_reverse_geocode, key, resp.json())
+        if place:
+            return place
     except Exception as e:
         logging.warning(f"Reverse geocoding failed for {lat},{lng}: {e}")
     return f"{lat},{lng}"
 
+def _parse_reverse_geocode(data):
+    results = data.get("results", [])
+    if results:
+        components = results[0]["address_components"]
+        for comp in components:
+            if "locality" in comp["types"]:
+                return comp["long_name"]
+            if "administrative_area_level_2" in comp["types"]:
+                return comp["long_name"]
+        # fallback
+        return results[0]["formatted_address"]
+    return None
+
+def _store_reverse_geocode(key, data):
+    place = _parse_reverse_geocode(data)
+    if place or data.get("status") == "ZERO_RESULTS":
+        geocode_store.store("locality", key, place)
+    return place
+
 # --- UTILITIES ---
-def normalize_location_name(place_name, api_key):
+def normalize_location_name(place_name, api_key, timeout=None):
+    entry = gazetteer.lookup(place_name)
+    if entry:
+        return entry.canonical
+    key = forward_key(place_name)
+    cached = geocode_store.lookup("forward", key)
+    if cached is not MISS:
+        return cached or place_name
     try:
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
-        params = {"address": place_name, "key": maps_api_key}
-        response = requests.get(url, params=params)
-        data = response.json()
-        if data['status'] == "OK" and data['results']:
-            return data['results'][0]['formatted_address']
+        params = {"address": place_name, "key": api_key or maps_api_key}
+        response = requests.get(GEOCODE_URL, params=params, timeout=timeout or GEOCODE_TIMEOUT)
+        address = _store_forward_geocode(key, response.json())
+        if address:
+            return address
     except Exception as e:
         logging.warning(f"Failed to normalize location: {place_name} - {e}")
     return place_name  # fallback to original if failure
 
+async def normalize_location_name_async(place_name, api_key, timeout=None):
+    entry = gazetteer.lookup(place_name)
+    if entry:
+        return entry.canonical
+    key = forward_key(place_name)
+    cached = await geocode_store.alookup("forward", key)
+    if cached is not MISS:
+        return cached or place_name
+    try:
+        params = {"address": place_name, "key": api_key or maps_api_key}
+        response = await async_traffic_service.client.get(GEOCODE_URL, params=params, timeout=timeout or GEOCODE_TIMEOUT)
+        address = await run_blocking(_store_forward_geocode, key, response.json())
+        if address:
+            return address
+    except Exception as e:
+        logging.warning(f"Failed to normalize location: {place_name} - {e}")
+    return place_name  # fallback to original if failure
 
-def extract_location_from_question(question):
-    match = re.search(r'(?:weather\s+(?:in|at|for)?\s*)([a-zA-Z\s]+)', question.lower())
-    if match:
-        return match.group(1).strip().title()
+def _store_forward_geocode(key, data):
+    # Only definite answers are cached; quota or auth errors must be retried
+    if data['status'] == "OK" and data['results']:
+        address = data['results'][0]['formatted_address']
+        geocode_store.store("forward", key, address)
+        return address
+    if data['status'] == "ZERO_RESULTS":
+        geocode_store.store("forward", key, None)
     return None
 
-def extract_origin_destination(text):
-    text = text.lower()
-
-    # Match full "from X to Y"
-    match = re.search(r'from ([^,.?]+?) to ([^,.?]+)', text)
-    if match:
-        return match.group(1).strip().title(), match.group(2).strip().title()
-
-    # Match just destination
-    match = re.search(r'\bto ([^,.?]+)', text)
-    if match:
-        return None, match.group(1).strip().title()
-
-    return None, None
 
+# --- PROMPT GENERATOR ---
 
+def _route_weather(stops, weather, **kwargs):
+    if not stops:
+        return None
+    # Returns a coroutine for the async service; the task graph awaits it
+    return weather.get_weather_along_route(stops, **kwargs)
 
-# --- PROMPT GENERATOR ---
 
-def generate_contextual_prompt(user_question, user_location=None, reservation_details=None):
-    weather_info = ""
-    traffic_info = ""
+def _plan_prompt_context(user_question, user_location=None, reservation_details=None, coords=None):
+    """
+    Work out which locations a question needs looked up, before any lookup
+    runs. `coords` is the user's (lat, lng) when the browser sent it.
+    """
     location_info = ""
 
-    inferred_location = extract_location_from_question(user_question)
-    effective_location = user_location or inferred_location
+    places = place_parser.parse(user_question)
+    effective_location = user_location or places.weather_location
 
-    # --- Fetch Weather for Effective Location ---
-    if effective_location:
-        try:
-            weather = weather_service.fetch_weather(effective_location)
-            if weather:
-                weather_info += f"\nUser Location Weather:\n{weather_service.format_weather_info(weather, effective_location)}\n"
-            else:
-                weather_info += f"\n⚠️ Weather data not available for {effective_location}.\n"
-        except Exception as e:
-            logging.warning(f"Weather API error for {effective_location}: {e}")
-            weather_info += f"\n⚠️ Could not fetch weather for {effective_location}.\n"
-
-    # --- Reservation Context ---
+    reservation_destination = None
     if reservation_details:
-        destination = reservation_details.get('destination')
+        reservation_destination = reservation_details.get('destination')
         reservation_date = reservation_details.get('date')
-        if destination:
-            try:
-                res_weather = weather_service.fetch_weather(destination)
-                if res_weather:
-                    weather_info += f"\nReservation Location Weather:\n{weather_service.format_weather_info(res_weather, destination)}\n"
-            except Exception as e:
-                logging.warning(f"Reservation weather error for {destination}: {e}")
         if reservation_date:
             location_info += f"Reservation date: {reservation_date}\n"
 
-    # --- Origin/Destination Extraction ---
-    origin, destination = extract_origin_destination(user_question)
-
-    # Interpret "MY_LOCATION"
-    if origin == "MY_LOCATION":
-        origin = user_location
+    # "from here", "to my location": wherever the user is
+    origin = user_location if places.origin == MY_LOCATION else places.origin
+    destination = user_location if places.destination == MY_LOCATION else places.destination
 
     # Fallbacks
     if not origin and user_location:
         origin = user_location
-    if not destination and reservation_details.get("destination"):
-        destination = reservation_details["destination"]
+    if not destination and reservation_destination:
+        destination = reservation_destination
+
+    # Where "near me" is: the browser's position, else the first known place the user named
+    near = coords
+    if near is None:
+        known = next(iter(find_known_locations(f"{user_location or ''} {user_question}").values()), None)
+        near = (known["lat"], known["lng"]) if known else None
+    if near is None and effective_location:
+        entry = gazetteer.lookup(effective_location)
+        near = (entry.lat, entry.lng) if entry else None
+
+    return {
+        "effective_location": effective_location,
+        "reservation_destination": reservation_destination,
+        "location_info": location_info,
+        "origin": origin,
+        "destination": destination,
+        "near": near,
+    }
+
+
+def _add_lookups(graph, plan, ctx, weather, traffic, normalize):
+    """
+    Register the upstream lookups for a plan. The same graph shape serves the
+    sync and async pipelines; only the service implementations differ. Every
+    lookup goes through the request's LookupContext so repeats are fetched once.
+    """
+    fetch_weather = ctx.memoize("weather", weather.fetch_weather, key=weather.cache_key,
+                                aliases=weather.observation_keys)
+    fetch_weather_at = ctx.memoize("weather", weather.fetch_weather_at, key=weather.cell_key)
+    name_stop = ctx.memoize("address", traffic.reverse_geocode, key=reverse_key)
+    normalize = ctx.memoize("normalize", normalize, key=lambda place_name, api_key: forward_key(place_name))
+
+    # Independent lookups run concurrently; route weather and traffic wait
+    # only on the normalized origin/destination they need.
+    # Upstream calls carry their own timeout, capped by the request's deadline.
+    if plan["effective_location"]:
+        graph.add("user_weather", fetch_weather, plan["effective_location"], timeout=weather.timeout)
+    if plan["reservation_destination"]:
+        graph.add("reservation_weather", fetch_weather, plan["reservation_destination"], timeout=weather.timeout)
+    if plan["origin"]:
+        graph.add("origin", normalize, plan["origin"], maps_api_key, timeout=GEOCODE_TIMEOUT)
+    if plan["destination"]:
+        graph.add("destination", normalize, plan["destination"], maps_api_key, timeout=GEOCODE_TIMEOUT)
+    if plan["origin"] and plan["destination"]:
+        # One Directions fetch feeds both the route stops and the traffic summary
+        graph.add("route", traffic.get_route, deps=("origin", "destination"), timeout=traffic.timeout)
+        graph.add("route_stops", traffic.stop_locations, deps=("route",), max_stops=4)
+        graph.add("route_weather", _route_weather, weather, deps=("route_stops",), timeout=weather.timeout,
+                  fetch_at=fetch_weather_at, name_resolver=name_stop)
+        graph.add("traffic", traffic.traffic_summary, deps=("route",))
+    return graph
+
+
+def generate_contextual_prompt(user_question, user_location=None, reservation_details=None, ctx=None,
+                               deadline=None, kb=None, coords=None, plan=None):
+    """Run the lookups a question needs and build its prompt; pass `plan` when it's already worked out."""
+    plan = plan or _plan_prompt_context(user_question, user_location, reservation_details, coords)
+    graph = _add_lookups(TaskGraph(), plan, ctx or LookupContext(), weather_service, traffic_service,
+                         normalize_location_name)
+    results, errors = graph.run(lookup_pool, deadline)
+    return _assemble_prompt(user_question, plan, results, errors, kb or live_knowledge.current)
+
+
+async def generate_contextual_prompt_async(user_question, user_location=None, reservation_details=None, ctx=None,
+                                           deadline=None, kb=None, coords=None, plan=None):
+    plan = plan or _plan_prompt_context(user_question, user_location, reservation_details, coords)
+    graph = _add_lookups(TaskGraph(), plan, ctx or LookupContext(), async_weather_service, async_traffic_service,
+                         normalize_location_name_async)
+    results, errors = await graph.run_async(deadline)
+    return _assemble_prompt(user_question, plan, results, errors, kb or live_knowledge.current)
+
+
+# What follows the static prefix in every prompt. Most stable first: the
+# daily calendar, then this question's chunks, then live data
+PROMPT_TEMPLATE = """
+LIFTS & EVENTS:
+{calendar}
 
-    # Normalize both origin and destination before using them
-    if origin:
-        origin = normalize_location_name(origin, maps_api_key)
-    if destination:
-        destination = normalize_location_name(destination, maps_api_key)
+KNOWLEDGE BASE:
+{knowledge}
 
-    # --- Route Weather ---
-    if origin and destination:
-        try:
-            stops = traffic_service.get_route_stops(origin, destination, max_stops=4, reverse_geocode=True)
-            if stops:
-                weather_info += f"\n\n🌤️ **Route Weather Forecast** (from {origin} to {destination}):\n"
-                weather_info += weather_service.get_weather_along_route(stops)
-            else:
-                weather_info += f"\n⚠️ Couldn't get route weather from {origin} to {destination}."
-        except Exception as e:
-            logging.warning(f"Route weather error from {origin} to {destination}: {e}")
-            weather_info += f"\n⚠️ Error retrieving weather for your route from {origin} to {destination}.\n"
+--- Real-Time Travel Insights ---
 
-# --- Live Traffic Info ---
-        if origin and destination:
-            try:
-                traffic_data = traffic_service.get_traffic_summary(origin, destination)
-                if traffic_data:
-                    traffic_info += f"\n\n🚗 **Live Traffic Update** (from {origin} to {destination}):\n"
-                    traffic_info += traffic_service.format_traffic_info(traffic_data)
-                else:
-                    traffic_info += f"\n⚠️ Could not retrieve traffic info from {origin} to {destination}.\n"
-            except Exception as e:
-                logging.warning(f"Traffic API error from {origin} to {destination}: {e}")
-                traffic_info += f"\n⚠️ Error fetching traffic info between {origin} and {destination}.\n"
+{weather}
 
-    # --- Prompt Assembly ---
-    current_datetime = datetime.datetime.now().strftime('%A, %B %d, %Y at %I:%M %p')
-
-    prompt = f"""
-You are the official AI assistant for SpotSurfer Parking, an online parking management software.
-Your job is to provide helpful, concise, and always SpotSurfer-focused parking advice, suggestions, and answers first, then use your best knowledge to help the user.
-
-Use the following knowledge base, real-time weather, live traffic, and user context to help users make informed parking decisions and encourage them to book with SpotSurfer:
-    - Only answer questions that regard Spotsurfer or parkinging or traffic or weather conditions that might effect the users travel or experience.
-    - Never mention any of Spotsurfer's rival parking companies like Spothero or parkhub.
-    - Use the user's information to recommend nearby parking and travel tips.
-    - Only offer discount codes on occasion to improve user experience.
-    - Suggest things to do (restaurants, scenic routes, shopping, etc.) that enhance the user's trip.
-    - Use current weather and traffic to help the user plan ahead (e.g., departure time, gear, conditions).
-    - Do NOT mention past events or anything more than 6 weeks away.
-    - Mention only events that are happening this weekend or in the next few weeks.
-    - All events must be mentioned only if they’re timely and relevant to the current date.
-    - Do NOT mention past events or operations that are already over.
-    - For example, if the ski season has ended (April 20, 2025), do not suggest skiing or gondola access.
-    - Use the current date to determine what services are active. Ski season closes April 20. After that, do NOT mention ski lifts or mountain access unless summer gondola operations are running.
-    - You can also track a user's trip and proactively alert them when they are near available SpotSurfer parking locations.
+{route_weather}
 
+{traffic}
 
+---
+{location_insights}
 Current Date and Time: {current_datetime}
 {location_info}
 
-KNOWLEDGE BASE:
-{knowledge_base}
+User Question:
+{user_question}
 
---- Real-Time Travel Insights ---
+Answer:
+"""
+PROMPT_SECTIONS = ("calendar", "knowledge", "weather", "route_weather", "traffic")
+DISTANCES_HEADER = "\nLocation Insights:\n"
+NEARBY_LOTS_HEADER = "\nClosest SpotSurfer lots to the user (straight-line):\n"
 
-{weather_info}
 
-{traffic_info}
+def _skipped_note(what):
+    return f"⏱️ {what} was skipped to keep this answer fast; don't guess it, suggest checking again shortly."
 
----
 
+def _distance_insights(message, kb):
+    matched_locations = find_known_locations(message)
+    distance_info = []
 
-User Question:
-{user_question}
+    if len(matched_locations) > 1:
+        loc_names = list(matched_locations.keys())
+        # Indexed places use the distances precomputed for this knowledge base version
+        distances = kb.nearby.distances_between(loc_names) or distance_matrix(
+            [(coords["lat"], coords["lng"]) for coords in matched_locations.values()])
+        for i in range(len(loc_names)):
+            for j in range(i + 1, len(loc_names)):
+                distance_info.append(f"📍 Distance from **{loc_names[i]}** to **{loc_names[j]}** is approximately "
+                                     f"**{round(distances[i][j], 2)} miles**.")
 
-Answer:
-"""
+    return distance_info
+
+
+def _assemble_prompt(user_question, plan, results, errors, kb):
+    weather_info = []
+    route_notes = []
+    route_lines = []
+    traffic_info = ""
+    location_info = plan["location_info"]
+    effective_location = plan["effective_location"]
+    reservation_destination = plan["reservation_destination"]
+
+    # --- Fetch Weather for Effective Location ---
+    if effective_location:
+        if isinstance(errors.get("user_weather"), DeadlineExceeded):
+            weather_info.append(_skipped_note(f'Weather for {effective_location}'))
+        elif "user_weather" in errors:
+            logging.warning(f"Weather API error for {effective_location}: {errors['user_weather']}")
+            weather_info.append(f"⚠️ Could not fetch weather for {effective_location}.")
+        elif results["user_weather"]:
+            weather_info.append(f"User Location Weather:\n{weather_service.format_weather_info(results['user_weather'], effective_location)}")
+        else:
+            weather_info.append(f"⚠️ Weather data not available for {effective_location}.")
+
+    # --- Reservation Context ---
+    if reservation_destination:
+        if isinstance(errors.get("reservation_weather"), DeadlineExceeded):
+            weather_info.append(_skipped_note(f'Weather for {reservation_destination}'))
+        elif "reservation_weather" in errors:
+            logging.warning(f"Reservation weather error for {reservation_destination}: {errors['reservation_weather']}")
+        elif results["reservation_weather"]:
+            weather_info.append(f"Reservation Location Weather:\n{weather_service.format_weather_info(results['reservation_weather'], reservation_destination)}")
+
+    # Normalized origin and destination, falling back to the raw names
+    origin = results.get("origin", plan["origin"])
+    destination = results.get("destination", plan["destination"])
+
+    # --- Route Weather ---
+    if origin and destination:
+        if isinstance(errors.get("route_weather"), DeadlineExceeded):
+            route_notes.append(_skipped_note('Route weather'))
+        elif "route_weather" in errors:
+            logging.warning(f"Route weather error from {origin} to {destination}: {errors['route_weather']}")
+            route_notes.append(f"⚠️ Error retrieving weather for your route from {origin} to {destination}.")
+        elif results["route_stops"]:
+            route_lines = results["route_weather"].splitlines()
+        else:
+            route_notes.append(f"⚠️ Couldn't get route weather from {origin} to {destination}.")
+
+# --- Live Traffic Info ---
+        if isinstance(errors.get("traffic"), DeadlineExceeded):
+            traffic_info = _skipped_note('Live traffic')
+        elif "traffic" in errors:
+            logging.warning(f"Traffic API error from {origin} to {destination}: {errors['traffic']}")
+            traffic_info = f"⚠️ Error fetching traffic info between {origin} and {destination}."
+        elif results["traffic"]:
+            traffic_info = f"🚗 **Live Traffic Update** (from {origin} to {destination}):\n"
+            traffic_info += traffic_service.format_traffic_info(results["traffic"]).strip()
+        else:
+            traffic_info = f"⚠️ Could not retrieve traffic info from {origin} to {destination}."
+
+    # --- Knowledge Base Retrieval ---
+    # The user's places steer retrieval toward nearby lots as well as the question's topic
+    places = [effective_location, reservation_destination, plan["origin"], plan["destination"]]
+    kb_chunks, kb_drop_order = kb.index.context_parts(" ".join([user_question] + [p for p in places if p]), KB_TOP_K)
+
+    # --- Nearest Lots (local index, no API calls) ---
+    nearby = []
+    if plan.get("near"):
+        for place, miles in kb.nearby.nearest(*plan["near"], k=NEARBY_LOTS, kind="lot", max_miles=NEARBY_MAX_MILES):
+            nearby.append(f"- {place.name}: {miles:.1f} miles away" + (f" ({place.address})" if place.address else ""))
+
+    now = datetime.datetime.now()
+    current_datetime = now.strftime('%A, %B %d, %Y at %I:%M %p')
+
+    # --- Token Budget ---
+    # Lowest priority is trimmed first; the prefix, the template around the
+    # sections, time, place and question always go in
+    fixed = dict(current_datetime=current_datetime, location_info=location_info, user_question=user_question)
+    skeleton = kb.prompt_prefix + PROMPT_TEMPLATE.format(
+        **fixed, **{name: "" for name in PROMPT_SECTIONS},
+        location_insights=NEARBY_LOTS_HEADER + DISTANCES_HEADER)
+    sections = prompt_budget.fit(skeleton, [
+        Section("weather", weather_info, 80, joiner="\n\n", noun="weather reports"),
+        Section("nearby", nearby, 75, noun="lots"),
+        Section("traffic", [traffic_info] if traffic_info else [], 70),
+        Section("knowledge", kb_chunks, 60, kb_drop_order, joiner="\n\n", noun="knowledge base sections"),
+        Section("calendar", kb.calendar.view_for(now.date()).splitlines(), 50, noun="calendar lines"),
+        Section("route_weather", route_notes + route_lines, 40, ends_first(len(route_notes + route_lines)),
+                header=f"🌤️ **Route Weather Forecast** (from {origin} to {destination}):\n" if route_lines else "",
+                noun="route stops"),
+        Section("distances", _distance_insights(user_question, kb), 30, noun="distances"),
+    ])
+    location_insights = f"{DISTANCES_HEADER}{sections['distances']}\n" if sections["distances"] else ""
+    if sections["nearby"]:
+        location_insights += f"{NEARBY_LOTS_HEADER}{sections['nearby']}\n"
+
+    # --- Prompt Assembly ---
+    prompt = kb.prompt_prefix + PROMPT_TEMPLATE.format(
+        **fixed, **{name: sections[name] for name in PROMPT_SECTIONS}, location_insights=location_insights)
+    tokens = prompt_budget.record(prompt)
+    logging.info(f"Prompt tokens: {tokens} (budget {prompt_budget.max_tokens})")
     return prompt
 
 
 # --- GPT Query ---
 
-def query_contextual_response(prompt):
+LLM_FAILURE_MESSAGE = "⚠️ Sorry, I couldn't get the information right now. Please try again shortly."
+
+def _chat_request(prompt, tier=None):
+    tier = tier or model_router.tiers[model_router.default]
+    logging.info(f"==== GPT PROMPT START ({tier.name}: {tier.model}) ====")
+    logging.info(prompt)
+    logging.info("==== GPT PROMPT END ====")
+    return dict(
+        model=tier.model,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.5,
+        max_tokens=tier.max_tokens,
+    )
+
+def _observe(tier, started, ok):
+    model_router.observe(tier or model_router.tiers[model_router.default], time.perf_counter() - started, ok)
+
+# The query functions raise LLMUnavailable when no answer can be had within `timeout`
+# seconds; callers fall back to _degraded_answer().
+
+def query_contextual_response(prompt, timeout=None, tier=None):
+    started = time.perf_counter()
     try:
-        logging.info("==== GPT PROMPT START ====")
-        logging.info(prompt)
-        logging.info("==== GPT PROMPT END ====")
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=700
-        )
-        return response['choices'][0]['message']['content'].strip()
-    except Exception as e:
-        logging.error(f"OpenAI query failed: {e}")
-        return "⚠️ Sorry, I couldn't get the information right now. Please try again shortly."
+        response = llm_client.create(_chat_request(prompt, tier), timeout or LLM_RESERVE_SECONDS)
+    except LLMUnavailable:
+        _observe(tier, started, False)
+        raise
+    _observe(tier, started, True)
+    return response['choices'][0]['message']['content'].strip()
+
+async def query_contextual_response_async(prompt, timeout=None, tier=None):
+    started = time.perf_counter()
+    try:
+        response = await llm_client.acreate(_chat_request(prompt, tier), timeout or LLM_RESERVE_SECONDS)
+    except LLMUnavailable:
+        _observe(tier, started, False)
+        raise
+    _observe(tier, started, True)
+    return response['choices'][0]['message']['content'].strip()
+
+def _chunk_text(chunk):
+    return chunk['choices'][0].get('delta', {}).get('content')
+
+def stream_contextual_response(prompt, timeout=None, tier=None):
+    """Yield reply text deltas as OpenAI generates them."""
+    started = time.perf_counter()
+    try:
+        for chunk in llm_client.stream(_chat_request(prompt, tier), timeout or LLM_RESERVE_SECONDS):
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+    except LLMUnavailable:
+        _observe(tier, started, False)
+        raise
+    _observe(tier, started, True)
+
+async def stream_contextual_response_async(prompt, timeout=None, tier=None):
+    started = time.perf_counter()
+    try:
+        async for chunk in llm_client.astream(_chat_request(prompt, tier), timeout or LLM_RESERVE_SECONDS):
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+    except LLMUnavailable:
+        _observe(tier, started, False)
+        raise
+    _observe(tier, started, True)
 
 # --- ROUTES ---
 
@@ -323,70 +729,473 @@ def send_push_notification(subscription_info, message):
 
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "weather_cache": weather_cache.stats(),
+        "geocode_store": geocode_store.stats(),
+        "lookups": lookup_totals(),
+        "answer_cache": answer_cache.stats(),
+        "gazetteer": gazetteer.stats(),
+        "knowledge_base": dict(live_knowledge.current.stats(), **live_knowledge.stats()),
+        "prompt_budget": prompt_budget.stats(),
+        "models": model_router.stats(),
+        "llm": llm_client.stats(),
+    })
+
+
+def _ask_payload(response_text, kb, answered_by="llm"):
+    return {
+        "response": response_text,
+        "html": markdown2.markdown(response_text),
+        "status": "success",
+        "kb_version": kb.version,
+        # Which path produced the answer: "llm", "faq", "trip_start", "cache" or "unavailable"
+        "answered_by": answered_by,
+    }
+
+ASK_ERROR_PAYLOAD = {
+    "response": "An error occurred while processing your request.",
+    "status": "error"
+}
+
+def _parse_ask_request(data):
+    return {
+        "message": data.get('message', ''),
+        "intent": data.get('intent'),  # new intent support
+        "reservation_details": data.get('reservation_details', {}),
+        "user_location": data.get('user_location'),
+        "lat": data.get('lat'),
+        "lng": data.get('lng'),
+    }
+
+def _new_deadline():
+    # The clock starts as soon as /ask begins handling the request
+    return Deadline(ASK_BUDGET_SECONDS, LLM_RESERVE_SECONDS)
+
+
+def _faq_shortcut(req, kb, threshold=None):
+    """The stored answer as a response payload when the question closely matches an FAQ entry."""
+    match = kb.faq.match(req["message"], threshold) if req["message"] else None
+    if not match:
+        return None
+    faq, score = match
+    logging.info(f"Answered from FAQ ({score:.0f}): {faq.question}")
+    return _ask_payload(faq.answer, kb, "faq")
+
+
+def _degraded_answer(req, plan, kb):
+    """
+    The best answer available without the LLM: a looser FAQ match, then the
+    last LLM answer to this question at this place, then an apology. Never
+    cached, so normal answers resume as soon as the LLM is back.
+    """
+    payload = _faq_shortcut(req, kb, FAQ_FALLBACK_THRESHOLD)
+    if not payload:
+        stale = answer_fallbacks.get(_fallback_key(req, plan, kb))
+        payload = _from_cache(stale) if stale else _ask_payload(LLM_FAILURE_MESSAGE, kb, "unavailable")
+    return dict(payload, degraded=True)
+
+
+def _request_coords(req):
+    try:
+        return float(req["lat"]), float(req["lng"])
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_location(req):
+    """The user's place as a cache key part: the normalised name, or the coordinates' bucket."""
+    location = forward_key(req["user_location"]) if req["user_location"] else None
+    if not location and req["lat"] is not None and req["lng"] is not None:
+        location = f"geo:{coords_bucket(req['lat'], req['lng'])}"
+    return location
+
+
+def _plan_places(plan):
+    """The places a plan resolved, as key parts: two questions differing only in direction differ here."""
+    return [forward_key(plan[name]) if plan[name] else "" for name in
+            ("origin", "destination", "effective_location", "reservation_destination")]
+
+
+def _answer_cache_key(req, plan, kb):
+    """
+    (key, ttl) under which this request's answer can be cached, or
+    (None, None) when it shouldn't be. The key combines the normalised
+    question and the places its plan resolved with the user's location
+    bucket, reservation, date, knowledge base version and the current
+    window of the real-time data the prompt will embed; the TTL is what's
+    left of that window.
+    """
+    if req["intent"] == 'trip_start_simple' or not req["message"]:
+        return None, None
+    reservation = req["reservation_details"] or {}
+    if plan["origin"] and plan["destination"]:
+        ttl = traffic_service.route_ttl
+    elif plan["effective_location"] or plan["reservation_destination"]:
+        ttl = weather_cache.ttl
+    else:
+        ttl = ANSWER_STATIC_TTL
+    window, ttl_left = freshness_window(ttl)
+
+    key = ResponseCache.make_key(req["message"], _request_location(req), *_plan_places(plan),
+                                 reservation.get("destination"), reservation.get("date"), req["intent"],
+                                 datetime.date.today().isoformat(), kb.version, f"{ttl}:{window}")
+    return key, ttl_left
+
+
+def _fallback_key(req, plan, kb):
+    # Like _answer_cache_key() without the date and real-time windows, so it outlives them
+    reservation = req["reservation_details"] or {}
+    return ResponseCache.make_key(req["message"], _request_location(req), *_plan_places(plan),
+                                  reservation.get("destination"), reservation.get("date"), req["intent"], kb.version)
+
+
+def _remember_answer(req, plan, kb, payload):
+    if req["message"] and _cacheable(payload):
+        answer_fallbacks.set(_fallback_key(req, plan, kb), payload, answer_fallbacks.ttl)
+
+
+def _cacheable(payload):
+    """Only complete LLM answers are cached or kept as fallbacks; never cut-off or degraded ones."""
+    return (payload.get("answered_by") == "llm" and payload.get("response") != LLM_FAILURE_MESSAGE
+            and not payload.get("partial") and not payload.get("degraded"))
+
+
+def _from_cache(payload):
+    return dict(payload, answered_by="cache")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AskRequest:
+    """
+    One /ask request on its way to an answer. Every step that makes no
+    upstream call lives here, so the sync pipeline (Flask) and the async one
+    (ASGI) below are the same short sequence and differ only in how they
+    reverse-geocode, run the lookups and call the LLM.
+    """
+
+    def __init__(self, data):
+        self.req = _parse_ask_request(data)
+        self.message = self.req["message"]
+        self.deadline = _new_deadline()
+        # One knowledge base version for the whole request, even if it reloads meanwhile
+        self.kb = live_knowledge.current
+        self.ctx = LookupContext()
+        self.user_location = self.req["user_location"]
+        self.coords = _request_coords(self.req)
+        self.plan = None
+        self.cache_key = self.ttl = None
+        self.prompt = self.tier = None
+        # Set once the request is answered without a prompt (trip start, FAQ, LLM down)
+        self.payload = None
+        self.parts = []
+
+    @property
+    def trip_start(self):
+        return self.req["intent"] == 'trip_start_simple'
+
+    def answered_early(self):
+        """Whether an FAQ entry already answers the question, before any lookup."""
+        if not self.trip_start:
+            self.payload = _faq_shortcut(self.req, self.kb)
+        return self.payload is not None
+
+    def needs_locality(self):
+        """Whether the user's place has to be reverse-geocoded from their coordinates."""
+        lat, lng = self.req["lat"], self.req["lng"]
+        # Trip start always resolves the location afresh
+        return self.trip_start or (not self.user_location and lat is not None and lng is not None)
+
+    def geocode_timeout(self):
+        try:
+            return self.deadline.timeout_for(GEOCODE_TIMEOUT)
+        except DeadlineExceeded:
+            # The user's place is still worth one short try; never the full default
+            return MIN_STEP_SECONDS
+
+    def located(self, place):
+        self.user_location = place
+        if self.trip_start:
+            logging.info(f"Reverse-geocoded user location for trip start: {place}")
+            self.payload = _ask_payload(f"Now tracking your trip from {place or 'your location'}.", self.kb,
+                                        "trip_start")
+            return
+        logging.info(f"Resolved user_location from coordinates: {place}")
+        # Google already canonicalised this name; don't geocode it again as the origin
+        self.ctx.seed("normalize", forward_key(place), place)
+
+    def planned(self):
+        """Plan the request once; its cache key, TTL, lookups and model tier all come from this plan."""
+        self.plan = _plan_prompt_context(self.message, self.user_location, self.req["reservation_details"],
+                                         self.coords)
+        self.cache_key, self.ttl = _answer_cache_key(self.req, self.plan, self.kb)
+
+    @staticmethod
+    def llm_down():
+        """Whether to answer degraded straight away, skipping the lookups, because OpenAI is known to be down."""
+        return not llm_client.available()
+
+    def degraded(self):
+        return _degraded_answer(self.req, self.plan, self.kb)
+
+    def prompt_kwargs(self):
+        """Arguments for generate_contextual_prompt() and its async twin."""
+        return dict(user_question=self.message, user_location=self.user_location,
+                    reservation_details=self.req["reservation_details"], ctx=self.ctx, deadline=self.deadline,
+                    kb=self.kb, coords=self.coords, plan=self.plan)
+
+    def prompted(self, prompt):
+        self.prompt = prompt
+        self.ctx.finish()
+        self.tier = model_router.route(self.message, self.plan)
+        logging.info(f"Model tier: {self.tier.name} ({self.tier.model})")
+
+    def llm_timeout(self):
+        return self.deadline.llm_timeout()
+
+    def llm_answer(self, text):
+        return _ask_payload(text, self.kb)
+
+    def llm_failed(self, error):
+        logging.error(f"OpenAI query failed: {error}")
+        return self.degraded()
+
+    def finish(self, payload, source):
+        """
+        The payload to return for an answer from the answer cache path. Only
+        a stored answer is relabelled as a cache hit; one shared with an
+        identical request in flight keeps its own label, since it may be a
+        fallback the cache refused.
+        """
+        if source == CACHED:
+            return _from_cache(payload)
+        if source == COMPUTED:
+            _remember_answer(self.req, self.plan, self.kb, payload)
+        return payload
+
+    # Streaming
+
+    def cached_event(self, cached):
+        return sse_event("done", _from_cache(cached))
+
+    def delta_event(self, text):
+        self.parts.append(text)
+        return sse_event("delta", {"text": text})
+
+    def stream_failed_event(self, error):
+        logging.error(f"OpenAI stream failed: {error}")
+        if not self.parts:
+            return sse_event("done", self.degraded())
+        # The client already has this much; mark it cut off and keep it out of every cache
+        payload = _ask_payload("".join(self.parts).strip(), self.kb)
+        return sse_event("done", dict(payload, partial=True, degraded=True))
+
+    def done_event(self):
+        """The final event of a stream that finished normally; its answer is cached."""
+        text = "".join(self.parts).strip() or LLM_FAILURE_MESSAGE
+        payload = _ask_payload(text, self.kb)
+        if self.cache_key and _cacheable(payload):
+            answer_cache.set(self.cache_key, payload, self.ttl)
+            _remember_answer(self.req, self.plan, self.kb, payload)
+        return sse_event("done", payload)
+
+
+# The sync and async pipelines. Keep the two in step: they should differ
+# only in their upstream calls. In the async ones, steps that read or write
+# the answer stores (SQLite, the shared cache tier) go through run_blocking()
+# so they never stall the event loop.
+
+def _plan_request(job):
+    """
+    First stage of every /ask pipeline: answer from the FAQ when it can,
+    else resolve the user's location and plan the request. Leaves
+    job.payload set when the request is already answered.
+    """
+    if job.answered_early():
+        return
+    if job.needs_locality():
+        job.located(reverse_geocode(job.req["lat"], job.req["lng"], maps_api_key, job.geocode_timeout()))
+    if not job.payload:
+        job.planned()
+
+
+async def _plan_request_async(job):
+    if job.answered_early():
+        return
+    if job.needs_locality():
+        job.located(await reverse_geocode_async(job.req["lat"], job.req["lng"], maps_api_key, job.geocode_timeout()))
+    if not job.payload:
+        job.planned()
+
+
+def _prepare_prompt(job):
+    """Run the planned lookups and build the prompt, unless the LLM is down (then job.payload is set)."""
+    if job.llm_down():
+        job.payload = job.degraded()
+    else:
+        job.prompted(generate_contextual_prompt(**job.prompt_kwargs()))
+
+
+async def _prepare_prompt_async(job):
+    if job.llm_down():
+        job.payload = await run_blocking(job.degraded)
+    else:
+        job.prompted(await generate_contextual_prompt_async(**job.prompt_kwargs()))
+
+
+def _compute_answer(job):
+    _prepare_prompt(job)
+    if job.payload:
+        return job.payload
+    try:
+        return job.llm_answer(query_contextual_response(job.prompt, job.llm_timeout(), job.tier))
+    except LLMUnavailable as e:
+        return job.llm_failed(e)
+
+
+async def _compute_answer_async(job):
+    await _prepare_prompt_async(job)
+    if job.payload:
+        return job.payload
+    try:
+        return job.llm_answer(await query_contextual_response_async(job.prompt, job.llm_timeout(), job.tier))
+    except LLMUnavailable as e:
+        return await run_blocking(job.llm_failed, e)
+
+
+def _answer(job):
+    _plan_request(job)
+    if job.payload:
+        return job.payload
+    if job.cache_key is None:
+        return _compute_answer(job)
+    # Identical questions in flight at the same time share one answer
+    payload, source = answer_cache.get_or_compute(job.cache_key, lambda: _compute_answer(job), job.ttl, _cacheable)
+    return job.finish(payload, source)
+
+
+async def _answer_async(job):
+    await _plan_request_async(job)
+    if job.payload:
+        return job.payload
+    if job.cache_key is None:
+        return await _compute_answer_async(job)
+    payload, source = await answer_cache.get_or_compute_async(job.cache_key, lambda: _compute_answer_async(job),
+                                                              job.ttl, _cacheable)
+    return await run_blocking(job.finish, payload, source)
+
+
+def _stream_answer(job):
+    """SSE events for one /ask/stream request, after the opening comment."""
+    _plan_request(job)
+    cached = answer_cache.get(job.cache_key) if job.cache_key and not job.payload else None
+    if cached:
+        yield job.cached_event(cached)
+        return
+    if not job.payload:
+        _prepare_prompt(job)
+    if job.payload:
+        yield sse_event("done", job.payload)
+        return
+    try:
+        for text in stream_contextual_response(job.prompt, job.llm_timeout(), job.tier):
+            yield job.delta_event(text)
+    except Exception as e:
+        yield job.stream_failed_event(e)
+        return
+    yield job.done_event()
+
+
+async def _stream_answer_async(job):
+    await _plan_request_async(job)
+    cached = await answer_cache.aget(job.cache_key) if job.cache_key and not job.payload else None
+    if cached:
+        yield job.cached_event(cached)
+        return
+    if not job.payload:
+        await _prepare_prompt_async(job)
+    if job.payload:
+        yield sse_event("done", job.payload)
+        return
+    try:
+        async for text in stream_contextual_response_async(job.prompt, job.llm_timeout(), job.tier):
+            yield job.delta_event(text)
+    except Exception as e:
+        yield await run_blocking(job.stream_failed_event, e)
+        return
+    yield await run_blocking(job.done_event)
+
+
 @app.route('/ask', methods=['POST'])
 def ask():
     try:
-        data = request.json
-        message = data.get('message', '')
-        intent = data.get('intent')  # new intent support
-        reservation_details = data.get('reservation_details', {})
-        user_location = data.get('user_location')
-        lat = data.get('lat')
-        lng = data.get('lng')
-
-        # simple shortcut response
-        if intent == 'trip_start_simple':
-            # Always resolve user location dynamically
-            user_location = reverse_geocode(lat, lng, maps_api_key)
-            logging.info(f"Reverse-geocoded user location for trip start: {user_location}")
-
-            response_text = f"Now tracking your trip from {user_location or 'your location'}."
-
-            return jsonify({
-                "response": response_text,
-                "html": markdown2.markdown(response_text),
-                "status": "success"
-            })
-
-        # Use lat/lng to determine user location if not explicitly provided
-        if not user_location and lat is not None and lng is not None:
-            user_location = reverse_geocode(lat, lng, maps_api_key)
-            logging.info(f"Resolved user_location from coordinates: {user_location}")
-
-        matched_locations = find_known_locations(message)
-        distance_info = ""
-
-        if len(matched_locations) > 1:
-            loc_names = list(matched_locations.keys())
-            for i in range(len(loc_names)):
-                for j in range(i + 1, len(loc_names)):
-                    loc1 = loc_names[i]
-                    loc2 = loc_names[j]
-                    dist = get_distance(matched_locations[loc1], matched_locations[loc2])
-                    distance_info += f"📍 Distance from **{loc1}** to **{loc2}** is approximately **{dist} miles**.\n"
-
-        prompt = generate_contextual_prompt(message, user_location, reservation_details)
-        if distance_info:
-            prompt += f"\n\nLocation Insights:\n{distance_info}"
-
-        ai_response = query_contextual_response(prompt)
-        html_response = markdown2.markdown(ai_response)
-
-        return jsonify({
-            "response": ai_response,
-            "html": html_response,
-            "status": "success"
-        })
-
+        return jsonify(_answer(AskRequest(request.json)))
     except Exception as e:
         logging.exception(f"Error in /ask route: {e}")
-        return jsonify({
-            "response": "An error occurred while processing your request.",
-            "status": "error"
-        }), 500
+        return jsonify(ASK_ERROR_PAYLOAD), 500
+
+
+async def ask_async(data):
+    """
+    Async /ask pipeline used by the ASGI entry point (asgi.py). Mirrors ask()
+    but never blocks the event loop, so one process can hold many slow
+    questions in flight. Returns (payload, status_code).
+    """
+    try:
+        return await _answer_async(AskRequest(data)), 200
+    except Exception as e:
+        logging.exception(f"Error in async /ask: {e}")
+        return ASK_ERROR_PAYLOAD, 500
+
+
+# --- STREAMING ---
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx/render proxies from buffering the stream
+}
+
+# Flushes headers straight away so clients know the request is alive
+SSE_OPEN = ": stream open\n\n"
 
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """
+    Server-Sent Events variant of /ask. Emits a `delta` event for every chunk
+    of reply text as OpenAI produces it, then one `done` event carrying the
+    same payload /ask would have returned (full text plus rendered HTML).
+    A cached answer is sent as a single `done` event. If the stream breaks
+    off, `done` carries the text so far with `partial` set, and nothing is
+    cached.
+    """
+    job = AskRequest(request.json)
 
+    def generate():
+        yield SSE_OPEN
+        try:
+            yield from _stream_answer(job)
+        except Exception as e:
+            logging.exception(f"Error in /ask/stream route: {e}")
+            yield sse_event("error", ASK_ERROR_PAYLOAD)
+
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+async def ask_stream_async(data):
+    """Async generator of SSE chunks for /ask/stream on the ASGI entry point."""
+    job = AskRequest(data)
+    yield SSE_OPEN
+    try:
+        async for event in _stream_answer_async(job):
+            yield event
+    except Exception as e:
+        logging.exception(f"Error in async /ask/stream: {e}")
+        yield sse_event("error", ASK_ERROR_PAYLOAD)
 
 
 if __name__ == '__main__':
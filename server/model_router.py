@@ -0,0 +1,114 @@
+# model_router.py
+
+import re
+import threading
+from collections import deque
+
+# Words that mark a question as needing reasoning rather than a lookup
+PLANNING_WORDS = frozenset("""
+plan planning compare comparison recommend recommendation best better cheapest worth should itinerary trip
+why suggest options alternatives avoid
+""".split())
+
+# Above this many words a question goes to the full model
+LONG_QUESTION_WORDS = 30
+
+_WORD = re.compile(r"[a-z']+")
+
+
+class ModelTier:
+    """One model choice: which model answers and how long its reply may be."""
+    __slots__ = ("name", "model", "max_tokens")
+
+    def __init__(self, name, model, max_tokens):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def __repr__(self):
+        return f"ModelTier({self.name!r}, {self.model!r}, {self.max_tokens})"
+
+
+def classify_question(question, plan):
+    """
+    Default classifier: "full" for questions that combine several pieces of
+    real-time context (a route, a reservation) or ask for planning and
+    comparison, "fast" for single lookups like "what time do lifts open".
+    `plan` is the dict from main._plan_prompt_context().
+    """
+    words = _WORD.findall(str(question).lower())
+    if plan.get("origin") and plan.get("destination"):
+        return "full"  # route weather and traffic to weigh together
+    if plan.get("reservation_destination"):
+        return "full"
+    if len(words) > LONG_QUESTION_WORDS or str(question).count("?") > 1:
+        return "full"
+    if PLANNING_WORDS.intersection(words):
+        return "full"
+    return "fast"
+
+
+class ModelRouter:
+    """
+    Picks a ModelTier per question. The classifier is any callable
+    (question, plan) -> tier name, so the heuristic can be swapped without
+    touching the call sites. Setting `override` to a tier name sends every
+    question to that tier, which is how tests and load runs pin a model.
+    Latency of each tier's LLM calls is tracked over a sliding window.
+    """
+
+    def __init__(self, tiers, default, classifier=classify_question, override=None, window=500):
+        self.tiers = {tier.name: tier for tier in tiers}
+        if default not in self.tiers:
+            raise ValueError(f"Unknown default model tier: {default}")
+        if override and override not in self.tiers:
+            raise ValueError(f"Unknown model tier override: {override}")
+        self.default = default
+        self.classifier = classifier
+        self.override = override
+        self._lock = threading.Lock()
+        self._latencies = {name: deque(maxlen=window) for name in self.tiers}
+        self._routed = {name: 0 for name in self.tiers}
+        self._errors = {name: 0 for name in self.tiers}
+
+    def route(self, question, plan):
+        name = self.override
+        if not name:
+            try:
+                name = self.classifier(question, plan)
+            except Exception:
+                name = None
+        tier = self.tiers.get(name) or self.tiers[self.default]
+        with self._lock:
+            self._routed[tier.name] += 1
+        return tier
+
+    def observe(self, tier, seconds, ok=True):
+        """Record how long one LLM call on `tier` took."""
+        with self._lock:
+            self._latencies[tier.name].append(seconds)
+            if not ok:
+                self._errors[tier.name] += 1
+
+    def stats(self):
+        stats = {"override": self.override, "default": self.default, "tiers": {}}
+        with self._lock:
+            for name, tier in self.tiers.items():
+                samples = sorted(self._latencies[name])
+                stats["tiers"][name] = {
+                    "model": tier.model,
+                    "max_tokens": tier.max_tokens,
+                    "routed": self._routed[name],
+                    "errors": self._errors[name],
+                    "calls": len(samples),
+                    "p50_ms": _percentile_ms(samples, 50),
+                    "p95_ms": _percentile_ms(samples, 95),
+                }
+        return stats
+
+
+def _percentile_ms(samples, pct):
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return round(samples[index] * 1000)
@@ -0,0 +1,155 @@
+# place_parser.py
+
+import re
+from location_extraction import known_locations
+
+# Stands for wherever the user is; main.py swaps in their location
+MY_LOCATION = "MY_LOCATION"
+
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:['’\-/&][A-Za-z0-9]+)*|[^\sA-Za-z0-9]")
+
+# Words that open a phrase naming a place
+_ORIGIN_MARKERS = frozenset(("from", "leaving"))
+_DESTINATION_MARKERS = frozenset(("to", "into", "towards", "toward"))
+_WEATHER_WORDS = frozenset("""
+weather forecast forecasts snow snowing snowfall snowpack powder rain raining temperature temperatures temp
+conditions wind windy cold storm storms
+""".split())
+_WEATHER_PREPOSITIONS = frozenset(("in", "at", "for", "near", "around", "on", "over", "up"))
+
+# Words that end a place phrase: times, verbs, pronouns, conjunctions and other prepositions
+_STOP_WORDS = frozenset("""
+today tonight tomorrow now right later soon morning afternoon evening night weekend week month year
+monday tuesday wednesday thursday friday saturday sunday this next last every early late before after
+during until by with without via and or but so then than if because when while about like what whats
+how is are was were be been being will would can could should do does did am going get getting go
+take takes taking drive driving it its i me my we our you your there here please thanks thank
+in at for near around on over up of from to into towards toward leaving
+""".split()) | _WEATHER_WORDS
+
+_LEADING_ARTICLES = frozenset(("the", "a", "an"))
+
+# Ways of saying "where I am now"
+_MY_LOCATION_PHRASES = frozenset(("here", "me", "my location", "my current location", "current location",
+                                  "where i am", "where im", "my position"))
+_MY_LOCATION_WORDS = frozenset(word for phrase in _MY_LOCATION_PHRASES for word in phrase.split())
+
+# Longest phrase kept after a marker; place names are short
+MAX_PHRASE_WORDS = 5
+
+# Last words that make an unknown phrase a street ("Booth Falls Road", "Lionshead Pl")
+_STREET_WORDS = frozenset("""
+st street rd road ave avenue blvd boulevard dr drive ln lane pl cir circle ct court loop hwy highway pkwy parkway
+trl trail frontage
+""".split())
+
+
+def _plain(token):
+    return token.lower().replace("'", "").replace("’", "")
+
+
+class ParsedPlaces:
+    """The places one question names. Any field may be None; origin and destination may be MY_LOCATION."""
+    __slots__ = ("origin", "destination", "weather_location")
+
+    def __init__(self, origin=None, destination=None, weather_location=None):
+        self.origin = origin
+        self.destination = destination
+        self.weather_location = weather_location
+
+    def __repr__(self):
+        return f"ParsedPlaces({self.origin!r}, {self.destination!r}, {self.weather_location!r})"
+
+
+class PlaceParser:
+    """
+    Pulls the origin ("from X"), destination ("to X") and weather location
+    ("snow at X") out of a question in one pass over its tokens. A phrase
+    runs from its marker to the next stop word, punctuation or marker, so
+    "to Vail tomorrow" yields "Vail". Phrases are then checked: names the
+    gazetteer, KNOWN_LOCATIONS or the knowledge base's lots recognise become
+    their canonical names, street addresses ("44 Willow Pl", "Booth Falls
+    Road") are kept as written, and anything else ("to know", "to Book a
+    spot", a town the gazetteer doesn't list) is dropped so it never reaches
+    a geocode or weather lookup. Capitalisation alone proves nothing.
+    """
+
+    def __init__(self, gazetteer, matcher=known_locations):
+        self.gazetteer = gazetteer
+        self.matcher = matcher
+
+    def parse(self, question):
+        tokens = _TOKEN.findall(str(question or ""))
+        found = {}
+        weather_pending = False
+        role = None
+        phrase = []
+
+        def close():
+            if role and phrase and role not in found:
+                place = self._validate(phrase)
+                if place:
+                    found[role] = place
+            phrase.clear()
+
+        for token in tokens:
+            word = _plain(token)
+            if not token[0].isalnum():
+                close()
+                role = None
+                weather_pending = False
+                continue
+            if word in _ORIGIN_MARKERS:
+                close()
+                role = "origin"
+            elif word in _DESTINATION_MARKERS:
+                close()
+                role = "destination"
+            elif word in _WEATHER_WORDS:
+                close()
+                role, weather_pending = None, True
+            elif weather_pending and word in _WEATHER_PREPOSITIONS:
+                close()
+                role, weather_pending = "weather", False
+            elif role and not phrase and word in _LEADING_ARTICLES:
+                continue
+            elif role and word in _MY_LOCATION_WORDS and self._my_location_prefix(phrase, word):
+                phrase.append(token)
+            elif role and word not in _STOP_WORDS and len(phrase) < MAX_PHRASE_WORDS:
+                phrase.append(token)
+            elif weather_pending and not role and word not in _STOP_WORDS:
+                # "weather Vail", with no preposition
+                role, weather_pending = "weather", False
+                phrase.append(token)
+            else:
+                close()
+                role = None
+        close()
+
+        weather = found.get("weather")
+        return ParsedPlaces(found.get("origin"), found.get("destination"),
+                            None if weather == MY_LOCATION else weather)
+
+    @staticmethod
+    def _my_location_prefix(phrase, word):
+        """Whether `word` continues a phrase that could still spell one of _MY_LOCATION_PHRASES."""
+        candidate = " ".join([_plain(token) for token in phrase] + [word])
+        return any(known == candidate or known.startswith(candidate + " ") for known in _MY_LOCATION_PHRASES)
+
+    def _validate(self, phrase):
+        """The place a phrase names, or None when it isn't one."""
+        text = " ".join(phrase)
+        if " ".join(_plain(token) for token in phrase) in _MY_LOCATION_PHRASES:
+            return MY_LOCATION
+        entry = self.gazetteer.lookup(text)
+        if entry:
+            return entry.name
+        matches = self.matcher.matches(text)
+        if matches and matches[0].start == 0 and matches[0].end == len(text):
+            return matches[0].name
+        lot = self.matcher.lot(text)
+        if lot:
+            return lot
+        if len(phrase) > 1 and (phrase[0][0].isdigit() or _plain(phrase[-1]) in _STREET_WORDS):
+            return text
+        return None
@@ -0,0 +1,78 @@
+# polyline.py
+
+from math import asin, cos, radians, sin, sqrt
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_MILE = 1609.344
+
+
+def decode(points):
+    """Decode a Google encoded polyline into a list of (lat, lng) tuples."""
+    coords = []
+    index = lat = lng = 0
+    length = len(points)
+
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(points[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        coords.append((lat / 1e5, lng / 1e5))
+
+    return coords
+
+
+def segment_meters(a, b):
+    """Haversine distance between two (lat, lng) points in meters."""
+    lat1, lng1, lat2, lng2 = map(radians, (a[0], a[1], b[0], b[1]))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * asin(sqrt(h))
+
+
+def sample_evenly(coords, count):
+    """
+    Return `count` points spaced at equal distances along the line, including
+    both ends. Points are interpolated inside segments, so long straight
+    highway stretches are covered as well as dense town streets.
+    """
+    if not coords or count <= 0:
+        return []
+    if count == 1 or len(coords) == 1:
+        return [coords[-1]]
+
+    cumulative = [0.0]
+    for a, b in zip(coords, coords[1:]):
+        cumulative.append(cumulative[-1] + segment_meters(a, b))
+    total = cumulative[-1]
+    if total == 0:
+        return [coords[0]]
+
+    samples = []
+    segment = 0
+    for i in range(count):
+        target = total * i / (count - 1)
+        while segment < len(coords) - 2 and cumulative[segment + 1] < target:
+            segment += 1
+        start, end = coords[segment], coords[segment + 1]
+        span = cumulative[segment + 1] - cumulative[segment]
+        fraction = (target - cumulative[segment]) / span if span else 0.0
+        samples.append((
+            start[0] + (end[0] - start[0]) * fraction,
+            start[1] + (end[1] - start[1]) * fraction,
+        ))
+    return samples
+
+
+def stops_for_distance(distance_meters, max_stops, miles_per_stop=25, min_stops=2):
+    """How many stops a route of this length deserves, capped at `max_stops`."""
+    wanted = int(round(distance_meters / METERS_PER_MILE / miles_per_stop)) + 1
+    return max(min(min_stops, max_stops), min(max_stops, wanted))
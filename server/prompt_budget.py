@@ -0,0 +1,154 @@
+# prompt_budget.py
+
+import logging
+import threading
+from collections import deque
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional; the character estimate is close enough for budgeting
+    tiktoken = None
+
+# Input tokens a prompt may use, prefix included
+PROMPT_TOKEN_BUDGET = 3000
+
+
+def _load_encoding():
+    """The o200k tokenizer, loaded once at import so no request waits on its download."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The encoding file couldn't be fetched (e.g. no network); fall back to the estimate
+        logging.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+        return None
+
+
+_encoding = _load_encoding()
+
+
+def estimate_tokens(text):
+    """
+    Token count for `text`: exact with tiktoken installed, otherwise about
+    four characters per token, which is what GPT tokenizers average on
+    English prose.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def ends_first(count):
+    """
+    Drop order for a list that should thin out evenly: the first and last
+    items go last, and each remaining gap is halved before any is emptied.
+    """
+    if count <= 0:
+        return []
+    keep = [0] + ([count - 1] if count > 1 else [])
+    gaps = deque([(0, count - 1)])
+    while gaps:
+        lo, hi = gaps.popleft()
+        if hi - lo < 2:
+            continue
+        middle = (lo + hi) // 2
+        keep.append(middle)
+        gaps.extend(((lo, middle), (middle, hi)))
+    return keep[::-1]
+
+
+class Section:
+    """
+    A droppable part of a prompt. `items` are removed one at a time in
+    `drop_order` (indices into items; default last first) while the prompt
+    is over budget, lowest `priority` section first. A trimmed section keeps
+    its `header` and notes how many items were left out, even when that is all of them.
+    """
+    __slots__ = ("name", "items", "priority", "drop_order", "header", "joiner", "noun", "kept")
+
+    def __init__(self, name, items, priority, drop_order=None, header="", joiner="\n", noun="items"):
+        self.name = name
+        self.items = list(items)
+        self.priority = priority
+        self.drop_order = list(drop_order) if drop_order is not None else list(range(len(self.items)))[::-1]
+        self.header = header
+        self.joiner = joiner
+        self.noun = noun
+        self.kept = [True] * len(self.items)
+
+    @property
+    def trimmed(self):
+        return sum(1 for kept in self.kept if not kept)
+
+    def drop_next(self):
+        while self.drop_order:
+            i = self.drop_order.pop(0)
+            if self.kept[i]:
+                self.kept[i] = False
+                return True
+        return False
+
+    def render(self):
+        kept = [item for item, keep in zip(self.items, self.kept) if keep]
+        if not self.trimmed:
+            return self.header + self.joiner.join(kept)
+        if not kept:
+            return f"({self.trimmed} {self.noun} left out to keep this prompt short)"
+        return self.header + self.joiner.join(kept) + f"{self.joiner}({self.trimmed} more {self.noun} left out to keep this prompt short)"
+
+
+class PromptBudget:
+    """
+    Fits a prompt's sections into a token budget. The fixed text (prefix,
+    question, time and place) always goes in; the sections are trimmed
+    lowest priority first until the estimate fits. Keeps running totals of
+    the final prompt sizes for /metrics.
+    """
+
+    def __init__(self, max_tokens=PROMPT_TOKEN_BUDGET):
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.total_tokens = 0
+        self.max_seen = 0
+        self.over_budget = 0
+        self.trimmed = {}
+
+    def fit(self, fixed_text, sections):
+        """Trim `sections` in place to fit alongside `fixed_text`; returns {name: rendered text}."""
+        used = estimate_tokens(fixed_text)
+        sizes = {section.name: estimate_tokens(section.render()) for section in sections}
+        by_priority = sorted(sections, key=lambda section: section.priority)
+        for section in by_priority:
+            while used + sum(sizes.values()) > self.max_tokens and section.drop_next():
+                sizes[section.name] = estimate_tokens(section.render())
+        trimmed = {section.name: section.trimmed for section in sections if section.trimmed}
+        if trimmed:
+            with self._lock:
+                for name, count in trimmed.items():
+                    self.trimmed[name] = self.trimmed.get(name, 0) + count
+        return {section.name: section.render() for section in sections}
+
+    def record(self, prompt):
+        """Count the final prompt's tokens into the running totals and return the count."""
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            self.prompts += 1
+            self.total_tokens += tokens
+            self.max_seen = max(self.max_seen, tokens)
+            if tokens > self.max_tokens:
+                self.over_budget += 1
+        return tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget": self.max_tokens,
+                "estimator": "tiktoken" if _encoding is not None else "chars/4",
+                "prompts": self.prompts,
+                "avg_tokens": round(self.total_tokens / self.prompts) if self.prompts else 0,
+                "max_tokens": self.max_seen,
+                "over_budget": self.over_budget,
+                "trimmed_items": dict(self.trimmed),
+            }
@@ -0,0 +1,51 @@
+# prompt_prefix.py
+
+import hashlib
+
+INSTRUCTIONS = """
+You are the official AI assistant for SpotSurfer Parking, an online parking management software.
+Your job is to provide helpful, concise, and always SpotSurfer-focused parking advice, suggestions, and answers first, then use your best knowledge to help the user.
+
+Use the following knowledge base, real-time weather, live traffic, and user context to help users make informed parking decisions and encourage them to book with SpotSurfer:
+    - Only answer questions that regard Spotsurfer or parkinging or traffic or weather conditions that might effect the users travel or experience.
+    - Never mention any of Spotsurfer's rival parking companies like Spothero or parkhub.
+    - Use the user's information to recommend nearby parking and travel tips.
+    - Only offer discount codes on occasion to improve user experience.
+    - Suggest things to do (restaurants, scenic routes, shopping, etc.) that enhance the user's trip.
+    - Use current weather and traffic to help the user plan ahead (e.g., departure time, gear, conditions).
+    - Only mention lift operations, events and holidays listed under LIFTS & EVENTS; that list is already limited to today and the next 6 weeks.
+    - You can also track a user's trip and proactively alert them when they are near available SpotSurfer parking locations.
+    - SPOTSURFER LOTS lists every lot; the KNOWLEDGE BASE section below it has the full details for the ones relevant to this question.
+"""
+
+
+def _lot_line(lot):
+    parts = [lot.city or lot.address]
+    if lot.price_min is not None:
+        price = f"${lot.price_min:g}" if lot.price_min == lot.price_max else f"${lot.price_min:g}-${lot.price_max:g}"
+        parts.append(f"{price}/day")
+    if lot.spots:
+        parts.append(f"{lot.spots} spots")
+    if lot.max_height_ft:
+        parts.append(f"max height {lot.max_height_ft:g} ft")
+    elif lot.max_height_text:
+        parts.append(lot.max_height_text.lower())
+    parts.append("overnight OK" if lot.overnight else "no overnight")
+    return f"- {lot.name}: " + ", ".join(part for part in parts if part)
+
+
+def build_prompt_prefix(base):
+    """
+    The part of every prompt that depends only on the knowledge base version:
+    the assistant instructions and a one-line directory of every lot. It is
+    built once per version and every prompt starts with exactly these bytes,
+    so the LLM provider can reuse its cached prefix across requests. Anything
+    that changes per request (time, location, retrieved chunks, weather,
+    traffic, the question) goes after it.
+    """
+    lots = "\n".join(_lot_line(lot) for lot in base.lots)
+    return f"{INSTRUCTIONS}\nSPOTSURFER LOTS:\n{lots}\n"
+
+
+def prefix_digest(prefix):
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,133 @@
+# request_context.py
+
+import asyncio
+import inspect
+import logging
+import threading
+from concurrent.futures import Future
+from deadline import DeadlineExceeded
+
+# Process-wide totals across every request's LookupContext, for /metrics
+_totals_lock = threading.Lock()
+LOOKUP_TOTALS = {"requests": 0, "fetched": 0, "suppressed": 0}
+
+
+class LookupContext:
+    """
+    Request-scoped memo that every upstream lookup of one /ask call goes
+    through, so each distinct (service, key) pair is fetched at most once per
+    request. Concurrent duplicates wait on the first call instead of issuing
+    their own. Works for both thread-pool and asyncio pipelines, but a single
+    context should only be used by one of them.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.suppressed = 0
+
+    def memoize(self, service, fn, key, aliases=None):
+        """
+        Wrap `fn` so calls are deduplicated by `key(*args)`. Keyword arguments
+        are per-call options (e.g. timeout) and don't take part in the key.
+        `aliases(result)` may return extra keys under which the same result is
+        also recorded (e.g. a weather observation's grid cell). Coroutine
+        functions get an async wrapper.
+        """
+        if inspect.iscoroutinefunction(fn):
+            async def memoized_async(*args, **kwargs):
+                return await self._call_async(service, fn, key, aliases, args, kwargs)
+            return memoized_async
+
+        def memoized(*args, **kwargs):
+            return self._call(service, fn, key, aliases, args, kwargs)
+        return memoized
+
+    def seed(self, service, key, value):
+        """Record a value already known to this request, e.g. a name we just reverse-geocoded."""
+        future = Future()
+        future.set_result(value)
+        with self._lock:
+            self._entries.setdefault((service, key), future)
+
+    def _claim(self, service, key, make_future):
+        with self._lock:
+            future = self._entries.get((service, key))
+            if future is not None:
+                self.suppressed += 1
+                return future, False
+            future = make_future()
+            self._entries[(service, key)] = future
+            self.fetched += 1
+            return future, True
+
+    def _add_aliases(self, service, aliases, result, future):
+        if not aliases or result is None:
+            return
+        with self._lock:
+            for alias in aliases(result):
+                self._entries.setdefault((service, alias), future)
+
+    def _call(self, service, fn, key, aliases, args, kwargs):
+        try:
+            lookup_key = key(*args)
+        except Exception:
+            # Unkeyable input (e.g. missing coordinates); let fn handle it uncached
+            return fn(*args, **kwargs)
+
+        future, owner = self._claim(service, lookup_key, Future)
+        if owner:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            future.set_result(result)
+            self._add_aliases(service, aliases, result, future)
+        return future.result()
+
+    async def _call_async(self, service, fn, key, aliases, args, kwargs):
+        try:
+            lookup_key = key(*args)
+        except Exception:
+            return await fn(*args, **kwargs)
+
+        future, owner = self._claim(service, lookup_key, asyncio.get_running_loop().create_future)
+        if owner:
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                # The owner ran out of budget. Duplicates get an ordinary error rather than
+                # CancelledError, a BaseException their callers' `except Exception` won't catch
+                future.set_exception(DeadlineExceeded(f"'{service}' lookup abandoned: request out of budget"))
+                future.exception()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                # Mark retrieved so asyncio doesn't warn when nobody else awaits it
+                future.exception()
+                raise
+            future.set_result(result)
+            self._add_aliases(service, aliases, result, future)
+            return result
+        if isinstance(future, Future):
+            return future.result()  # seeded value
+        return await future
+
+    def stats(self):
+        return {"fetched": self.fetched, "suppressed": self.suppressed}
+
+    def finish(self):
+        """Fold this request's counts into the process totals and log them."""
+        with _totals_lock:
+            LOOKUP_TOTALS["requests"] += 1
+            LOOKUP_TOTALS["fetched"] += self.fetched
+            LOOKUP_TOTALS["suppressed"] += self.suppressed
+        if self.suppressed:
+            logging.info(f"Lookup context: {self.fetched} fetched, {self.suppressed} duplicate lookups suppressed")
+
+
+def lookup_totals():
+    with _totals_lock:
+        return dict(LOOKUP_TOTALS)
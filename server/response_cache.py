@@ -0,0 +1,143 @@
+# response_cache.py
+
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+from retrieval import tokenize
+
+
+# Stopwords that say which way a question points, so "drive from Vail" and "drive to Vail" differ
+DIRECTION_WORDS = frozenset(("from", "to", "near", "in", "at"))
+
+
+def normalize_question(text):
+    """Content words in order, so "Where can I park in Vail?" and "where can i park in vail" share a key."""
+    return " ".join(tokenize(text, keep=DIRECTION_WORDS))
+
+
+def freshness_window(ttl, now=None):
+    """
+    (window number, seconds left in it) for data that goes stale every `ttl`
+    seconds. The window number acts as the snapshot version in cache keys,
+    so every answer built from one window of weather/traffic expires together.
+    """
+    now = time.time() if now is None else now
+    return int(now // ttl), ttl - (now % ttl)
+
+
+# Where get_or_compute() found a payload: the cache, another request's
+# computation of the same key, or this caller's own computation
+CACHED, COALESCED, COMPUTED = "cached", "coalesced", "computed"
+
+
+class ComputeAbandoned(Exception):
+    """The request computing a shared answer was cancelled before it finished."""
+
+
+class ResponseCache:
+    """
+    Finished /ask payloads keyed by the normalised question plus a context
+    fingerprint (location, date, knowledge base version, real-time data
+    window). Concurrent requests for the same key share one computation:
+    the first caller runs it and the rest wait for its result.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(question, *context):
+        raw = "|".join([normalize_question(question)] + [str(part or "") for part in context])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    def set(self, key, payload, ttl):
+        self.cache.set(key, payload, ttl)
+
+    def _claim(self, key, make_future):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = make_future()
+            return future, True
+
+    def _release(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get_or_compute(self, key, compute, ttl, should_store=None):
+        """
+        Return (payload, source), source being CACHED, COALESCED or COMPUTED.
+        `compute()` runs only when neither the cache nor an in-flight request
+        has the answer; its result is stored when `should_store(payload)`
+        allows it. A COALESCED payload is whatever the first caller computed,
+        stored or not.
+        """
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload, CACHED
+        future, owner = self._claim(("thread", key), Future)
+        if not owner:
+            return future.result(), COALESCED
+        try:
+            payload = compute()
+            if should_store is None or should_store(payload):
+                self.cache.set(key, payload, ttl)
+            future.set_result(payload)
+            return payload, COMPUTED
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # Only after the cache holds the answer, so no one slips between the two
+            self._release(("thread", key))
+
+    async def get_or_compute_async(self, key, compute, ttl, should_store=None):
+        """Async counterpart of get_or_compute(); `compute` is a coroutine function."""
+        payload = await self.cache.aget(key)
+        if payload is not None:
+            return payload, CACHED
+        # Kept apart from the threaded entries: waiters must await a loop future
+        future, owner = self._claim(("async", key), asyncio.get_running_loop().create_future)
+        if not owner:
+            try:
+                return await asyncio.shield(future), COALESCED
+            except ComputeAbandoned:
+                # The first caller went away (e.g. the client disconnected); answer this one afresh
+                return await self.get_or_compute_async(key, compute, ttl, should_store)
+        try:
+            payload = await compute()
+            if should_store is None or should_store(payload):
+                await self.cache.aset(key, payload, ttl)
+            future.set_result(payload)
+            return payload, COMPUTED
+        except asyncio.CancelledError:
+            # Not cancel(): waiters would get CancelledError, which `except Exception` doesn't catch
+            future.set_exception(ComputeAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            self._release(("async", key))
+
+    def stats(self):
+        stats = self.cache.stats()
+        with self._lock:
+            stats["coalesced"] = self.coalesced
+            stats["in_flight"] = len(self._inflight)
+        return stats
@@ -0,0 +1,91 @@
+# retrieval.py
+
+import math
+import re
+from collections import Counter, defaultdict
+
+STOPWORDS = frozenset("""
+a about an and any are as at be can could do does for from get go going how i i'm if in is it its
+me my near of on or should the there this to want what when where which will with would you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9$]+")
+
+
+def tokenize(text, keep=frozenset()):
+    """Lowercase word tokens without stopwords (other than those in `keep`), with plural -s folded away."""
+    tokens = []
+    for word in _WORD.findall(str(text).lower()):
+        if word in STOPWORDS and word not in keep:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory BM25 index over knowledge base chunks, built once at startup.
+    Titles are indexed twice so a lot's or FAQ question's own name outweighs
+    passing mentions elsewhere.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(list)  # term -> [(chunk index, term frequency)]
+        self._lengths = []
+
+        for i, chunk in enumerate(self.chunks):
+            terms = tokenize(chunk.title) * 2 + tokenize(chunk.text)
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings[term].append((i, tf))
+
+        count = len(self.chunks)
+        self._avg_length = sum(self._lengths) / count if count else 0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, query):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / self._avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _ranked(self, query, k):
+        return sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def search(self, query, k=6):
+        """Return up to `k` (chunk, score) pairs, best first."""
+        return [(self.chunks[i], score) for i, score in self._ranked(query, k)]
+
+    def context_for(self, query, k=6):
+        """The top-k chunks' text, joined in knowledge base order so related sections stay together."""
+        return "\n\n".join(self.context_parts(query, k)[0])
+
+    def context_parts(self, query, k=6):
+        """
+        context_for()'s chunks as a list, plus the order to drop them in
+        (indices into that list, least relevant first) when space runs out.
+        """
+        ranked = [i for i, _ in self._ranked(query, k)]
+        order = sorted(ranked)
+        position = {chunk: n for n, chunk in enumerate(order)}
+        return [self.chunks[i].text for i in order], [position[i] for i in reversed(ranked)]
+
+    def stats(self):
+        return {
+            "chunks": len(self.chunks),
+            "terms": len(self._postings),
+            "chars": sum(len(chunk.text) for chunk in self.chunks),
+        }
@@ -0,0 +1,122 @@
+# spatial_index.py
+
+import math
+from collections import defaultdict
+from location_extraction import distance_matrix, haversine_miles
+
+# Grid cell size in degrees; 0.05° is roughly 3.5 miles north-south in Colorado
+CELL_DEGREES = 0.05
+
+MILES_PER_DEGREE_LAT = 69.0
+
+
+class Place:
+    """A point the index can return: a SpotSurfer lot or a known landmark."""
+    __slots__ = ("name", "lat", "lng", "kind", "address")
+
+    def __init__(self, name, lat, lng, kind="lot", address=""):
+        self.name = name
+        self.lat = float(lat)
+        self.lng = float(lng)
+        self.kind = kind
+        self.address = address
+
+    def __repr__(self):
+        return f"Place({self.name!r}, {self.lat}, {self.lng}, {self.kind!r})"
+
+
+class GridIndex:
+    """
+    Fixed-size lat/lng grid over Places for "what's near me" queries without
+    any API call. radius() visits only the cells overlapping the circle's
+    bounding box; nearest() walks rings of cells outward from the query
+    point and stops once no unvisited cell can hold anything closer than
+    the k-th result so far.
+
+    Distances between every pair of places are computed once, in one
+    vectorised step, and looked up by name; `aliases` maps other names
+    (e.g. a KNOWN_LOCATIONS entry for a lot) to a place's name.
+    """
+
+    def __init__(self, places, cell_degrees=CELL_DEGREES, aliases=None):
+        self.places = list(places)
+        self.cell = cell_degrees
+        self.distances = distance_matrix([(place.lat, place.lng) for place in self.places])
+        self._position = {place.name.lower(): i for i, place in enumerate(self.places)}
+        for alias, name in (aliases or {}).items():
+            if name.lower() in self._position:
+                self._position.setdefault(alias.lower(), self._position[name.lower()])
+        self._cells = defaultdict(list)
+        for place in self.places:
+            self._cells[self._key(place.lat, place.lng)].append(place)
+        rows = [row for row, _ in self._cells] or [0]
+        cols = [col for _, col in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _key(self, lat, lng):
+        return math.floor(lat / self.cell), math.floor(lng / self.cell)
+
+    def _scan(self, cells, lat, lng, kind, found):
+        for key in cells:
+            for place in self._cells.get(key, ()):
+                if kind is None or place.kind == kind:
+                    found.append((place, haversine_miles(lat, lng, place.lat, place.lng)))
+
+    def radius(self, lat, lng, miles, kind=None):
+        """(place, miles) pairs within `miles` of the point, nearest first."""
+        dlat = miles / MILES_PER_DEGREE_LAT
+        # Longitude degrees shrink toward the pole, so size the box at the circle's poleward edge
+        dlng = miles / max(MILES_PER_DEGREE_LAT * math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        row_lo, col_lo = self._key(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._key(lat + dlat, lng + dlng)
+        found = []
+        self._scan(((row, col) for row in range(row_lo, row_hi + 1) for col in range(col_lo, col_hi + 1)),
+                   lat, lng, kind, found)
+        return sorted((item for item in found if item[1] <= miles), key=lambda item: item[1])
+
+    def nearest(self, lat, lng, k=3, kind=None, max_miles=None):
+        """The `k` closest (place, miles) pairs, optionally no further than `max_miles`."""
+        if not self.places or k <= 0:
+            return []
+        row, col = self._key(lat, lng)
+        row_lo, row_hi, col_lo, col_hi = self._bounds
+        # Grid lines run further apart north-south than east-west, so bound with the shorter side
+        cell_miles = self.cell * MILES_PER_DEGREE_LAT * min(1.0, math.cos(math.radians(lat)))
+        last_ring = max(abs(row - row_lo), abs(row - row_hi), abs(col - col_lo), abs(col - col_hi))
+        found = []
+        for ring in range(last_ring + 1):
+            if ring == 0:
+                cells = [(row, col)]
+            else:
+                cells = [(row + dr, col + dc) for dr in range(-ring, ring + 1) for dc in (-ring, ring)]
+                cells += [(row + dr, col + dc) for dr in (-ring, ring) for dc in range(-ring + 1, ring)]
+            self._scan(cells, lat, lng, kind, found)
+            # Anything in a ring not yet visited is at least this far away
+            reach = ring * cell_miles
+            if max_miles is not None and reach > max_miles:
+                break
+            if len(found) >= k and sorted(item[1] for item in found)[k - 1] <= reach:
+                break
+        found.sort(key=lambda item: item[1])
+        if max_miles is not None:
+            found = [item for item in found if item[1] <= max_miles]
+        return found[:k]
+
+    def distances_between(self, names):
+        """Pairwise miles between the named places as a matrix, or None if any name is unknown."""
+        positions = [self._position.get(name.lower()) for name in names]
+        if None in positions:
+            return None
+        return [[self.distances[i][j] for j in positions] for i in positions]
+
+    def distances_from(self, lat, lng, kind=None):
+        """(place, miles) for every place, optionally of one kind, nearest first."""
+        places = [place for place in self.places if kind is None or place.kind == kind]
+        row = distance_matrix([(lat, lng)], [(place.lat, place.lng) for place in places])[0]
+        return sorted(zip(places, row), key=lambda item: item[1])
+
+    def stats(self):
+        kinds = defaultdict(int)
+        for place in self.places:
+            kinds[place.kind] += 1
+        return {"places": len(self.places), "cells": len(self._cells), **kinds}
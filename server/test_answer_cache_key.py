@@ -0,0 +1,74 @@
+import pytest
+
+import main
+from response_cache import CACHED, COALESCED, ResponseCache, normalize_question
+
+DENVER_TO_AVON = {"user_location": "Denver", "reservation_details": {"destination": "Avon", "date": "2026-01-10"}}
+
+
+def _planned(message, **data):
+    job = main.AskRequest(dict(data, message=message))
+    job.planned()
+    return job
+
+
+def test_direction_words_stay_in_the_normalised_question():
+    assert normalize_question("How long is the drive from Vail?") != normalize_question("How long is the drive to Vail?")
+    assert normalize_question("Where can I park in Vail?") == normalize_question("where can i park in vail")
+
+
+def test_routes_in_opposite_directions_get_different_keys():
+    from_vail = _planned("How long is the drive from Vail?", **DENVER_TO_AVON)
+    to_vail = _planned("How long is the drive to Vail?", **DENVER_TO_AVON)
+    assert (from_vail.plan["origin"], from_vail.plan["destination"]) == ("Vail", "Avon")
+    assert (to_vail.plan["origin"], to_vail.plan["destination"]) == ("Denver", "Vail")
+    assert from_vail.cache_key != to_vail.cache_key
+    assert main._fallback_key(from_vail.req, from_vail.plan, from_vail.kb) != \
+        main._fallback_key(to_vail.req, to_vail.plan, to_vail.kb)
+
+
+def test_same_question_and_plan_share_a_key():
+    first = _planned("How long is the drive from Vail?", **DENVER_TO_AVON)
+    second = _planned("how long is the drive from vail", **DENVER_TO_AVON)
+    assert first.cache_key == second.cache_key
+
+
+def test_ttl_follows_the_real_time_data_in_the_plan():
+    static = _planned("Which lot suits a lifted truck with a roof box?")
+    route = _planned("How long is the drive from Vail?", **DENVER_TO_AVON)
+    assert 0 < static.ttl <= main.ANSWER_STATIC_TTL
+    assert 0 < route.ttl <= main.traffic_service.route_ttl
+
+
+def test_trip_start_is_never_cached():
+    job = _planned("", intent="trip_start_simple")
+    assert job.cache_key is None
+
+
+def test_each_request_is_planned_once(monkeypatch):
+    main.answer_cache.cache.local.clear()
+    calls = []
+    plan = main._plan_prompt_context
+
+    def counting_plan(*args, **kwargs):
+        calls.append(args)
+        return plan(*args, **kwargs)
+
+    monkeypatch.setattr(main, "_plan_prompt_context", counting_plan)
+    monkeypatch.setattr(main.llm_client, "create", lambda request, budget, **kwargs: {
+        "choices": [{"message": {"content": "Try the Ford Park lot."}}]})
+    payload = main.app.test_client().post("/ask", json={"message": "Which lot suits a lifted truck?"}).get_json()
+    assert payload["answered_by"] == "llm"
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("context", [("vail",), ("vail", "", "avon")])
+def test_make_key_depends_on_context(context):
+    assert ResponseCache.make_key("park?", *context) != ResponseCache.make_key("park?")
+
+
+def test_only_stored_answers_are_labelled_as_cache_hits():
+    job = _planned("Which lot suits a lifted truck with a roof box?")
+    unavailable = {"response": main.LLM_FAILURE_MESSAGE, "answered_by": "unavailable"}
+    assert job.finish(unavailable, COALESCED)["answered_by"] == "unavailable"
+    assert job.finish({"response": "Try Ford Park.", "answered_by": "llm"}, CACHED)["answered_by"] == "cache"
@@ -0,0 +1,58 @@
+import pytest
+
+import main
+from llm_client import LLMUnavailable
+
+QUESTION = {"message": "Which lot suits a lifted truck with a roof box?", "user_location": "Avon"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    main.answer_cache.cache.local.clear()
+    main.answer_fallbacks.local.clear()
+    return main.app.test_client()
+
+
+def _llm_replies(monkeypatch, text):
+    monkeypatch.setattr(main.llm_client, "create", lambda request, budget, **kwargs: {
+        "choices": [{"message": {"content": text}}]})
+
+
+def _llm_down(monkeypatch):
+    monkeypatch.setattr(main.llm_client, "available", lambda: False)
+
+
+def test_completed_answer_is_served_while_llm_is_down(client, monkeypatch):
+    _llm_replies(monkeypatch, "Try the Ford Park lot.")
+    assert client.post("/ask", json=QUESTION).get_json()["answered_by"] == "llm"
+
+    main.answer_cache.cache.local.clear()
+    _llm_down(monkeypatch)
+    payload = client.post("/ask", json=QUESTION).get_json()
+    assert payload["degraded"]
+    assert payload["answered_by"] == "cache"
+    assert payload["response"] == "Try the Ford Park lot."
+
+
+def test_cut_off_stream_never_becomes_the_fallback(client, monkeypatch):
+    def stream(request, budget):
+        yield {"choices": [{"delta": {"content": "You can park at Lionshead and"}}]}
+        raise LLMUnavailable("stream broke off")
+
+    monkeypatch.setattr(main.llm_client, "stream", stream)
+    client.post("/ask/stream", json=QUESTION)
+
+    _llm_down(monkeypatch)
+    payload = client.post("/ask", json=QUESTION).get_json()
+    assert payload["answered_by"] == "unavailable"
+    assert "Lionshead" not in payload["response"]
+
+
+@pytest.mark.parametrize("payload", [
+    {"answered_by": "llm", "response": "Park at", "partial": True},
+    {"answered_by": "llm", "response": "Park at", "degraded": True},
+    {"answered_by": "faq", "response": "Yes."},
+    {"answered_by": "llm", "response": main.LLM_FAILURE_MESSAGE},
+])
+def test_incomplete_answers_are_not_cacheable(payload):
+    assert not main._cacheable(payload)
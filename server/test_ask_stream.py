@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import main
+from llm_client import LLMUnavailable
+
+QUESTION = {"message": "Which lot suits a lifted truck with a roof box?"}
+
+
+def _chunk(text):
+    return {"choices": [{"delta": {"content": text}}]}
+
+
+def _events(body):
+    """(event, data) pairs from an SSE response body."""
+    events = []
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    main.answer_cache.cache.local.clear()
+    main.answer_fallbacks.local.clear()
+    monkeypatch.setattr(main.llm_client, "create", lambda request, budget, **kwargs: {
+        "choices": [{"message": {"content": "Try the Ford Park lot."}}]})
+    return main.app.test_client()
+
+
+def _stream(client, monkeypatch, chunks, error=None):
+    def stream(request, budget):
+        for text in chunks:
+            yield _chunk(text)
+        if error:
+            raise error
+
+    monkeypatch.setattr(main.llm_client, "stream", stream)
+    return _events(client.post("/ask/stream", json=QUESTION).data.decode())
+
+
+def test_completed_stream_is_cached(client, monkeypatch):
+    events = _stream(client, monkeypatch, ["Try the ", "Ford Park lot."])
+    assert [event for event, _ in events] == ["delta", "delta", "done"]
+    done = events[-1][1]
+    assert done["response"] == "Try the Ford Park lot."
+    assert not done.get("partial")
+
+    assert client.post("/ask", json=QUESTION).get_json()["answered_by"] == "cache"
+
+
+def test_broken_stream_is_marked_partial_and_not_cached(client, monkeypatch):
+    events = _stream(client, monkeypatch, ["You can park at Lionshead and"], LLMUnavailable("stream broke off"))
+    event, done = events[-1]
+    assert event == "done"
+    assert done["response"] == "You can park at Lionshead and"
+    assert done["partial"] and done["degraded"]
+
+    # The cut-off text must not come back as a cached or fallback answer
+    assert len(main.answer_cache.cache.local) == 0
+    assert len(main.answer_fallbacks.local) == 0
+    payload = client.post("/ask", json=QUESTION).get_json()
+    assert payload["answered_by"] == "llm"
+    assert payload["response"] == "Try the Ford Park lot."
+
+
+def test_stream_failing_before_any_text_falls_back(client, monkeypatch):
+    events = _stream(client, monkeypatch, [], LLMUnavailable("circuit open"))
+    assert [event for event, _ in events] == ["done"]
+    assert events[0][1]["degraded"]
+    assert len(main.answer_cache.cache.local) == 0
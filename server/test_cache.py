@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+import pytest
+
+from cache import TTLCache, TieredCache, coords_bucket, normalize_place_key, parse_coords
+
+
+class RecordingCache:
+    """Stands in for a cachelib cache and remembers the timeouts it was given."""
+
+    def __init__(self):
+        self.data = {}
+        self.timeouts = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+        self.timeouts[key] = timeout
+
+
+@pytest.mark.parametrize("ttl, timeout", [(0.2, 1), (0.999, 1), (1.5, 2), (60, 60)])
+def test_shared_timeout_is_never_zero(ttl, timeout):
+    shared = RecordingCache()
+    cache = TieredCache(TTLCache(ttl=600), shared, prefix="t:")
+    cache.set("k", "v", ttl)
+    assert shared.timeouts["t:k"] == timeout
+
+
+def test_shared_timeout_defaults_to_local_ttl():
+    shared = RecordingCache()
+    TieredCache(TTLCache(ttl=300), shared).set("k", "v")
+    assert shared.timeouts["k"] == 300
+
+
+def test_shared_hit_fills_local_tier():
+    shared = RecordingCache()
+    shared.data["p:k"] = "v"
+    cache = TieredCache(TTLCache(), shared, prefix="p:")
+    assert cache.get("k") == "v"
+    assert cache.local.get("k") == "v"
+    assert cache.shared_hits == 1
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.time", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] += 11
+    assert cache.get("a") is None
+
+
+def test_place_keys_and_coordinates():
+    assert normalize_place_key("Vail, CO 81657, USA") == normalize_place_key("vail")
+    assert coords_bucket(39.6401, -106.3612) == coords_bucket(39.6399, -106.3598)
+    assert parse_coords(" 39.64, -106.37 ") == (39.64, -106.37)
+    assert parse_coords("Vail") is None
+
+
+class ThreadRecordingCache(RecordingCache):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value, timeout=None):
+        self.threads.append(threading.get_ident())
+        super().set(key, value, timeout)
+
+
+def test_async_shared_tier_calls_leave_the_event_loop_thread():
+    shared = ThreadRecordingCache()
+    cache = TieredCache(TTLCache(), shared)
+
+    async def scenario():
+        await cache.aset("k", "v", 60)
+        cache.local.clear()
+        assert await cache.aget("k") == "v"
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(shared.threads) == 2
+    assert loop_thread not in shared.threads
+
+
+def test_async_local_hit_skips_the_shared_tier():
+    shared = ThreadRecordingCache()
+    cache = TieredCache(TTLCache(), shared)
+    cache.local.set("k", "v")
+    assert asyncio.run(cache.aget("k")) == "v"
+    assert shared.threads == []
@@ -0,0 +1,64 @@
+import datetime
+import random
+
+from calendar_index import CalendarIndex
+from knowledge_base import CalendarEntry
+
+D = datetime.date
+
+ENTRIES = [
+    CalendarEntry("ski_season", "Vail ski season", D(2025, 11, 14), D(2026, 4, 19), location="Vail"),
+    CalendarEntry("summer_operations", "Beaver Creek summer", D(2026, 6, 12), D(2026, 9, 7),
+                  location="Beaver Creek", hours="9:30am-5pm"),
+    CalendarEntry("holiday", "Presidents' Day", D(2026, 2, 16)),
+    CalendarEntry("event", "Sunday market", D(2026, 6, 1), D(2026, 8, 31), location="Vail Village", days=("Sunday",)),
+    CalendarEntry("school_break", "Denver spring break", D(2026, 3, 23), D(2026, 3, 27)),
+]
+
+
+def _names(entries):
+    return sorted(entry.name for entry in entries)
+
+
+def test_overlapping_matches_a_full_scan():
+    rng = random.Random(3)
+    entries = []
+    for i in range(60):
+        start = D(2026, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+        entries.append(CalendarEntry("event", f"event {i}", start, start + datetime.timedelta(days=rng.randrange(40))))
+    index = CalendarIndex(entries)
+    for _ in range(50):
+        start = D(2026, 1, 1) + datetime.timedelta(days=rng.randrange(400))
+        end = start + datetime.timedelta(days=rng.randrange(30))
+        assert _names(index.overlapping(start, end)) == \
+            _names(entry for entry in entries if entry.start <= end and entry.end >= start)
+
+
+def test_weekday_entries_are_only_on_their_days():
+    index = CalendarIndex(ENTRIES)
+    assert _names(index.active_on(D(2026, 6, 14))) == ["Beaver Creek summer", "Sunday market"]
+    assert _names(index.active_on(D(2026, 6, 15))) == ["Beaver Creek summer"]
+    market = ENTRIES[3]
+    assert CalendarIndex.next_occurrence(market, D(2026, 6, 2), D(2026, 6, 30)) == D(2026, 6, 7)
+
+
+def test_upcoming_lists_entries_within_the_horizon_but_not_today():
+    index = CalendarIndex(ENTRIES)
+    upcoming = index.upcoming(D(2026, 2, 1))
+    assert [(entry.name, first) for entry, first in upcoming] == [("Presidents' Day", D(2026, 2, 16))]
+    # Spring break is more than six weeks out on Feb 1, but not on Feb 20
+    assert "Denver spring break" in _names(entry for entry, _ in index.upcoming(D(2026, 2, 20)))
+
+
+def test_view_lists_today_and_mountains_without_operations():
+    view = CalendarIndex(ENTRIES, lift_hours={"Vail": {"Gondola One": "8:30am-4pm"}}).view_for(D(2026, 2, 16))
+    assert "Today (Monday, February 16, 2026):" in view
+    assert "Vail ski season: lifts open today (until Sun, Apr 19). Lift hours: Gondola One 8:30am-4pm" in view
+    assert "- Holiday: Presidents' Day" in view
+    assert "- Beaver Creek: no lift or gondola operations today" in view
+    assert "- Mon, Mar 23 to Fri, Mar 27: School break (Denver spring break)" in view
+
+
+def test_views_are_cached_per_day():
+    index = CalendarIndex(ENTRIES)
+    assert index.view_for(D(2026, 2, 16)) is index.view_for(D(2026, 2, 16))
@@ -0,0 +1,105 @@
+import openai
+import pytest
+
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(threshold=3, reset_after=30):
+    clock = FakeClock()
+    return CircuitBreaker(failure_threshold=threshold, reset_after=reset_after, clock=clock), clock
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures():
+    breaker, _ = _breaker()
+    _fail(breaker, 2)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow() and not breaker.available()
+    assert breaker.stats()["trips"] == 1
+
+
+def test_a_success_resets_the_failure_count():
+    breaker, _ = _breaker()
+    _fail(breaker, 2)
+    breaker.record_success()
+    _fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_one_probe_after_cooling_down():
+    breaker, clock = _breaker()
+    _fail(breaker, 3)
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the one probe goes through
+    assert not breaker.allow() and not breaker.available()
+
+
+def test_probe_outcome_closes_or_reopens():
+    breaker, clock = _breaker()
+    _fail(breaker, 3)
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    assert breaker.stats()["trips"] == 2
+
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_abandoned_probe_lets_the_next_caller_probe():
+    breaker, clock = _breaker()
+    _fail(breaker, 3)
+    clock.now += 30
+    breaker.allow()
+    breaker.abandon()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+
+def test_a_rejected_request_while_half_open_does_not_close_the_circuit(monkeypatch):
+    breaker, clock = _breaker()
+    _fail(breaker, 3)
+    clock.now += 30
+
+    def bad_request(**kwargs):
+        raise openai.error.InvalidRequestError("messages is required", "messages", http_status=400)
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", bad_request)
+    client = LLMClient(breaker, attempts=3)
+    with pytest.raises(LLMUnavailable):
+        client.create({"model": "gpt-4o-mini"}, budget=10)
+    # The probe slot is free again, but the endpoint's health is still unproven
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_a_rejected_request_leaves_a_closed_circuit_closed(monkeypatch):
+    breaker, _ = _breaker()
+
+    def unauthorised(**kwargs):
+        raise openai.error.AuthenticationError("bad key", http_status=401)
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", unauthorised)
+    with pytest.raises(LLMUnavailable):
+        LLMClient(breaker).create({"model": "gpt-4o-mini"}, budget=10)
+    assert breaker.state == CircuitBreaker.CLOSED
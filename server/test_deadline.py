@@ -0,0 +1,68 @@
+import pytest
+
+import deadline as deadline_module
+import main
+from deadline import MIN_STEP_SECONDS, Deadline, DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deadline_module.time, "monotonic", clock)
+    return clock
+
+
+def test_enrichment_spends_only_what_the_llm_reserve_leaves(clock):
+    deadline = Deadline(budget=25, reserve=15)
+    assert deadline.enrichment_remaining() == 10
+    clock.now += 4
+    assert deadline.remaining() == 21
+    assert deadline.enrichment_remaining() == 6
+
+
+def test_reserve_never_exceeds_the_budget(clock):
+    deadline = Deadline(budget=5, reserve=15)
+    assert deadline.reserve == 5
+    assert deadline.enrichment_remaining() == 0
+
+
+def test_step_timeouts_are_capped_by_the_enrichment_budget(clock):
+    deadline = Deadline(budget=25, reserve=15)
+    assert deadline.timeout_for(3.0) == 3.0
+    clock.now += 8
+    assert deadline.timeout_for(3.0) == pytest.approx(2.0)
+    clock.now += 2 - MIN_STEP_SECONDS
+    assert deadline.timeout_for(3.0) == pytest.approx(MIN_STEP_SECONDS)
+
+
+def test_a_spent_budget_raises_instead_of_allowing_a_default(clock):
+    deadline = Deadline(budget=25, reserve=15)
+    clock.now += 10 - MIN_STEP_SECONDS / 2
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout_for(3.0)
+    clock.now += 60
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout_for(3.0)
+
+
+def test_llm_keeps_its_reserve_however_long_enrichment_took(clock):
+    deadline = Deadline(budget=25, reserve=15)
+    clock.now += 2
+    assert deadline.llm_timeout() == 23
+    clock.now += 20
+    assert deadline.llm_timeout() == 15
+
+
+def test_a_late_locality_geocode_gets_the_minimum_step(clock):
+    job = main.AskRequest({"message": "Where can I park?", "lat": 39.64, "lng": -106.37})
+    assert job.geocode_timeout() == main.GEOCODE_TIMEOUT
+    clock.now += job.deadline.budget
+    assert job.geocode_timeout() == MIN_STEP_SECONDS
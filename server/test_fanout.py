@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+from fanout import TaskGraph
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _chain(log):
+    def step(name):
+        def run(*inputs):
+            log.append(name)
+            return f"{name}({','.join(inputs)})"
+        return run
+
+    return (TaskGraph()
+            .add("geocode", step("geocode"))
+            .add("weather", step("weather"), deps=("geocode",))
+            .add("route", step("route"))
+            .add("summary", step("summary"), deps=("weather", "route")))
+
+
+def test_dependents_get_their_inputs_in_the_order_listed(pool):
+    log = []
+    results, errors = _chain(log).run(pool)
+    assert errors == {}
+    assert results["summary"] == "summary(weather(geocode()),route())"
+    assert log.index("geocode") < log.index("weather") < log.index("summary")
+
+
+def test_async_run_matches_the_threaded_one():
+    log = []
+    results, errors = asyncio.run(_chain(log).run_async())
+    assert errors == {}
+    assert results["summary"] == "summary(weather(geocode()),route())"
+
+
+def test_failures_propagate_to_dependents(pool):
+    def broken():
+        raise ValueError("no results")
+
+    graph = (TaskGraph()
+             .add("geocode", broken)
+             .add("weather", lambda place: place, deps=("geocode",))
+             .add("route", lambda: "I-70"))
+    for results, errors in (graph.run(pool), asyncio.run(graph.run_async())):
+        assert results == {"route": "I-70"}
+        assert isinstance(errors["geocode"], ValueError)
+        assert errors["weather"] is errors["geocode"]
+
+
+def test_unknown_or_duplicate_tasks_are_rejected():
+    graph = TaskGraph().add("geocode", lambda: None)
+    with pytest.raises(ValueError):
+        graph.add("geocode", lambda: None)
+    with pytest.raises(ValueError):
+        graph.add("weather", lambda place: place, deps=("forecast",))
+
+
+def test_upstream_timeouts_are_capped_by_the_budget(pool):
+    seen = {}
+
+    def lookup(timeout):
+        seen["timeout"] = timeout
+
+    TaskGraph().add("weather", lookup, timeout=3.0).run(pool, Deadline(budget=2.0, reserve=0))
+    assert 1.5 < seen["timeout"] <= 2.0
+
+
+def test_no_budget_skips_upstream_calls(pool):
+    called = []
+    graph = TaskGraph().add("weather", lambda timeout: called.append(timeout), timeout=3.0)
+    results, errors = graph.run(pool, Deadline(budget=0.1, reserve=0))
+    assert called == [] and results == {}
+    assert isinstance(errors["weather"], DeadlineExceeded)
+
+
+def test_deadline_abandons_running_work_and_cancels_queued_work():
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    ran = []
+
+    def slow(timeout):
+        # Ignores its timeout (capped to the same 0.8s budget) so it can't race the deadline
+        ran.append("slow")
+        release.wait(5)
+        return "late"
+
+    graph = (TaskGraph()
+             .add("slow", slow, timeout=3.0)
+             .add("queued", lambda timeout: ran.append("queued"), timeout=3.0))
+    started = time.monotonic()
+    results, errors = graph.run(executor, Deadline(budget=0.8, reserve=0))
+    assert time.monotonic() - started < 1.5
+    assert results == {}
+    assert set(errors) == {"slow", "queued"}
+    assert all(isinstance(error, DeadlineExceeded) for error in errors.values())
+
+    release.set()
+    executor.shutdown(wait=True)
+    # The queued task was cancelled rather than left to run after the request gave up
+    assert ran == ["slow"]
+
+
+def test_async_deadline_abandons_slow_lookups():
+    async def slow(timeout):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        started = time.monotonic()
+        results, errors = await TaskGraph().add("slow", slow, timeout=3.0).run_async(Deadline(budget=0.8, reserve=0))
+        return time.monotonic() - started, results, errors
+
+    took, results, errors = asyncio.run(scenario())
+    assert took < 1.5
+    assert results == {} and isinstance(errors["slow"], DeadlineExceeded)
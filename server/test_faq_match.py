@@ -0,0 +1,69 @@
+import pytest
+
+import faq_match
+import main
+from faq_match import FAQ_MATCH_THRESHOLD, FaqMatcher, normalize_question
+
+EXAMPLES = [
+    ("Do I need an account?", "Do I need an account to book a spot?"),
+    ("What is the cancellation policy?", "What is the cancellation and refund policy?"),
+    ("How do I pay?", "How do I pay for my parking reservation?"),
+    ("Can I cancel my reservation?", "Can I modify or cancel my reservation?"),
+    ("What’s the closest parking to Gondola One?", "63 Willow Place."),
+]
+
+NEAR_MISSES = [
+    # Same question about another town, gondola or resort
+    "Where can I park overnight in Avon?",
+    "Can I sleep in my car in Avon?",
+    "What's the closest parking to Gondola Two?",
+    "Where should I park if I'm skiing Vail?",
+    # Fits more than one FAQ
+    "Can I cancel?",
+    "Is there parking?",
+    # Asks for more than the FAQ answers
+    "Can I leave my RV overnight at Arrabelle near the gondola?",
+    "What is the cancellation policy for property owners?",
+]
+
+
+@pytest.fixture(params=["rapidfuzz", "difflib"])
+def matcher(request, monkeypatch):
+    if request.param == "difflib":
+        monkeypatch.setattr(faq_match, "fuzz", None)
+        monkeypatch.setattr(faq_match, "process", None)
+    return FaqMatcher(main.live_knowledge.current.base.faqs)
+
+
+def _answered(faq, expected):
+    return expected in (faq.question, faq.answer)
+
+
+def test_contractions_leave_no_stray_letters():
+    assert normalize_question("What’s the closest parking to Gondola One?") == "closest parking gondola one"
+    assert normalize_question("Where should I park if I'm skiing?") == "park skiing"
+
+
+@pytest.mark.parametrize("question, expected", EXAMPLES)
+def test_common_questions_match_their_faq(matcher, question, expected):
+    faq, score = matcher.match(question)
+    assert _answered(faq, expected)
+    assert score >= FAQ_MATCH_THRESHOLD
+
+
+def test_misspellings_match_at_the_fallback_threshold(matcher):
+    assert matcher.match("What is the cancelation policy?") is None
+    faq, _ = matcher.match("What is the cancelation policy?", main.FAQ_FALLBACK_THRESHOLD)
+    assert faq.question == "What is the cancellation and refund policy?"
+
+
+@pytest.mark.parametrize("question", NEAR_MISSES)
+def test_near_misses_go_to_the_llm(matcher, question):
+    assert matcher.match(question) is None
+    assert matcher.match(question, main.FAQ_FALLBACK_THRESHOLD) is None
+
+
+def test_hits_and_misses_are_counted(matcher):
+    matcher.match("How do I pay?")
+    matcher.match("Can I cancel?")
+    assert (matcher.hits, matcher.misses) == (1, 1)
@@ -0,0 +1,47 @@
+import pytest
+
+from gazetteer import Gazetteer
+
+
+@pytest.fixture
+def gazetteer():
+    return Gazetteer()
+
+
+@pytest.mark.parametrize("text, name", [
+    ("DIA", "Denver International Airport"),
+    ("dia", "Denver International Airport"),
+    ("Breck", "Breckenridge"),
+    ("Breckenridge, CO", "Breckenridge"),
+])
+def test_names_and_aliases_resolve_exactly(gazetteer, text, name):
+    assert gazetteer.lookup(text).name == name
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Breckenrige", "Breckenridge"),
+    ("Denver Internatonal Airport", "Denver International Airport"),
+])
+def test_near_misses_of_long_names_resolve(gazetteer, text, name):
+    assert gazetteer.lookup(text).name == name
+
+
+@pytest.mark.parametrize("text", [
+    "Vial",  # one letter off "Vail", but too short to trust a fuzzy match
+    "Aspn",
+    "Brek",
+    "Book a spot",
+    "Fort Collins",
+    "",
+])
+def test_short_or_unrelated_strings_return_none(gazetteer, text):
+    assert gazetteer.lookup(text) is None
+
+
+def test_lots_are_replaced_on_reload(gazetteer):
+    gazetteer.set_lots([("Ford Park Lot", "Ford Park, Vail, CO", 39.64, -106.36)])
+    assert gazetteer.lookup("ford park lot").kind == "lot"
+    gazetteer.set_lots([])
+    assert gazetteer.lookup("Ford Park Lot") is None
+    assert gazetteer.lookup("DIA") is not None
+    assert gazetteer.stats()["hits"] == 2 and gazetteer.stats()["misses"] == 1
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from geocode_store import MISS, GeocodeStore, forward_key, reverse_key
+
+
+def test_values_and_misses_persist(tmp_path):
+    path = str(tmp_path / "geo.sqlite3")
+    store = GeocodeStore(path)
+    store.store("forward", forward_key("Vail, CO"), "Vail, CO 81657, USA")
+    store.store("forward", forward_key("Nowhere"), None)
+
+    reopened = GeocodeStore(path)
+    assert reopened.lookup("forward", "vail, co") == "Vail, CO 81657, USA"
+    assert reopened.lookup("forward", "nowhere") is None
+    assert reopened.lookup("forward", "aspen") is MISS
+
+
+def test_async_lookup_reads_sqlite_off_the_loop_thread(tmp_path, monkeypatch):
+    path = str(tmp_path / "geo.sqlite3")
+    GeocodeStore(path).store("locality", reverse_key(39.64, -106.37), "Vail")
+    store = GeocodeStore(path)
+    threads = []
+    disk_lookup = store._disk_lookup
+
+    def recording(kind, key):
+        threads.append(threading.get_ident())
+        return disk_lookup(kind, key)
+
+    monkeypatch.setattr(store, "_disk_lookup", recording)
+
+    async def scenario():
+        first = await store.alookup("locality", reverse_key(39.64, -106.37))
+        second = await store.alookup("locality", reverse_key(39.64, -106.37))
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(scenario())
+    assert first == second == "Vail"
+    # The second read is served from memory, without a thread hop
+    assert len(threads) == 1 and threads[0] != loop_thread
+
+
+def test_keys_ignore_trivial_differences():
+    assert forward_key("  Vail,  CO. ") == forward_key("vail, co")
+    assert reverse_key(39.64001, -106.37001) == reverse_key(39.64004, -106.36998)
@@ -0,0 +1,185 @@
+import datetime
+import os
+import pickle
+
+import pytest
+
+import knowledge_base
+from knowledge_base import SNAPSHOT_VERSION, KnowledgeWatcher, load_knowledge, parse_knowledge_base
+
+KB_TEXT = """Spotsurfer  Current Lot Information:
+Ford Park:
+  Price:$25/day overnight allowed
+  Spots: 40
+  Address: 580 S Frontage Rd E, Vail, CO 81657
+  Amenities: Restrooms, Free WiFi
+  MaxHeight: 7 ft
+  Type: Self Parking overnight lot
+
+Avon Station - $30/day - Self Parking
+  Price:$30-$40/day no overnight
+  Address: 100 W Beaver Creek Blvd, Avon, CO 81620
+  Amenities: N/A
+
+Spotsurfer Coupon Codes:
+SKI10 - 10% off your first booking
+
+FAQ:
+Q: How do I pay for my parking reservation?
+A: Pay by card at checkout.
+Q: Can I leave my car overnight?      Only at lots marked overnight.
+
+HELPFUL Spotsurfer Links:
+Website: https://spotsurfer.com
+Parking Guide
+Arrive early on powder days; the Vail garages fill by 9am.
+{
+ "winter_ski_season": {"vail": {"opening_day": "2025-11-14", "closing_day": "2026-04-19"}},
+ "events": [{"name": "Sunday market", "start_date": "2026-06-01", "end_date": "2026-08-31",
+             "recurring_day": "Sunday", "location": "Vail Village"}],
+ "winter_lift_hours": {"vail": {"gondola_one": "8:30am-4pm"}}
+}
+"""
+
+
+def test_parses_lots_faqs_and_calendar():
+    kb = parse_knowledge_base(KB_TEXT)
+
+    ford, avon = kb.lots
+    assert (ford.name, ford.city, ford.price_min, ford.spots, ford.max_height_ft, ford.overnight) == \
+        ("Ford Park", "Vail", 25, 40, 7, True)
+    assert ford.amenities == ("Restrooms", "Free WiFi")
+    assert (avon.name, avon.summary, avon.city) == ("Avon Station", "$30/day - Self Parking", "Avon")
+    assert (avon.price_min, avon.price_max, avon.overnight, avon.amenities) == (30, 40, False, ())
+    assert kb.lot("ford park") is ford and kb.lots_in_city("Avon") == [avon]
+    assert kb.lots_by_price(max_price=28) == [ford]
+
+    assert [(faq.question, faq.answer) for faq in kb.faqs] == [
+        ("How do I pay for my parking reservation?", "Pay by card at checkout."),
+        ("Can I leave my car overnight?", "Only at lots marked overnight."),
+    ]
+
+    season, market = sorted(kb.calendar, key=lambda entry: entry.kind == "event")
+    assert (season.kind, season.name, season.start, season.end) == \
+        ("ski_season", "Vail ski season", datetime.date(2025, 11, 14), datetime.date(2026, 4, 19))
+    assert (market.name, market.days, market.location) == ("Sunday market", ("Sunday",), "Vail Village")
+    assert kb.lift_hours == {"Vail": {"Gondola One": "8:30am-4pm"}}
+
+    kinds = [chunk.kind for chunk in kb.chunks]
+    assert kinds[:2] == ["lot", "lot"]
+    assert {"coupons", "faq", "links", "policy", "calendar"} <= set(kinds)
+
+
+def _write(tmp_path, text=KB_TEXT):
+    path = tmp_path / "knowledge_base.txt"
+    path.write_text(text)
+    return str(path), str(tmp_path / "knowledge_base.snapshot")
+
+
+def test_snapshot_is_reused_for_the_same_contents(tmp_path, monkeypatch):
+    path, snapshot = _write(tmp_path)
+    first = load_knowledge(path, snapshot)
+
+    monkeypatch.setattr(knowledge_base, "parse_knowledge_base", lambda text: pytest.fail("parsed again"))
+    again = load_knowledge(path, snapshot)
+    assert again.source_hash == first.source_hash
+    assert [lot.name for lot in again.lots] == ["Ford Park", "Avon Station"]
+
+
+@pytest.mark.parametrize("field, value", [("source_hash", "0" * 64), ("version", SNAPSHOT_VERSION + 1)])
+def test_mismatched_snapshot_is_rebuilt(tmp_path, field, value):
+    path, snapshot = _write(tmp_path)
+    load_knowledge(path, snapshot)
+    with open(snapshot, "rb") as f:
+        stored = pickle.load(f)
+    stored["knowledge"].lots = []
+    stored[field] = value
+    with open(snapshot, "wb") as f:
+        pickle.dump(stored, f)
+
+    kb = load_knowledge(path, snapshot)
+    assert [lot.name for lot in kb.lots] == ["Ford Park", "Avon Station"]
+    with open(snapshot, "rb") as f:
+        assert pickle.load(f)[field] != value
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    path, snapshot = _write(tmp_path)
+    with open(snapshot, "wb") as f:
+        f.write(b"\x80\x04not a pickle")
+
+    kb = load_knowledge(path, snapshot)
+    assert len(kb.lots) == 2
+    with open(snapshot, "rb") as f:
+        assert pickle.load(f)["source_hash"] == kb.source_hash
+
+
+def test_missing_file_loads_empty(tmp_path):
+    kb = load_knowledge(str(tmp_path / "missing.txt"), str(tmp_path / "snapshot"))
+    assert kb.lots == [] and kb.chunks == []
+
+
+class Built:
+    """Stands in for KnowledgeState: whatever `build` makes from a KnowledgeBase."""
+
+    def __init__(self, kb):
+        self.kb = kb
+        self.lots = [lot.name for lot in kb.lots]
+
+
+def _edit(path, text, mtime):
+    with open(path, "w") as f:
+        f.write(text)
+    # Explicit mtimes, so each edit changes the stamp even on coarse filesystem clocks
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def watched(tmp_path):
+    path, snapshot = _write(tmp_path)
+    os.utime(path, ns=(10**18, 10**18))
+    return path, KnowledgeWatcher(path, Built, snapshot, interval=0)
+
+
+def test_reload_waits_for_the_file_to_settle(watched):
+    path, watcher = watched
+    before = watcher.current
+    _edit(path, KB_TEXT.replace("Ford Park", "Ford Park West"), 10**18 + 1)
+
+    assert not watcher.check()
+    assert watcher.current is before
+
+    assert watcher.check()
+    assert watcher.current is not before
+    assert watcher.current.lots == ["Ford Park West", "Avon Station"]
+    # A request still holding the old version keeps a complete one
+    assert before.lots == ["Ford Park", "Avon Station"]
+    assert watcher.stats()["reloads"] == 1
+
+
+def test_a_file_still_being_written_is_not_loaded(watched):
+    path, watcher = watched
+    before = watcher.current
+    for n in range(1, 4):
+        _edit(path, KB_TEXT[:len(KB_TEXT) * n // 4], 10**18 + n)
+        assert not watcher.check()
+    assert watcher.current is before
+
+
+def test_truncated_file_keeps_the_previous_version(watched):
+    path, watcher = watched
+    before = watcher.current
+    _edit(path, "", 10**18 + 1)
+    watcher.check()
+    assert not watcher.check()
+    assert watcher.current is before
+    assert watcher.stats()["failures"] == 1
+
+
+def test_unchanged_contents_do_not_rebuild(watched):
+    path, watcher = watched
+    before = watcher.current
+    _edit(path, KB_TEXT, 10**18 + 1)
+    watcher.check()
+    assert not watcher.check()
+    assert watcher.current is before
@@ -0,0 +1,40 @@
+from location_extraction import KNOWN_LOCATIONS, LOCATION_ALIASES, LocationMatcher
+
+AVON_LOTS = [("BlueBird Ski Lockers", "Avon"), ("Vail Daily Building", "Avon"), ("Arrabelle Valet", "Vail")]
+
+
+def _matcher(lots=()):
+    matcher = LocationMatcher(KNOWN_LOCATIONS, LOCATION_ALIASES)
+    matcher.set_lots(lots)
+    return matcher
+
+
+def test_suffix_stripped_names_match_without_conflicting_lots():
+    matcher = _matcher()
+    assert list(matcher.find("Is there room at Bluebird?")) == ["Bluebird Parking"]
+    assert list(matcher.find("Meet me by the Arrabelle")) == ["Arrabelle Valet"]
+
+
+def test_stem_shared_with_a_lot_in_another_town_needs_the_full_name():
+    matcher = _matcher(AVON_LOTS)
+    assert list(matcher.find("How do I get into BlueBird Ski Lockers?")) == []
+    assert list(matcher.find("Is there room at Bluebird?")) == []
+    assert list(matcher.find("Did the Vail Daily print the closures?")) == []
+    assert list(matcher.find("Is there room at Bluebird Parking?")) == ["Bluebird Parking"]
+    assert list(matcher.find("I'm at Blue Bird Parking")) == ["Bluebird Parking"]
+
+
+def test_stem_shared_with_a_lot_in_the_same_town_still_matches():
+    assert list(_matcher(AVON_LOTS).find("Meet me by the Arrabelle")) == ["Arrabelle Valet"]
+
+
+def test_set_lots_replaces_the_previous_lots():
+    matcher = _matcher(AVON_LOTS)
+    matcher.set_lots([])
+    assert list(matcher.find("Is there room at Bluebird?")) == ["Bluebird Parking"]
+
+
+def test_matches_report_spans_in_order():
+    text = "From Lions Head to Vail Vilage"
+    spans = [(match.name, text[match.start:match.end]) for match in _matcher().matches(text)]
+    assert spans == [("Lionshead Village", "Lions Head"), ("Vail Village", "Vail Vilage")]
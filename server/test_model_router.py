@@ -0,0 +1,59 @@
+import pytest
+
+import main
+from model_router import ModelRouter, ModelTier, classify_question
+
+TIERS = [ModelTier("fast", "small-model", 350), ModelTier("full", "big-model", 700)]
+
+
+def _route(router, question, **context):
+    return router.route(question, main._plan_prompt_context(question, **context)).name
+
+
+@pytest.mark.parametrize("question", [
+    "What time do the lifts open?",
+    "Is there a shuttle from the parking lot?",
+    "How do I cancel my reservation",
+])
+def test_single_lookups_go_to_the_fast_tier(question):
+    assert _route(ModelRouter(TIERS, default="full"), question) == "fast"
+
+
+@pytest.mark.parametrize("question, context", [
+    ("What's the weather like driving from Denver to Vail?", {}),
+    ("How long is the drive from Boulder to Breckenridge?", {}),
+    ("What should I expect on the way?", {"reservation_details": {"destination": "Vail", "date": "2026-12-20"}}),
+    ("Which lot is cheapest for a weekend in Vail?", {}),
+    ("Where do I park? Does the lot fill up early?", {}),
+])
+def test_routes_planning_and_multi_part_questions_go_to_the_full_tier(question, context):
+    assert _route(ModelRouter(TIERS, default="fast"), question, **context) == "full"
+
+
+def test_long_questions_go_to_the_full_tier():
+    question = "Tell me " + "about parking " * 20
+    assert classify_question(question, {}) == "full"
+    assert classify_question("Tell me about parking", {}) == "fast"
+
+
+def test_override_beats_the_classifier():
+    router = ModelRouter(TIERS, default="full", override="fast")
+    assert _route(router, "What's the weather like driving from Denver to Vail?") == "fast"
+    router = ModelRouter(TIERS, default="fast", override="full")
+    assert _route(router, "What time do the lifts open?") == "full"
+    assert router.stats()["tiers"]["full"]["routed"] == 1
+
+
+def test_unknown_or_failing_classifier_falls_back_to_the_default():
+    def broken(question, plan):
+        raise RuntimeError("classifier bug")
+
+    assert ModelRouter(TIERS, default="full", classifier=lambda q, p: "huge").route("hi", {}).name == "full"
+    assert ModelRouter(TIERS, default="fast", classifier=broken).route("hi", {}).name == "fast"
+
+
+def test_unknown_tier_names_are_rejected_up_front():
+    with pytest.raises(ValueError):
+        ModelRouter(TIERS, default="medium")
+    with pytest.raises(ValueError):
+        ModelRouter(TIERS, default="full", override="medium")
@@ -0,0 +1,41 @@
+import pytest
+
+from gazetteer import Gazetteer
+from location_extraction import KNOWN_LOCATIONS, LOCATION_ALIASES, LocationMatcher
+from place_parser import MY_LOCATION, PlaceParser
+
+
+@pytest.fixture(scope="module")
+def parser():
+    matcher = LocationMatcher(KNOWN_LOCATIONS, LOCATION_ALIASES)
+    matcher.set_lots([("BlueBird Ski Lockers", "Avon"), ("Vail Mountian School", "Vail")])
+    return PlaceParser(Gazetteer(), matcher)
+
+
+def _places(parser, question):
+    found = parser.parse(question)
+    return found.origin, found.destination, found.weather_location
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("How long is the drive from Denver to Vail tomorrow?", ("Denver", "Vail", None)),
+    ("Will it snow at Vail Pass this weekend?", (None, None, "Vail Pass")),
+    ("Directions from here to the Arrabelle", (MY_LOCATION, "Arrabelle Valet", None)),
+    ("from vail mountian school to DIA", ("Vail Mountian School", "Denver International Airport", None)),
+    ("Can I get to bluebird ski lockers from Breck?", ("Breckenridge", "BlueBird Ski Lockers", None)),
+    ("Drive to 44 Willow Pl", (None, "44 Willow Pl", None)),
+    ("From Booth Falls Road to Avon", ("Booth Falls Road", "Avon", None)),
+])
+def test_recognised_places_and_addresses(parser, question, expected):
+    assert _places(parser, question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "I want to Book a spot",
+    "I'd like to Know More about lockers",
+    "How do I get to the Lot?",
+    "Is it going to Snow?",
+    "Drive to Fort Collins",
+])
+def test_capitalised_words_alone_are_not_places(parser, question):
+    assert _places(parser, question) == (None, None, None)
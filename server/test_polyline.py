@@ -0,0 +1,52 @@
+import pytest
+
+from polyline import METERS_PER_MILE, decode, sample_evenly, segment_meters, stops_for_distance
+
+# The worked example from Google's encoded polyline documentation
+GOOGLE_EXAMPLE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+# Due north along one meridian, so distance is proportional to latitude
+MERIDIAN = [(39.0, -106.0), (39.3, -106.0), (40.0, -106.0)]
+
+
+def test_decodes_googles_example():
+    assert decode(GOOGLE_EXAMPLE) == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+
+def test_decodes_nothing_to_nothing():
+    assert decode("") == []
+
+
+def test_samples_a_straight_line_into_equal_segments():
+    samples = sample_evenly(MERIDIAN, 5)
+    assert [lat for lat, _ in samples] == pytest.approx([39.0, 39.25, 39.5, 39.75, 40.0])
+    assert all(lng == pytest.approx(-106.0) for _, lng in samples)
+    gaps = [segment_meters(a, b) for a, b in zip(samples, samples[1:])]
+    assert max(gaps) - min(gaps) < 1
+
+
+def test_two_samples_are_the_ends():
+    assert sample_evenly(MERIDIAN, 2) == [MERIDIAN[0], MERIDIAN[-1]]
+
+
+@pytest.mark.parametrize("coords, count, expected", [
+    (MERIDIAN, 1, [MERIDIAN[-1]]),
+    (MERIDIAN, 0, []),
+    ([], 3, []),
+    ([(39.6, -106.4)], 4, [(39.6, -106.4)]),
+    ([(39.6, -106.4), (39.6, -106.4)], 3, [(39.6, -106.4)]),
+])
+def test_degenerate_inputs(coords, count, expected):
+    assert sample_evenly(coords, count) == expected
+
+
+@pytest.mark.parametrize("miles, max_stops, expected", [
+    (0, 6, 2),
+    (25, 6, 2),
+    (100, 6, 5),
+    (1000, 6, 6),
+    (0, 1, 1),
+    (1000, 1, 1),
+])
+def test_stop_count(miles, max_stops, expected):
+    assert stops_for_distance(miles * METERS_PER_MILE, max_stops) == expected
@@ -0,0 +1,75 @@
+import pytest
+
+import main
+from prompt_budget import PromptBudget, Section, ends_first, estimate_tokens
+
+ITEM = "- a line of prompt text that is forty ch"
+
+
+def _sections():
+    return [
+        Section("weather", [ITEM] * 10, 80, noun="weather reports"),
+        Section("distances", [ITEM] * 10, 30, noun="distances"),
+        Section("route_weather", [f"stop {i}: {ITEM}" for i in range(7)], 40, ends_first(7), noun="route stops"),
+    ]
+
+
+def _tokens(fixed, rendered):
+    return estimate_tokens(fixed) + sum(estimate_tokens(text) for text in rendered.values())
+
+
+def test_ends_first_thins_evenly_and_keeps_the_ends_longest():
+    assert ends_first(5) == [3, 1, 2, 4, 0]
+    assert ends_first(1) == [0]
+    assert ends_first(0) == []
+
+
+def test_everything_fits_untouched_within_budget():
+    sections = _sections()
+    rendered = PromptBudget(10000).fit("Question?", sections)
+    assert all(section.trimmed == 0 for section in sections)
+    assert rendered["weather"] == "\n".join([ITEM] * 10)
+
+
+def test_lowest_priority_is_trimmed_first():
+    sections = _sections()
+    full = _tokens("Question?", {section.name: section.render() for section in sections})
+    budget = PromptBudget(full - 30)
+    rendered = budget.fit("Question?", sections)
+    trimmed = {section.name: section.trimmed for section in sections}
+    assert trimmed["distances"] > 0
+    assert trimmed["route_weather"] == trimmed["weather"] == 0
+    assert rendered["distances"].endswith(f"({trimmed['distances']} more distances left out to keep this prompt short)")
+    assert _tokens("Question?", rendered) <= budget.max_tokens
+    assert budget.stats()["trimmed_items"] == {"distances": trimmed["distances"]}
+
+
+def test_higher_priorities_are_only_trimmed_once_lower_ones_are_empty():
+    sections = _sections()
+    budget = PromptBudget(estimate_tokens("Question?") + 120)
+    rendered = budget.fit("Question?", sections)
+    distances, route, weather = sections[1], sections[2], sections[0]
+    assert distances.trimmed == 10 and route.trimmed == 7
+    assert 0 < weather.trimmed < 10
+    assert _tokens("Question?", rendered) <= budget.max_tokens
+
+
+def test_route_stops_thin_out_from_the_middle():
+    route = Section("route_weather", [f"stop {i}" for i in range(7)], 40, ends_first(7))
+    for _ in range(4):
+        route.drop_next()
+    assert [item for item, kept in zip(route.items, route.kept) if kept] == ["stop 0", "stop 3", "stop 6"]
+
+
+@pytest.mark.parametrize("max_tokens", [900, 1200, 3000])
+def test_whole_prompts_stay_within_budget_and_are_recorded(monkeypatch, max_tokens):
+    budget = PromptBudget(max_tokens)
+    monkeypatch.setattr(main, "prompt_budget", budget)
+    prompt = main.generate_contextual_prompt(
+        "Which lots near Lionshead allow overnight parking for an RV, and what do they cost?",
+        user_location="Vail", kb=main.live_knowledge.current)
+    tokens = estimate_tokens(prompt)
+    assert tokens <= max_tokens
+    stats = budget.stats()
+    assert (stats["prompts"], stats["max_tokens"], stats["avg_tokens"]) == (1, tokens, tokens)
+    assert stats["over_budget"] == 0
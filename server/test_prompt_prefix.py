@@ -0,0 +1,27 @@
+import main
+from knowledge_base import parse_knowledge_base
+from prompt_prefix import build_prompt_prefix, prefix_digest
+
+
+def _prompt(question, location):
+    return main.generate_contextual_prompt(question, user_location=location, kb=main.live_knowledge.current)
+
+
+def test_prompts_for_different_questions_share_the_prefix_bytes():
+    kb = main.live_knowledge.current
+    first = _prompt("Which lot suits a lifted truck with a roof box?", "Denver")
+    second = _prompt("Can I leave my car overnight near Lionshead?", "39.6403,-106.3742")
+    assert first != second
+
+    prefix = kb.prompt_prefix.encode("utf-8")
+    assert first.encode("utf-8")[:len(prefix)] == prefix
+    assert second.encode("utf-8")[:len(prefix)] == prefix
+
+
+def test_prefix_is_rebuilt_identically_for_the_same_version():
+    kb = main.live_knowledge.current
+    with open(main.KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        reparsed = parse_knowledge_base(f.read())
+    rebuilt = build_prompt_prefix(reparsed)
+    assert rebuilt == kb.prompt_prefix
+    assert prefix_digest(rebuilt) == prefix_digest(kb.prompt_prefix) == kb.stats()["prompt_prefix"]["digest"]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded
+from request_context import LookupContext
+
+
+def test_duplicate_lookups_share_one_call():
+    ctx = LookupContext()
+    calls = []
+
+    def fetch(place):
+        calls.append(place)
+        time.sleep(0.05)
+        return place.upper()
+
+    lookup = ctx.memoize("weather", fetch, key=str.lower)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lookup("Vail"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["VAIL"] * 4
+    assert calls == ["Vail"]
+    assert ctx.stats() == {"fetched": 1, "suppressed": 3}
+
+
+def test_seeded_value_is_not_fetched():
+    ctx = LookupContext()
+    ctx.seed("normalize", "vail", "Vail, CO 81657, USA")
+    lookup = ctx.memoize("normalize", lambda name: pytest.fail("fetched a seeded value"), key=str.lower)
+    assert lookup("Vail") == "Vail, CO 81657, USA"
+
+
+def test_async_duplicates_of_a_cancelled_lookup_get_deadline_exceeded():
+    async def scenario():
+        ctx = LookupContext()
+        started = asyncio.Event()
+
+        async def fetch(place):
+            started.set()
+            await asyncio.sleep(10)
+
+        lookup = ctx.memoize("weather", fetch, key=str.lower)
+        owner = asyncio.ensure_future(lookup("Vail"))
+        await started.wait()
+        duplicate = asyncio.ensure_future(lookup("vail"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        # An ordinary Exception, so fanout and /ask handle it like any other failed lookup
+        with pytest.raises(DeadlineExceeded):
+            await duplicate
+
+    asyncio.run(scenario())
+
+
+def test_async_failure_reaches_duplicates():
+    async def scenario():
+        ctx = LookupContext()
+
+        async def fetch(place):
+            await asyncio.sleep(0.01)
+            raise ValueError(place)
+
+        lookup = ctx.memoize("weather", fetch, key=str.lower)
+        results = await asyncio.gather(lookup("Vail"), lookup("VAIL"), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    asyncio.run(scenario())
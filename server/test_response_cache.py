@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+from cache import TTLCache
+from response_cache import CACHED, COALESCED, COMPUTED, ResponseCache, freshness_window
+
+
+def test_concurrent_requests_share_one_computation():
+    cache = ResponseCache(TTLCache())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"response": "Park at Ford Park."}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute, 60)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(source for _, source in results) == [COALESCED, COALESCED, COALESCED, COMPUTED]
+    assert cache.get_or_compute("k", compute, 60) == ({"response": "Park at Ford Park."}, CACHED)
+
+
+def test_rejected_payloads_are_not_stored():
+    cache = ResponseCache(TTLCache())
+    payload, source = cache.get_or_compute("k", lambda: {"answered_by": "unavailable"}, 60,
+                                           lambda payload: payload["answered_by"] == "llm")
+    assert source == COMPUTED
+    assert cache.get("k") is None
+
+
+def test_waiters_on_a_rejected_payload_are_not_told_it_was_cached():
+    cache = ResponseCache(TTLCache())
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return {"answered_by": "unavailable"}
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(
+        cache.get_or_compute("k", compute, 60, lambda payload: payload["answered_by"] == "llm")))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute, 60)))
+    waiter.start()
+    while cache.coalesced == 0:
+        time.sleep(0.001)
+    release.set()
+    owner.join()
+    waiter.join()
+    assert sorted(source for _, source in results) == [COALESCED, COMPUTED]
+
+
+def test_waiter_recomputes_when_the_owner_is_cancelled():
+    async def scenario():
+        cache = ResponseCache(TTLCache())
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return {"response": "Park at Ford Park."}
+
+        owner = asyncio.ensure_future(cache.get_or_compute_async("k", slow, 60))
+        await started.wait()
+        waiter = asyncio.ensure_future(cache.get_or_compute_async("k", fast, 60))
+        await asyncio.sleep(0)
+        owner.cancel()
+        assert await waiter == ({"response": "Park at Ford Park."}, COMPUTED)
+        assert owner.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_freshness_window_counts_down_to_the_next_window():
+    assert freshness_window(600, now=1200) == (2, 600)
+    assert freshness_window(600, now=1799.5) == (2, 0.5)
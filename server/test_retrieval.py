@@ -0,0 +1,40 @@
+from knowledge_base import Chunk
+from retrieval import BM25Index, tokenize
+
+CHUNKS = [
+    Chunk("lot", "Arrabelle Valet", "Valet parking at Lionshead. Overnight parking allowed. EV charging."),
+    Chunk("lot", "Eagle Canopy RV storage", "Oversized vehicles, RVs and trailers welcome. Gypsum."),
+    Chunk("faq", "How do I pay?", "Pay by card when you book. SpotSurfer Bucks work too."),
+    Chunk("guide", "Driving I-70", "Chain law applies on I-70 in snow. Check Vail Pass before you go."),
+]
+
+
+def test_tokenize_drops_stopwords_and_plural_s():
+    assert tokenize("Where can I park my trailers near the gondolas?") == ["park", "trailer", "gondola"]
+    # Short words keep their s: "bus", "gas"
+    assert tokenize("Is there gas at the bus stop?") == ["gas", "bus", "stop"]
+    assert tokenize("Is parking in Vail free?", keep={"in"}) == ["parking", "in", "vail", "free"]
+
+
+def test_search_ranks_the_matching_chunk_first():
+    index = BM25Index(CHUNKS)
+    assert index.search("Can I store my RV?", k=1)[0][0].title == "Eagle Canopy RV storage"
+    assert index.search("chain law on i-70", k=1)[0][0].title == "Driving I-70"
+
+
+def test_title_outweighs_a_passing_mention():
+    index = BM25Index(CHUNKS + [Chunk("guide", "Tips", "Valet drivers expect a tip.")])
+    assert [chunk.title for chunk, _ in index.search("valet", k=2)] == ["Arrabelle Valet", "Tips"]
+
+
+def test_unknown_words_find_nothing():
+    assert BM25Index(CHUNKS).search("helicopter skiing") == []
+
+
+def test_context_keeps_knowledge_base_order_and_drops_least_relevant_first():
+    index = BM25Index(CHUNKS)
+    texts, drop_order = index.context_parts("pay for overnight valet parking", k=2)
+    assert texts == [CHUNKS[0].text, CHUNKS[2].text]
+    ranked = [chunk.text for chunk, _ in index.search("pay for overnight valet parking", k=2)]
+    assert [texts[i] for i in drop_order] == list(reversed(ranked))
+    assert index.context_for("pay for overnight valet parking", k=2) == "\n\n".join(texts)
@@ -0,0 +1,55 @@
+import random
+from types import SimpleNamespace
+
+import main
+from location_extraction import KNOWN_LOCATIONS, haversine_miles
+from spatial_index import GridIndex, Place
+
+LIONSHEAD = KNOWN_LOCATIONS["Lionshead Village"]
+
+
+def _lot(name, address, city):
+    return SimpleNamespace(name=name, address=address, city=city)
+
+
+def _index(*lots):
+    index, unresolved = main._spatial_index(SimpleNamespace(lots=list(lots)))
+    return index, [lot.name for lot in unresolved]
+
+
+def test_lot_in_another_town_does_not_borrow_landmark_coordinates():
+    index, unresolved = _index(
+        _lot("BlueBird Ski Lockers", "137 Benchmark Road Suite C 103A, Avon, CO 81620", "Avon"),
+        _lot("Vail Daily Building", "40780 US-6, Avon, CO 81620", "Avon"),
+    )
+    lots = [place.name for place in index.places if place.kind == "lot"]
+    assert lots == []
+    assert unresolved == ["BlueBird Ski Lockers", "Vail Daily Building"]
+    # The landmarks they resemble stay landmarks
+    nearby = [place.name for place, _ in index.nearest(LIONSHEAD["lat"], LIONSHEAD["lng"], k=10)]
+    assert "Bluebird Parking" in nearby and "Vail Daily building" in nearby
+    assert "BlueBird Ski Lockers" not in nearby
+
+
+def test_lot_in_the_landmarks_town_takes_its_coordinates():
+    index, _ = _index(_lot("Arrabelle Valet", "675 LionsHead Pl Vail, CO 81657", "Vail"))
+    (lot,) = [place for place in index.places if place.kind == "lot"]
+    assert (lot.lat, lot.lng) == (KNOWN_LOCATIONS["Arrabelle Valet"]["lat"], KNOWN_LOCATIONS["Arrabelle Valet"]["lng"])
+    assert "Arrabelle Valet" not in [place.name for place in index.places if place.kind == "landmark"]
+
+
+def test_nearest_matches_a_brute_force_scan():
+    rng = random.Random(7)
+    places = [Place(f"lot {i}", 39.2 + rng.random(), -106.9 + rng.random()) for i in range(200)]
+    index = GridIndex(places)
+    for _ in range(25):
+        lat, lng = 39.0 + rng.random() * 1.4, -107.1 + rng.random() * 1.4
+        expected = sorted(places, key=lambda place: haversine_miles(lat, lng, place.lat, place.lng))[:5]
+        assert [place.name for place, _ in index.nearest(lat, lng, k=5)] == [place.name for place in expected]
+
+
+def test_radius_keeps_only_places_inside_the_circle():
+    rng = random.Random(11)
+    places = [Place(f"lot {i}", 39.5 + rng.random() * 0.3, -106.5 + rng.random() * 0.3) for i in range(100)]
+    found = {place.name for place, _ in GridIndex(places).radius(39.65, -106.35, 6)}
+    assert found == {place.name for place in places if haversine_miles(39.65, -106.35, place.lat, place.lng) <= 6}
@@ -1,53 +1,133 @@
+import asyncio
+import httpx
 import requests
 import logging
+import threading
+import time
+from cache import run_blocking
+from geocode_store import MISS, reverse_key
+from deadline import DIRECTIONS_TIMEOUT, GEOCODE_TIMEOUT
+import polyline
+
+# How long a fetched route may be reused by later requests for the same trip
+ROUTE_CACHE_TTL = 60  # seconds
+
+
+class Route:
+    """
+    One parsed Directions API response. Traffic summary, stops and durations
+    are all derived from this object so a trip costs a single Directions call.
+    """
+
+    def __init__(self, origin, destination, data):
+        route = data["routes"][0]
+        leg = route["legs"][0]
+        self.origin = origin
+        self.destination = destination
+        self.distance = leg["distance"]["text"]
+        self.duration = leg["duration"]["text"]
+        self.duration_in_traffic = leg.get("duration_in_traffic", {}).get("text", self.duration)
+        self.summary = route.get("summary", "Route summary not available")
+        self.distance_meters = leg["distance"].get("value", 0)
+        self.steps = leg["steps"]
+        self.overview_polyline = route.get("overview_polyline", {}).get("points")
+        self.fetched_at = time.time()
+        self._path = None
+
+    @property
+    def path(self):
+        """The decoded overview polyline as (lat, lng) tuples; decoded on first use."""
+        if self._path is None:
+            self._path = polyline.decode(self.overview_polyline) if self.overview_polyline else []
+        return self._path
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
 
 class TrafficService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, route_ttl=ROUTE_CACHE_TTL, geocode_store=None,
+                 timeout=DIRECTIONS_TIMEOUT, geocode_timeout=GEOCODE_TIMEOUT):
         self.api_key = api_key
+        self.timeout = timeout
+        self.geocode_timeout = geocode_timeout
         self.base_url = "https://maps.googleapis.com/maps/api/directions/json"
         self.geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
+        self.route_ttl = route_ttl
+        self._routes = {}
+        self._routes_lock = threading.Lock()
+        # Optional GeocodeStore shared with the rest of the app
+        self.geocode_store = geocode_store
 
-    def get_traffic_summary(self, origin, destination):
+    def get_route(self, origin, destination, timeout=None):
         """
-        Fetch live traffic-aware travel time from Google Maps Directions API.
+        Fetch a traffic-aware route from Google Maps Directions API, reusing one
+        fetched for the same origin/destination within the last `route_ttl` seconds.
         """
+        route = self._cached_route(origin, destination)
+        if route:
+            return route
         try:
-            params = {
-                "origin": origin,
-                "destination": destination,
-                "departure_time": "now",  # enables real-time traffic estimation
-                "key": self.api_key
-            }
-            response = requests.get(self.base_url, params=params)
+            response = requests.get(self.base_url, params=self._directions_params(origin, destination),
+                                    timeout=timeout or self.timeout)
             response.raise_for_status()
-            data = response.json()
-
-            if data["status"] != "OK" or not data["routes"]:
-                logging.warning(f"No routes found or API error: {data.get('status')}")
-                return None
-
-            leg = data["routes"][0]["legs"][0]
-            duration = leg["duration"]["text"]
-            duration_in_traffic = leg.get("duration_in_traffic", {}).get("text", duration)
-            distance = leg["distance"]["text"]
-            summary = data["routes"][0].get("summary", "Route summary not available")
-
-            return {
-                "origin": origin,
-                "destination": destination,
-                "distance": distance,
-                "duration": duration,
-                "duration_in_traffic": duration_in_traffic,
-                "route_summary": summary,
-            }
+            return self._store_route(origin, destination, response.json())
 
         except requests.exceptions.RequestException as e:
-            logging.error(f"Traffic API request failed: {e}")
+            logging.error(f"Directions API request failed: {e}")
             return None
         except Exception as e:
-            logging.error(f"Unexpected error in TrafficService: {e}")
+            logging.error(f"Unexpected error in get_route: {e}")
             return None
 
+    def _directions_params(self, origin, destination):
+        return {
+            "origin": origin,
+            "destination": destination,
+            "departure_time": "now",  # enables real-time traffic estimation
+            "key": self.api_key
+        }
+
+    def _cached_route(self, origin, destination):
+        with self._routes_lock:
+            route = self._routes.get((origin, destination))
+        if route and route.is_fresh(self.route_ttl):
+            return route
+        return None
+
+    def _store_route(self, origin, destination, data):
+        if data["status"] != "OK" or not data["routes"]:
+            logging.warning(f"No routes found or API error: {data.get('status')}")
+            return None
+
+        route = Route(origin, destination, data)
+        with self._routes_lock:
+            # Drop expired trips so the cache only holds what is still reusable
+            for key in [key for key, cached in self._routes.items() if not cached.is_fresh(self.route_ttl)]:
+                del self._routes[key]
+            self._routes[(origin, destination)] = route
+        return route
+
+    def get_traffic_summary(self, origin, destination):
+        """
+        Fetch live traffic-aware travel time from Google Maps Directions API.
+        """
+        return self.traffic_summary(self.get_route(origin, destination))
+
+    def traffic_summary(self, route):
+        """Summarize an already fetched Route for format_traffic_info()."""
+        if not route:
+            return None
+
+        return {
+            "origin": route.origin,
+            "destination": route.destination,
+            "distance": route.distance,
+            "duration": route.duration,
+            "duration_in_traffic": route.duration_in_traffic,
+            "route_summary": route.summary,
+        }
+
     def format_traffic_info(self, data):
         if not data:
             return "⚠️ Live traffic data is currently unavailable."
@@ -67,57 +147,148 @@ class TrafficService:
         Get evenly spaced stops (end_location points) along a driving route.
         Optionally reverse geocodes each point into a human-readable name.
         """
+        return self.route_stops(self.get_route(origin, destination), max_stops, reverse_geocode)
+
+    def route_stops(self, route, max_stops=5, reverse_geocode=False):
+        """Stops along an already fetched Route; see get_route_stops()."""
+        waypoints = []
+        for loc in self._sample_stop_locations(route, max_stops):
+            if reverse_geocode:
+                place = self.reverse_geocode(loc['lat'], loc['lng'])
+            else:
+                place = f"{loc['lat']},{loc['lng']}"
+            waypoints.append(place)
+
+        return waypoints
+
+    def stop_locations(self, route, max_stops=5):
+        """Stops along a Route as {"lat", "lng"} dicts, without any geocoding."""
+        return self._sample_stop_locations(route, max_stops)
+
+    def _sample_stop_locations(self, route, max_stops):
+        if not route:
+            return []
+
+        # Equal-distance points along the decoded overview polyline, one per
+        # ~25 miles; step end points are only a fallback when it is missing.
+        if route.path:
+            count = polyline.stops_for_distance(route.distance_meters, max_stops)
+            return [{"lat": round(lat, 5), "lng": round(lng, 5)}
+                    for lat, lng in polyline.sample_evenly(route.path, count)]
+
+        total_steps = len(route.steps)
+        interval = max(1, total_steps // max_stops)
+        return [route.steps[i]['end_location'] for i in range(0, total_steps, interval)]
+
+    def reverse_geocode(self, lat, lng, timeout=None):
+        """
+        Convert lat/lng to a human-readable location using Google Maps Geocoding API.
+        """
         try:
-            params = {
-                "origin": origin,
-                "destination": destination,
-                "departure_time": "now",  # Add this for traffic-aware routes
-                "key": self.api_key
-            }
-            response = requests.get(self.base_url, params=params)
+            key = reverse_key(lat, lng)
+            cached = self._cached_address(key)
+            if cached is not MISS:
+                return cached or f"{lat},{lng}"
+            response = requests.get(self.geocode_url, params=self._reverse_geocode_params(lat, lng),
+                                    timeout=timeout or self.geocode_timeout)
             response.raise_for_status()
-            data = response.json()
+            address = self._store_address(key, response.json())
+            if address:
+                return address
+        except Exception as e:
+            logging.warning(f"Reverse geocoding failed: {e}")
+        return f"{lat},{lng}"
 
-            if data['status'] != 'OK' or not data['routes']:
-                logging.warning(f"Directions API error: {data.get('status')}")
-                return []
+    def _cached_address(self, key):
+        if self.geocode_store is None:
+            return MISS
+        return self.geocode_store.lookup("address", key)
 
-            steps = data['routes'][0]['legs'][0]['steps']
-            total_steps = len(steps)
-            interval = max(1, total_steps // max_stops)
+    def _store_address(self, key, data):
+        results = data.get("results", [])
+        address = results[0]["formatted_address"] if results else None
+        if self.geocode_store is not None and (address or data.get("status") == "ZERO_RESULTS"):
+            self.geocode_store.store("address", key, address)
+        return address
 
-            waypoints = []
-            for i in range(0, total_steps, interval):
-                loc = steps[i]['end_location']
-                if reverse_geocode:
-                    place = self.reverse_geocode(loc['lat'], loc['lng'])
-                else:
-                    place = f"{loc['lat']},{loc['lng']}"
-                waypoints.append(place)
+    def _reverse_geocode_params(self, lat, lng):
+        return {
+            "latlng": f"{lat},{lng}",
+            "key": self.api_key
+        }
 
-            return waypoints
 
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Route stops request failed: {e}")
-            return []
+class AsyncTrafficService(TrafficService):
+    """Non-blocking variant of TrafficService for the async /ask pipeline."""
+
+    def __init__(self, api_key, client=None, route_ttl=ROUTE_CACHE_TTL, geocode_store=None,
+                 timeout=DIRECTIONS_TIMEOUT, geocode_timeout=GEOCODE_TIMEOUT):
+        super().__init__(api_key, route_ttl, geocode_store, timeout, geocode_timeout)
+        self._client = client
+
+    @property
+    def client(self):
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient()
+        return self._client
+
+    async def get_route(self, origin, destination, timeout=None):
+        route = self._cached_route(origin, destination)
+        if route:
+            return route
+        try:
+            response = await self.client.get(self.base_url, params=self._directions_params(origin, destination),
+                                             timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return self._store_route(origin, destination, response.json())
+
+        except httpx.HTTPError as e:
+            logging.error(f"Directions API request failed: {e}")
+            return None
         except Exception as e:
-            logging.error(f"Unexpected error in get_route_stops: {e}")
-            return []
+            logging.error(f"Unexpected error in get_route: {e}")
+            return None
 
-    def reverse_geocode(self, lat, lng):
+    async def get_traffic_summary(self, origin, destination):
+        return self.traffic_summary(await self.get_route(origin, destination))
+
+    async def get_route_stops(self, origin, destination, max_stops=5, reverse_geocode=False):
+        return await self.route_stops(await self.get_route(origin, destination), max_stops, reverse_geocode)
+
+    async def route_stops(self, route, max_stops=5, reverse_geocode=False):
         """
-        Convert lat/lng to a human-readable location using Google Maps Geocoding API.
+        Async route_stops; when reverse geocoding, all stops are resolved concurrently.
         """
+        locations = self._sample_stop_locations(route, max_stops)
+        if reverse_geocode:
+            return list(await asyncio.gather(
+                *(self.reverse_geocode(loc['lat'], loc['lng']) for loc in locations)
+            ))
+        return [f"{loc['lat']},{loc['lng']}" for loc in locations]
+
+    async def reverse_geocode(self, lat, lng, timeout=None):
         try:
-            params = {
-                "latlng": f"{lat},{lng}",
-                "key": self.api_key
-            }
-            response = requests.get(self.geocode_url, params=params)
+            key = reverse_key(lat, lng)
+            cached = await self._acached_address(key)
+            if cached is not MISS:
+                return cached or f"{lat},{lng}"
+            response = await self.client.get(self.geocode_url, params=self._reverse_geocode_params(lat, lng),
+                                             timeout=timeout or self.geocode_timeout)
             response.raise_for_status()
-            results = response.json().get("results", [])
-            if results:
-                return results[0]["formatted_address"]
+            address = await run_blocking(self._store_address, key, response.json())
+            if address:
+                return address
         except Exception as e:
             logging.warning(f"Reverse geocoding failed: {e}")
         return f"{lat},{lng}"
+
+    async def _acached_address(self, key):
+        if self.geocode_store is None:
+            return MISS
+        return await self.geocode_store.alookup("address", key)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,34 +1,40 @@
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import time
 import logging
 import os
 from dotenv import load_dotenv
+from cache import TTLCache, coords_bucket, normalize_place_key, parse_coords
+from deadline import WEATHER_TIMEOUT
+
+# How long a weather observation is treated as current
+WEATHER_CACHE_TTL = 600  # seconds
+
+# Route stops are fetched in parallel on their own pool, never the caller's
+_route_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="route-weather")
 
 
 class WeatherService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, timeout=WEATHER_TIMEOUT):
         self.api_key = api_key
+        self.timeout = timeout
         self.base_url = "http://api.openweathermap.org/data/2.5/weather"
         self.units = "imperial"
+        # Any object with get/set/stats and async aget/aset (TTLCache, TieredCache); shared by the async service
+        self.cache = cache if cache is not None else TTLCache(maxsize=512, ttl=WEATHER_CACHE_TTL)
 
-    def fetch_weather(self, location):
+    def fetch_weather(self, location, timeout=None):
         """Fetch detailed weather data for a location (city name, optionally with state)."""
+        cached = self.cache.get(self.cache_key(location))
+        if cached is not None:
+            return cached
         try:
-            params = {
-                'q': f"{location},US",  # Add more specificity if needed
-                'appid': self.api_key,
-                'units': self.units
-            }
-            response = requests.get(self.base_url, params=params)
+            response = requests.get(self.base_url, params=self._location_params(location),
+                                    timeout=timeout or self.timeout)
             response.raise_for_status()
-            data = response.json()
-
-            # Early exit if city is not found
-            if data.get("cod") != 200:
-                logging.warning(f"API returned error for {location}: {data.get('message')}")
-                return None
-
-            return self._parse_weather_data(data)
+            return self._cache_weather(location, self._handle_response(response.json(), location))
 
         except requests.RequestException as e:
             logging.error(f"API request error for '{location}': {e}")
@@ -37,6 +43,135 @@ class WeatherService:
             logging.error(f"Unexpected error for '{location}': {e}")
             return None
 
+    def cache_key(self, location):
+        """Key by grid cell for "lat,lng" strings, by normalized name otherwise."""
+        coords = parse_coords(location)
+        if coords:
+            return f"geo:{coords_bucket(*coords)}"
+        return f"name:{normalize_place_key(location)}"
+
+    def cell_key(self, lat, lng):
+        return f"geo:{coords_bucket(lat, lng)}"
+
+    def observation_keys(self, weather):
+        """Grid-cell key(s) an observation also answers for, from its reported coordinates."""
+        coord = (weather or {}).get("coordinates") or {}
+        if "lat" in coord and "lon" in coord:
+            return [self.cell_key(coord["lat"], coord["lon"])]
+        return []
+
+    def _cache_weather(self, location, weather):
+        if weather:
+            self.cache.set(self.cache_key(location), weather)
+            # Also file it under its grid cell so nearby coordinate lookups reuse it
+            for key in self.observation_keys(weather):
+                self.cache.set(key, weather)
+        return weather
+
+    def fetch_weather_at(self, lat, lng, timeout=None):
+        """Fetch weather for coordinates; observations are cached per grid cell."""
+        key = self.cell_key(lat, lng)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            response = requests.get(self.base_url, params=self._coords_params(lat, lng),
+                                    timeout=timeout or self.timeout)
+            response.raise_for_status()
+            weather = self._handle_response(response.json(), f"{lat},{lng}")
+            self.cache.set(key, weather)
+            return weather
+
+        except requests.RequestException as e:
+            logging.error(f"API request error for '{lat},{lng}': {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error for '{lat},{lng}': {e}")
+            return None
+
+    def get_weather_along_route(self, stops, name_resolver=None, fetch_at=None, timeout=None):
+        """
+        Summarize weather at stops along a route. Stops are {"lat", "lng"} dicts
+        (or "lat,lng" strings); each distinct grid cell is queried once and all
+        cells are fetched in parallel. Stops are named from the weather response;
+        `name_resolver(lat, lng)` is only called for stops that make it into the
+        summary without a name. `fetch_at` overrides fetch_weather_at, e.g. to go
+        through a request's LookupContext. `timeout` applies to each call.
+        """
+        fetch_at = fetch_at or self.fetch_weather_at
+        cells = self._route_cells(stops)
+        weathers = list(_route_pool.map(lambda point: fetch_at(*point, timeout=timeout), cells))
+        entries = self._route_entries(cells, weathers)
+
+        unnamed = [entry for entry in entries if not entry["name"]]
+        if unnamed and name_resolver:
+            names = _route_pool.map(lambda entry: name_resolver(entry["lat"], entry["lng"], timeout=timeout), unnamed)
+            for entry, name in zip(unnamed, names):
+                entry["name"] = name
+
+        return self._format_route_weather(entries)
+
+    def _coords_params(self, lat, lng):
+        return {
+            'lat': lat,
+            'lon': lng,
+            'appid': self.api_key,
+            'units': self.units
+        }
+
+    def _route_cells(self, stops):
+        """One (lat, lng) per distinct grid cell, in route order."""
+        cells = {}
+        for stop in stops:
+            point = parse_coords(stop) if isinstance(stop, str) else (stop["lat"], stop["lng"])
+            if point:
+                cells.setdefault(coords_bucket(*point), point)
+        return list(cells.values())
+
+    def _route_entries(self, cells, weathers):
+        entries = []
+        for (lat, lng), weather in zip(cells, weathers):
+            if not weather:
+                continue
+            name = weather.get("location")
+            # Neighbouring cells often report the same town; keep the first
+            if name and entries and entries[-1]["name"] == name:
+                continue
+            entries.append({"lat": lat, "lng": lng, "name": name, "weather": weather})
+        return entries
+
+    def _format_route_weather(self, entries):
+        if not entries:
+            return "⚠️ Weather along the route is currently unavailable."
+
+        lines = []
+        for entry in entries:
+            weather = entry["weather"]
+            temp = weather["temperature"]
+            conditions = weather.get("weather", {}).get("description", "Unknown").capitalize()
+            name = entry["name"] or f"{entry['lat']},{entry['lng']}"
+            lines.append(
+                f"- **{name}**: "
+                f"{temp.get('current')}°F (Feels like {temp.get('feels_like')}°F), "
+                f"{conditions}, wind {weather.get('wind', {}).get('speed', 0)} mph"
+            )
+        return "\n".join(lines)
+
+    def _location_params(self, location):
+        return {
+            'q': f"{location},US",  # Add more specificity if needed
+            'appid': self.api_key,
+            'units': self.units
+        }
+
+    def _handle_response(self, data, location):
+        # Early exit if city is not found
+        if data.get("cod") != 200:
+            logging.warning(f"API returned error for {location}: {data.get('message')}")
+            return None
+
+        return self._parse_weather_data(data)
+
     def _parse_weather_data(self, data):
         """Extract and normalize weather data."""
         try:
@@ -102,6 +237,94 @@ class WeatherService:
         return time.strftime('%I:%M %p', time.localtime(timestamp))
 
 
+class AsyncWeatherService(WeatherService):
+    """Non-blocking variant of WeatherService for the async /ask pipeline."""
+
+    def __init__(self, api_key, client=None, cache=None, timeout=WEATHER_TIMEOUT):
+        super().__init__(api_key, cache, timeout)
+        self._client = client
+
+    @property
+    def client(self):
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient()
+        return self._client
+
+    async def fetch_weather(self, location, timeout=None):
+        """Fetch detailed weather data for a location without blocking the event loop."""
+        cached = await self.cache.aget(self.cache_key(location))
+        if cached is not None:
+            return cached
+        try:
+            response = await self.client.get(self.base_url, params=self._location_params(location),
+                                             timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return await self._acache_weather(location, self._handle_response(response.json(), location))
+
+        except httpx.HTTPError as e:
+            logging.error(f"API request error for '{location}': {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error for '{location}': {e}")
+            return None
+
+    async def fetch_weather_at(self, lat, lng, timeout=None):
+        key = self.cell_key(lat, lng)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+        try:
+            response = await self.client.get(self.base_url, params=self._coords_params(lat, lng),
+                                             timeout=timeout or self.timeout)
+            response.raise_for_status()
+            weather = self._handle_response(response.json(), f"{lat},{lng}")
+            await self.cache.aset(key, weather)
+            return weather
+
+        except httpx.HTTPError as e:
+            logging.error(f"API request error for '{lat},{lng}': {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Unexpected error for '{lat},{lng}': {e}")
+            return None
+
+    async def _acache_weather(self, location, weather):
+        if weather:
+            await self.cache.aset(self.cache_key(location), weather)
+            for key in self.observation_keys(weather):
+                await self.cache.aset(key, weather)
+        return weather
+
+    async def get_weather_along_route(self, stops, name_resolver=None, fetch_at=None, timeout=None):
+        """Async get_weather_along_route; `name_resolver` and `fetch_at` must be coroutine functions."""
+        fetch_at = fetch_at or self.fetch_weather_at
+        cells = self._route_cells(stops)
+        weathers = await asyncio.gather(*(fetch_at(lat, lng, timeout=timeout) for lat, lng in cells))
+        entries = self._route_entries(cells, weathers)
+
+        unnamed = [entry for entry in entries if not entry["name"]]
+        if unnamed and name_resolver:
+            names = await asyncio.gather(*(name_resolver(entry["lat"], entry["lng"], timeout=timeout)
+                                           for entry in unnamed))
+            for entry, name in zip(unnamed, names):
+                entry["name"] = name
+
+        return self._format_route_weather(entries)
+
+    async def get_weather_for_locations(self, locations):
+        """Get formatted weather info for a list of locations, fetched concurrently."""
+        results = await asyncio.gather(*(self.fetch_weather(location) for location in locations))
+        return "\n\n".join(
+            self.format_weather_info(data, location) for data, location in zip(results, locations)
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
 # Example usage
 if __name__ == '__main__':
     load_dotenv()